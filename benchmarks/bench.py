@@ -0,0 +1,369 @@
+"""Benchmarks of database queries, `convert`, net worth and UI paging on synthetic databases.
+
+Databases of every size are generated once with `cluecoins.synthetic` and kept in `--data-dir`. Every timing is the
+best of `--repeat` runs, in milliseconds; results are compared against a baseline written earlier with
+`--save-baseline` on the same machine, and anything slower by more than `--tolerance` is reported as a regression.
+
+    python benchmarks/bench.py [--sizes 10000,100000] [--repeat N] [--json] [--output FILE] [--save-baseline]
+
+`convert` fetches quotes from a stand-in for the CurrencyBeacon API served locally, so nothing leaves the machine.
+Local storage, caches and snapshots go to a temporary directory, never to the real XDG ones.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import shutil
+import sys
+import tempfile
+from collections.abc import Awaitable
+from collections.abc import Callable
+from dataclasses import asdict
+from dataclasses import dataclass
+from datetime import date
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+import xdg
+from aiohttp import web
+
+import cluecoins.backup
+import cluecoins.indexes
+import cluecoins.ledger
+import cluecoins.pagestore
+import cluecoins.quotes
+import cluecoins.storage
+import cluecoins.sync_manager
+import cluecoins.tracing
+from cluecoins.database import connect_db
+from cluecoins.database import count_accounts
+from cluecoins.database import count_items
+from cluecoins.database import count_transactions
+from cluecoins.database import fetch_accounts_page
+from cluecoins.database import fetch_items_page
+from cluecoins.database import fetch_transactions_page
+from cluecoins.database import iter_transactions
+from cluecoins.database import transactions_page_cursor
+from cluecoins.ledger import day_to_date
+from cluecoins.networth import net_worth
+from cluecoins.storage import LocalStorage
+from cluecoins.synthetic import REFERENCE_RATES
+from cluecoins.synthetic import SyntheticConfig
+from cluecoins.synthetic import generate_database
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DEFAULT_DATA_DIR = xdg.XDG_CACHE_HOME / 'cluecoins' / 'bench'
+DEFAULT_BASELINE = Path(__file__).parent / 'baseline.json'
+
+# NOTE: Same as `PaginatedTableScreen.PAGE_SIZE`; not imported to keep textual out of the query benchmarks
+PAGE_SIZE = 1000
+QUOTE_LOOKUPS = 10_000
+# NOTE: Differences below this are noise whatever the ratio
+NOISE_MS = 1.0
+
+
+@dataclass
+class Result:
+    name: str
+    ms: float
+    # NOTE: Throughput for the benchmarks where it means something, e.g. rows/s
+    rate: float | None = None
+    unit: str | None = None
+
+
+async def best_of(repeat: int, fn: Callable[..., Awaitable[Any]], *args: Any) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        start = perf_counter()
+        await fn(*args)
+        best = min(best, perf_counter() - start)
+    return best * 1000
+
+
+def isolate(scratch: Path) -> None:
+    """Point every default path of the package into `scratch`."""
+    cluecoins.storage.DEFAULT_DB_PATH = scratch / 'db.sqlite3'
+    cluecoins.storage.DEFAULT_CACHE_PATH = scratch / 'cache.sqlite3'
+    cluecoins.indexes.WORKING_COPY_DIR = scratch / 'working'
+    cluecoins.backup.BACKUP_DIR = scratch / 'backups'
+    cluecoins.pagestore.PAGE_STORE_PATH = scratch / 'pages.sqlite3'
+    cluecoins.sync_manager.DEVICE_DIR = scratch / 'device'
+    cluecoins.ledger.LEDGER_CACHE_DIR = scratch / 'ledger'
+    cluecoins.tracing.SLOW_QUERY_LOG = scratch / 'slow-queries.log'
+
+
+def database(data_dir: Path, size: int, regenerate: bool = False) -> Path:
+    path = data_dir / f'synthetic-{size}.fydb'
+    if regenerate or not path.is_file():
+        data_dir.mkdir(parents=True, exist_ok=True)
+        print(f'generating {path} ...', file=sys.stderr)
+        generate_database(path, SyntheticConfig(transactions=size))
+    return path
+
+
+async def bench_queries(path: Path, size: int, repeat: int) -> list[Result]:
+    results = []
+    async with connect_db(path, read_only=True) as conn:
+        rows = 0
+
+        async def scan() -> None:
+            nonlocal rows
+            rows = 0
+            async for _ in iter_transactions(conn):
+                rows += 1
+
+        ms = await best_of(repeat, scan)
+        results.append(Result(f'{size}/iter_transactions', ms, rows / ms * 1000, 'rows/s'))
+
+        pages = (
+            ('transactions', fetch_transactions_page, count_transactions),
+            ('accounts', fetch_accounts_page, count_accounts),
+            ('items', fetch_items_page, count_items),
+        )
+        for table, fetch, count in pages:
+            total = await count(conn)
+            last = max(0, (total - 1) // PAGE_SIZE)
+            positions = {'first': 0, 'middle': last // 2, 'last': last}
+            # NOTE: Small tables fit in one page; don't time it three times under different names
+            positions = {name: page for name, page in positions.items() if name == 'first' or page}
+            columns, _ = await fetch(conn, 0, 1)
+            for column in columns:
+                for position, page in positions.items():
+                    offset = page * PAGE_SIZE
+                    ms = await best_of(repeat, fetch, conn, offset, PAGE_SIZE, column, True)
+                    results.append(Result(f'{size}/{table}_page/{column}/{position}', ms))
+
+                    # NOTE: What the transactions screen does when paging forward: a seek past the previous page
+                    if table != 'transactions' or not page:
+                        continue
+                    _, previous = await fetch_transactions_page(conn, offset - PAGE_SIZE, PAGE_SIZE, column, True)
+                    after = transactions_page_cursor(previous[-1], column)
+                    ms = await best_of(repeat, fetch_transactions_page, conn, 0, PAGE_SIZE, column, True, None, after)
+                    results.append(Result(f'{size}/transactions_page/{column}/{position}_keyset', ms))
+    return results
+
+
+async def bench_quotes(scratch: Path, repeat: int) -> list[Result]:
+    """`LocalStorage.get_quote` on a cache of ten years of daily quotes."""
+    storage = LocalStorage(scratch / 'quotes-db.sqlite3', scratch / 'quotes-cache.sqlite3')
+    first = date(2015, 1, 1)
+    days = [first + timedelta(days=i) for i in range(3653)]
+    currencies = [c for c in REFERENCE_RATES if c != 'USD']
+    rng = random.Random(0)
+    lookups = [(rng.choice(days), rng.choice(currencies)) for _ in range(QUOTE_LOOKUPS)]
+
+    async with storage.connect():
+        await storage.create_schema()
+        await storage.cache_conn.executemany(
+            'INSERT OR IGNORE INTO quotes VALUES (?, ?, ?, ?)',
+            [(day, 'USD', currency, str(REFERENCE_RATES[currency])) for day in days for currency in currencies],
+        )
+        await storage.commit()
+
+        async def lookup() -> None:
+            for day, currency in lookups:
+                await storage.get_quote(day, 'USD', currency)
+
+        ms = await best_of(repeat, lookup)
+    return [Result('get_quote', ms, QUOTE_LOOKUPS / ms * 1000, 'lookups/s')]
+
+
+def _rate(day: date, base_currency: str, quote_currency: str) -> float:
+    wave = 1 + 0.05 * math.sin(day.toordinal() / 30)
+    return round(REFERENCE_RATES[quote_currency] / REFERENCE_RATES[base_currency] * wave, 6)
+
+
+async def _timeseries(request: web.Request) -> web.Response:
+    """`/v1/timeseries` of the CurrencyBeacon API with made-up but stable rates for every day."""
+    start = date.fromisoformat(request.query['start_date'])
+    end = date.fromisoformat(request.query['end_date'])
+    base = request.query['base']
+    symbols = [s for s in request.query.get('symbols', '').split(',') if s in REFERENCE_RATES]
+    response = {
+        (start + timedelta(days=i)).isoformat(): {s: _rate(start + timedelta(days=i), base, s) for s in symbols}
+        for i in range((end - start).days + 1)
+    }
+    return web.json_response({'response': response})
+
+
+async def bench_convert(path: Path, size: int, scratch: Path, repeat: int) -> list[Result]:
+    """`convert` on a copy of the database: with an empty quote cache (`cold`) and with a full one (`warm`)."""
+    from cluecoins.cli import convert
+
+    app = web.Application()
+    app.router.add_get('/v1/timeseries', _timeseries)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    cluecoins.quotes.CB_API_URL = f'http://{host}:{port}'
+
+    results = []
+    try:
+        for name, warm in (('cold', False), ('warm', True)):
+            best = math.inf
+            for i in range(repeat):
+                copy = scratch / f'convert-{size}.fydb'
+                shutil.copyfile(path, copy)
+                storage_dir = scratch / ('convert-warm' if warm else f'convert-cold-{i}')
+                storage = LocalStorage(storage_dir / 'db.sqlite3', storage_dir / 'cache.sqlite3')
+                start = perf_counter()
+                await convert('USD', str(copy), lambda _: None, storage, snapshot=False)
+                best = min(best, perf_counter() - start)
+            results.append(Result(f'{size}/convert/{name}', best * 1000, size / best, 'rows/s'))
+    finally:
+        await runner.cleanup()
+    return results
+
+
+async def bench_networth(path: Path, size: int, repeat: int) -> list[Result]:
+    """Daily net worth from the ledger, with a quote for every day and currency."""
+    with await cluecoins.ledger.load_ledger(path) as ledger:
+        days = ledger.columns['day']
+        first, last = day_to_date(min(days)), day_to_date(max(days))
+        span = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+        quotes = {
+            currency: [(day, Decimal(str(_rate(day, 'USD', currency)))) for day in span]
+            for currency in ledger.dictionaries['currency']
+            if currency in REFERENCE_RATES and currency != 'USD'
+        }
+        best = math.inf
+        for _ in range(repeat):
+            start = perf_counter()
+            net_worth(ledger, 'USD', 'day', quotes)
+            best = min(best, perf_counter() - start)
+    return [Result(f'{size}/networth/day', best * 1000, size / best, 'rows/s')]
+
+
+async def bench_ui(path: Path, size: int, repeat: int) -> list[Result]:
+    """Transactions screen: mount with the first page, the next page and a jump to the last one."""
+    from cluecoins.ui import CluecoinsApp
+    from cluecoins.ui import TransactionsScreen
+
+    mount = flip = jump = math.inf
+    async with CluecoinsApp().run_test(size=(120, 40)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+        app.database_connect(path)
+        for _ in range(repeat):
+            start = perf_counter()
+            app.action_transactions()
+            await pilot.pause()
+            mount = min(mount, perf_counter() - start)
+            screen = app.screen
+            assert isinstance(screen, TransactionsScreen)
+            assert screen._data.row_count == min(size, PAGE_SIZE)
+
+            start = perf_counter()
+            await pilot.click('#page-next')
+            await pilot.pause()
+            flip = min(flip, perf_counter() - start)
+            assert screen._page == 1
+
+            start = perf_counter()
+            screen._page = (screen._total_rows - 1) // PAGE_SIZE - 1
+            await pilot.click('#page-next')
+            await pilot.pause()
+            jump = min(jump, perf_counter() - start)
+
+    return [
+        Result(f'{size}/ui/transactions_mount', mount * 1000),
+        Result(f'{size}/ui/transactions_next_page', flip * 1000),
+        Result(f'{size}/ui/transactions_last_page', jump * 1000),
+    ]
+
+
+async def run(args: argparse.Namespace) -> list[Result]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix='cluecoins-bench-') as tmp:
+        scratch = Path(tmp)
+        isolate(scratch)
+        results += await bench_quotes(scratch, args.repeat)
+        for size in args.sizes:
+            path = database(args.data_dir, size, args.regenerate)
+            print(f'benchmarking {path.name} ...', file=sys.stderr)
+            results += await bench_queries(path, size, args.repeat)
+            if size <= args.convert_max:
+                results += await bench_convert(path, size, scratch, args.repeat)
+            results += await bench_networth(path, size, args.repeat)
+            results += await bench_ui(path, size, args.repeat)
+    return results
+
+
+def compare(results: list[Result], baseline: dict[str, float], tolerance: float) -> list[tuple[Result, float]]:
+    """Results slower than the baseline by more than `tolerance` (0.25 is 25%), with their ratio."""
+    regressions = []
+    for r in results:
+        base_ms = baseline.get(r.name)
+        if base_ms is None or not base_ms:
+            continue
+        if r.ms > base_ms * (1 + tolerance) and r.ms - base_ms > NOISE_MS:
+            regressions.append((r, r.ms / base_ms))
+    return regressions
+
+
+def load_baseline(path: Path) -> dict[str, float]:
+    if not path.is_file():
+        return {}
+    return {r['name']: r['ms'] for r in json.loads(path.read_text())['results']}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--sizes',
+        type=lambda s: [int(n) for n in s.split(',')],
+        default=list(DEFAULT_SIZES),
+        help='comma-separated transaction counts of the databases',
+    )
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark, best one is kept')
+    parser.add_argument('--convert-max', type=int, default=10_000, help='skip `convert` on larger databases')
+    parser.add_argument('--data-dir', type=Path, default=DEFAULT_DATA_DIR, help='where generated databases are kept')
+    parser.add_argument('--regenerate', action='store_true', help='generate the databases again')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE, help='results to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='slowdown reported as a regression')
+    parser.add_argument('--output', type=Path, help='write results as JSON')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline)
+    results = asyncio.run(run(args))
+    regressions = compare(results, baseline, args.tolerance)
+
+    document = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': [asdict(r) for r in results],
+    }
+    if args.output:
+        args.output.write_text(json.dumps(document, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(document, indent=2))
+
+    if args.json:
+        print(json.dumps(document | {'regressions': [r.name for r, _ in regressions]}, indent=2))
+    else:
+        slow = {r.name: ratio for r, ratio in regressions}
+        for r in results:
+            line = f'{r.name:<56} {r.ms:10.2f} ms'
+            if r.rate is not None:
+                line += f'  {r.rate:12,.0f} {r.unit}'
+            if r.name in baseline:
+                line += f'  ({r.ms / baseline[r.name]:.2f}x baseline)' if baseline[r.name] else ''
+            if r.name in slow:
+                line += '  REGRESSION'
+            print(line)
+        if not baseline:
+            print(f'no baseline at `{args.baseline}`; run with --save-baseline to write one')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
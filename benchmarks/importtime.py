@@ -0,0 +1,101 @@
+"""Startup-time budget for cluecoins entry points.
+
+Runs `python -X importtime -c 'import <module>'` in a fresh interpreter, keeps the best of a few runs and checks it
+against a budget. Modules in `FORBIDDEN` must not be imported at startup at all; they are loaded on first use.
+
+    python benchmarks/importtime.py [--json] [--repeat N]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from dataclasses import asdict
+from dataclasses import dataclass
+
+# NOTE: Total time is dominated by textual and depends on the machine; own time (self time of `cluecoins.*`
+# modules) is what we control.
+BUDGET_MS: dict[str, tuple[float, float]] = {
+    'cluecoins.ui': (1500.0, 120.0),
+    'cluecoins.cli': (800.0, 60.0),
+}
+
+FORBIDDEN: dict[str, tuple[str, ...]] = {
+    'cluecoins.ui': ('aiohttp', 'aiosqlite', 'importlib.metadata', 'cluecoins.cli', 'cluecoins.quotes'),
+    'cluecoins.cli': ('aiohttp', 'textual'),
+}
+
+
+@dataclass
+class ImportTime:
+    module: str
+    total_ms: float
+    own_ms: float
+    budget_ms: float
+    own_budget_ms: float
+    forbidden: list[str]
+
+    @property
+    def ok(self) -> bool:
+        return not self.forbidden and self.total_ms <= self.budget_ms and self.own_ms <= self.own_budget_ms
+
+
+def parse_importtime(output: str) -> dict[str, tuple[int, int]]:
+    """Map module name to (self, cumulative) microseconds."""
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:') :].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure(module: str, repeat: int = 5) -> ImportTime:
+    best: dict[str, tuple[int, int]] | None = None
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        modules = parse_importtime(result.stderr)
+        if best is None or modules[module][1] < best[module][1]:
+            best = modules
+    assert best is not None
+
+    budget, own_budget = BUDGET_MS[module]
+    return ImportTime(
+        module=module,
+        total_ms=best[module][1] / 1000,
+        own_ms=sum(s for name, (s, _) in best.items() if name.split('.')[0] == 'cluecoins') / 1000,
+        budget_ms=budget,
+        own_budget_ms=own_budget,
+        forbidden=sorted(name for name in FORBIDDEN[module] if name in best),
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per entry point, best one is kept')
+    args = parser.parse_args()
+
+    results = [measure(module, args.repeat) for module in BUDGET_MS]
+    if args.json:
+        print(json.dumps([asdict(r) | {'ok': r.ok} for r in results], indent=2))
+    else:
+        for r in results:
+            status = 'ok' if r.ok else 'OVER BUDGET'
+            print(
+                f'{r.module:<16} total {r.total_ms:7.1f} / {r.budget_ms:.0f} ms  '
+                f'own {r.own_ms:6.1f} / {r.own_budget_ms:.0f} ms  {status}'
+            )
+            for name in r.forbidden:
+                print(f'  imported at startup: {name}')
+    return 0 if all(r.ok for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,7 @@
-import importlib.metadata
+def __getattr__(name: str) -> str:
+    # NOTE: importlib.metadata is slow to import; resolve the version on first access only
+    if name == '__version__':
+        import importlib.metadata
 
-__version__ = importlib.metadata.version('cluecoins')
+        return importlib.metadata.version('cluecoins')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
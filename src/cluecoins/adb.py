@@ -1,60 +1,217 @@
-# """A module that manages the application and the Bluecoins DB on the Device using ADB."""
+"""A module that manages the application and the Bluecoins DB on the Device using ADB.
 
-# import datetime
-# import subprocess
+The database lives in the private directory of the app, so it's copied (as root) to `STAGING_DIR` first and
+transferred with the ADB sync protocol from there, streaming to disk. Every transfer is verified with SHA-256 on
+both ends; `push` skips the transfer if the device already has the same database.
 
-# from adbutils import adb
-# from adbutils._device import AdbDevice
+Transactions committed in WAL mode may still be in `bluecoins.fydb-wal` only. `pull` transfers the `-wal` too and
+checkpoints it into the local copy; `push` removes it on the device, so it refuses to run when the device has a
+`-wal` the pulled copy doesn't include.
+"""
 
-# APP_ID = 'com.rammigsoftware.bluecoins'
+import hashlib
+import sqlite3
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Protocol
 
+from cluecoins.database import browse_uri
 
-# def generate_new_db_name() -> str:
-#     current_time = datetime.datetime.now().strftime('%Y-%m-%d_%H:%M:%S')
-#     return f'cluecoins-{current_time}'
+if TYPE_CHECKING:
+    from adbutils import AdbDevice
 
+APP_ID = 'com.rammigsoftware.bluecoins'
+DEVICE_DB_PATH = f'/data/user/0/{APP_ID}/databases/bluecoins.fydb'
+STAGING_DIR = '/data/local/tmp'
 
-# class Device:
-#     def __init__(self, device: AdbDevice) -> None:
-#         self.device = device
+_CHUNK_SIZE = 1024 * 1024
+_EMPTY_SHA256 = hashlib.sha256().hexdigest()
 
-#     @classmethod
-#     def connect(cls) -> 'Device':
-#         """Connect to the Device with ADB"""
 
-#         device_list = adb.device_list()
+class TransferError(Exception):
+    pass
 
-#         if not device_list:
-#             raise Exception('Device is not found')
-#         if len(device_list) >= 2:
-#             raise Exception('Found two or more devices. Connect only one device.')
 
-#         device = adb.device(serial=device_list[0].serial)
-#         return Device(device)
+class SyncProtocol(Protocol):
+    def iter_content(self, path: str) -> Iterator[bytes]: ...
 
-#     def stop_app(self) -> None:
-#         self.device.app_stop(APP_ID)
-#         self.device.shell(f'pm disable-user --user 0 {APP_ID}')
+    def push(self, src: Any, dst: str, mode: int = ..., check: bool = ...) -> int: ...
 
-#     def get_app_user_id(self) -> int:
-#         user_response = self.device.shell(f'dumpsys package {APP_ID} | grep userId')
-#         # NOTE: split to list, take second element, str --> int
-#         return int(user_response.split(sep='=')[1])
 
-#     def pull_db(self, db: str) -> None:
-#         subprocess.run(
-#             f'adb shell su {APP_ID} -c "cat /data/user/0/{APP_ID}/databases/bluecoins.fydb" > {db}.fydb',
-#             shell=True,
-#             check=True,
-#         )
+class DeviceProtocol(Protocol):
+    """Subset of `adbutils.AdbDevice` used here."""
 
-#     def push_db_root(self, db: str) -> None:
-#         """Push the modified DB to Device"""
+    serial: str | None
 
-#         self.device.sync.push(f'{db}.fydb', f'/data/local/tmp/{db}.fydb')
-#         # FIXME: don't use root
-#         self.device.shell(f'su 0 -c mv /data/local/tmp/{db}.fydb /data/user/0/{APP_ID}/databases/bluecoins.fydb')
+    @property
+    def sync(self) -> SyncProtocol: ...
 
-#     def start_app(self, activity: str) -> None:
-#         self.device.shell(f'pm enable {APP_ID}')
-#         self.device.app_start(APP_ID, activity)
+    def shell(self, cmdargs: str) -> Any: ...
+
+    def app_stop(self, package_name: str) -> None: ...
+
+    def app_start(self, package_name: str) -> None: ...
+
+
+@dataclass(frozen=True)
+class TransferResult:
+    path: Path
+    size: int
+    checksum: str
+    skipped: bool = False
+    # NOTE: Of the `-wal` checkpointed into the pulled copy, if there was one
+    wal_checksum: str | None = None
+
+
+def file_checksum(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open('rb') as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def checkpoint(path: Path) -> None:
+    """Move the contents of `<path>-wal` into the database file and remove the WAL."""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('PRAGMA journal_mode = DELETE')
+    except sqlite3.DatabaseError as e:
+        raise TransferError(f'`{path.name}` is not a valid database: {e}') from e
+    finally:
+        conn.close()
+
+
+def check_database(path: Path) -> None:
+    conn = sqlite3.connect(browse_uri(path), uri=True)
+    try:
+        result = conn.execute('PRAGMA quick_check').fetchone()
+    except sqlite3.DatabaseError as e:
+        raise TransferError(f'`{path.name}` is not a valid database: {e}') from e
+    finally:
+        conn.close()
+    if not result or result[0] != 'ok':
+        raise TransferError(f'`{path.name}` is corrupted: {result[0] if result else "empty"}')
+
+
+class Device:
+    def __init__(self, device: 'AdbDevice | DeviceProtocol') -> None:
+        self.device = device
+
+    @property
+    def serial(self) -> str | None:
+        return self.device.serial
+
+    def _su(self, command: str) -> str:
+        return str(self.device.shell(f"su 0 -c '{command}'")).strip()
+
+    def stop_app(self) -> None:
+        self.device.app_stop(APP_ID)
+
+    def start_app(self) -> None:
+        self.device.app_start(APP_ID)
+
+    def checksum(self, path: str = DEVICE_DB_PATH) -> str | None:
+        """SHA-256 of a file on the device; `None` if it doesn't exist."""
+        output = self._su(f'sha256sum {path} 2>/dev/null')
+        return output.split()[0] if output else None
+
+    def wal_checksum(self) -> str | None:
+        """SHA-256 of the `-wal` of the database; `None` if there's none or it's empty."""
+        checksum = self.checksum(f'{DEVICE_DB_PATH}-wal')
+        return None if checksum == _EMPTY_SHA256 else checksum
+
+    def _download(self, path: str, target: Path, expected: str) -> int:
+        """Stream a file to `target` and verify it; returns its size."""
+        digest = hashlib.sha256()
+        size = 0
+        with target.open('wb') as f:
+            for chunk in self.device.sync.iter_content(path):
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        if digest.hexdigest() != expected:
+            raise TransferError(f'checksum mismatch after pull: {digest.hexdigest()} != {expected}')
+        return size
+
+    def pull(self, target: Path) -> TransferResult:
+        """Stop the app and stream its database to `target`, with the changes still in its `-wal`."""
+        self.stop_app()
+        staging = f'{STAGING_DIR}/cluecoins-pull.fydb'
+        has_wal = self.wal_checksum() is not None
+        self._su(f'cp {DEVICE_DB_PATH} {staging} && chmod 644 {staging}')
+        if has_wal:
+            self._su(f'cp {DEVICE_DB_PATH}-wal {staging}-wal && chmod 644 {staging}-wal')
+        part = target.with_name(f'.{target.name}.part')
+        # NOTE: SQLite only finds the WAL of a database under this name
+        part_wal = part.with_name(f'{part.name}-wal')
+        try:
+            checksum = self.checksum(staging)
+            if checksum is None:
+                raise TransferError(f'`{DEVICE_DB_PATH}` not found on the device')
+            size = self._download(staging, part, checksum)
+            wal_checksum = self.checksum(f'{staging}-wal') if has_wal else None
+            if wal_checksum is not None:
+                self._download(f'{staging}-wal', part_wal, wal_checksum)
+                checkpoint(part)
+            check_database(part)
+            part.replace(target)
+        finally:
+            for path in (part, part_wal, part.with_name(f'{part.name}-shm')):
+                path.unlink(missing_ok=True)
+            self._su(f'rm -f {staging} {staging}-wal')
+        return TransferResult(target, size, checksum, wal_checksum=wal_checksum)
+
+    def push(self, source: Path, force: bool = False, pulled_wal: str | None = None) -> TransferResult:
+        """Replace the database of the app with `source`, unless it's the same already; the app is stopped.
+
+        The previous database is kept on the device as `bluecoins.fydb.cluecoins.bak`. Unless `force`d, a `-wal` on
+        the device must be the one `source` was pulled with (`pulled_wal`), or its changes would be lost.
+        """
+        check_database(source)
+        checksum = file_checksum(source)
+        size = source.stat().st_size
+        if not force and self.checksum() == checksum:
+            return TransferResult(source, size, checksum, skipped=True)
+        if not force and (wal := self.wal_checksum()) is not None and wal != pulled_wal:
+            raise TransferError(f'`{DEVICE_DB_PATH}-wal` has changes the pushed database does not include; pull first')
+
+        self.stop_app()
+        staging = f'{STAGING_DIR}/cluecoins-push.fydb'
+        try:
+            self.device.sync.push(source, staging, 0o644)
+            if self.checksum(staging) != checksum:
+                raise TransferError('checksum mismatch after push')
+
+            owner = self._su(f'stat -c %u:%g {DEVICE_DB_PATH}')
+            # NOTE: Journal and WAL files of the old database must not be applied to the new one
+            self._su(
+                f'cp {DEVICE_DB_PATH} {DEVICE_DB_PATH}.cluecoins.bak'
+                f' && cp {staging} {DEVICE_DB_PATH}'
+                f' && chown {owner} {DEVICE_DB_PATH}'
+                f' && rm -f {DEVICE_DB_PATH}-journal {DEVICE_DB_PATH}-wal {DEVICE_DB_PATH}-shm'
+            )
+        finally:
+            self._su(f'rm -f {staging}')
+
+        if self.checksum() != checksum:
+            raise TransferError('checksum mismatch after replacing the database')
+        return TransferResult(source, size, checksum)
+
+
+def connect(serial: str | None = None) -> Device:
+    """Connect to the Device with ADB"""
+    from adbutils import adb
+
+    if serial is None:
+        device_list = adb.device_list()
+        if not device_list:
+            raise TransferError('Device is not found')
+        if len(device_list) >= 2:
+            raise TransferError('Found two or more devices. Connect only one device.')
+        serial = device_list[0].serial
+
+    return Device(adb.device(serial=serial))
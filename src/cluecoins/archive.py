@@ -0,0 +1,132 @@
+"""Archive accounts: move an account with its transactions and their labels to `CLUE_*` tables and back.
+
+Bluecoins doesn't know about `CLUE_*` tables, so an archived account disappears from the app with all its history
+and reappears unchanged when unarchived. Rows keep their IDs. Every direction is a handful of `INSERT ... SELECT`
+and `DELETE` statements filtered by account ID, in one transaction, no matter how many transactions the account has.
+
+`CLUE_*` tables are created from the `CREATE TABLE` statements of the live tables, so they always match the schema
+of the database they're in.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from cluecoins.schema import ensure_schema
+
+if TYPE_CHECKING:
+    from aiosqlite import Connection
+
+ARCHIVE_PREFIX = 'CLUE_'
+ARCHIVE_TABLES = ('ACCOUNTSTABLE', 'TRANSACTIONSTABLE', 'LABELSTABLE')
+
+
+@dataclass(frozen=True)
+class ArchiveResult:
+    account_id: int
+    transactions: int
+    labels: int
+
+
+async def _columns(conn: 'Connection', table: str) -> list[str]:
+    async with conn.execute(f'PRAGMA table_info({table})') as cur:
+        return [row[1] for row in await cur.fetchall()]
+
+
+async def create_archive_tables(conn: 'Connection') -> None:
+    """Create missing `CLUE_*` tables with the definitions of the live ones."""
+    for table in ARCHIVE_TABLES:
+        async with conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)) as cur:
+            row = await cur.fetchone()
+        if row is None:
+            raise Exception(f'table `{table}` does not exist')
+        sql, count = re.subn(
+            rf'^\s*CREATE\s+TABLE\s+["`\[]?{table}["`\]]?',
+            f'CREATE TABLE IF NOT EXISTS {ARCHIVE_PREFIX}{table}',
+            row[0],
+            flags=re.IGNORECASE,
+        )
+        if not count:
+            raise Exception(f'unexpected definition of `{table}`: {row[0]}')
+        await conn.execute(sql)
+
+
+async def find_account(conn: 'Connection', name: str, archived: bool = False) -> int | None:
+    table = f'{ARCHIVE_PREFIX}ACCOUNTSTABLE' if archived else 'ACCOUNTSTABLE'
+    if archived and not await _columns(conn, table):
+        return None
+    async with conn.execute(f'SELECT accountsTableID FROM {table} WHERE accountName = ?', (name,)) as cur:
+        row = await cur.fetchone()
+    return row[0] if row else None
+
+
+async def archived_accounts(conn: 'Connection') -> list[tuple[int, str]]:
+    """IDs and names of archived accounts."""
+    if not await _columns(conn, f'{ARCHIVE_PREFIX}ACCOUNTSTABLE'):
+        return []
+    async with conn.execute(
+        f'SELECT accountsTableID, accountName FROM {ARCHIVE_PREFIX}ACCOUNTSTABLE ORDER BY accountName'
+    ) as cur:
+        return [(row[0], row[1]) for row in await cur.fetchall()]
+
+
+async def _move(conn: 'Connection', table: str, where: str, account_id: int, revert: bool) -> int:
+    source, target = f'{ARCHIVE_PREFIX}{table}', table
+    if not revert:
+        source, target = target, source
+    # NOTE: Explicit columns, so a `CLUE_*` table left by an older schema still works as long as they match
+    target_columns = set(await _columns(conn, target))
+    columns = ', '.join(c for c in await _columns(conn, source) if c in target_columns)
+    await conn.execute(
+        f'INSERT INTO {target} ({columns}) SELECT {columns} FROM {source} WHERE {where}',
+        (account_id,),
+    )
+    cur = await conn.execute(f'DELETE FROM {source} WHERE {where}', (account_id,))
+    return cur.rowcount
+
+
+async def _move_account(conn: 'Connection', account_id: int, revert: bool) -> ArchiveResult:
+    transactions = f'{ARCHIVE_PREFIX}TRANSACTIONSTABLE' if revert else 'TRANSACTIONSTABLE'
+    try:
+        # NOTE: Explicit BEGIN, otherwise `CREATE TABLE` would be committed on its own
+        await conn.execute('BEGIN IMMEDIATE')
+        await create_archive_tables(conn)
+        # NOTE: Labels first, while the transactions are still where the subquery looks for them
+        labels = await _move(
+            conn,
+            'LABELSTABLE',
+            f'transactionIDLabels IN (SELECT transactionsTableID FROM {transactions} WHERE accountID = ?)',
+            account_id,
+            revert,
+        )
+        moved = await _move(conn, 'TRANSACTIONSTABLE', 'accountID = ?', account_id, revert)
+        await _move(conn, 'ACCOUNTSTABLE', 'accountsTableID = ?', account_id, revert)
+        await conn.commit()
+    except Exception:
+        await conn.rollback()
+        raise
+    return ArchiveResult(account_id, moved, labels)
+
+
+async def archive_account(conn: 'Connection', account_id: int) -> ArchiveResult:
+    """Move the account, its transactions and their labels to `CLUE_*` tables, in one transaction.
+
+    Transfers keep pointing to the account from the other side (`accountPairID`) until it's unarchived.
+    """
+    await ensure_schema(conn)
+    async with conn.execute('SELECT 1 FROM ACCOUNTSTABLE WHERE accountsTableID = ?', (account_id,)) as cur:
+        if not await cur.fetchone():
+            raise Exception(f'account {account_id} does not exist')
+    return await _move_account(conn, account_id, revert=False)
+
+
+async def unarchive_account(conn: 'Connection', account_id: int) -> ArchiveResult:
+    """Move an archived account back, in one transaction; fails if its ID was taken in the meantime."""
+    await ensure_schema(conn)
+    if account_id not in {id_ for id_, _ in await archived_accounts(conn)}:
+        raise Exception(f'account {account_id} is not archived')
+    async with conn.execute('SELECT accountName FROM ACCOUNTSTABLE WHERE accountsTableID = ?', (account_id,)) as cur:
+        row = await cur.fetchone()
+    if row:
+        raise Exception(f'account ID {account_id} is taken by `{row[0]}`')
+    return await _move_account(conn, account_id, revert=True)
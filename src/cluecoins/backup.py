@@ -0,0 +1,225 @@
+"""Compressed snapshots of Bluecoins databases.
+
+A snapshot is taken with the SQLite online backup API, `BACKUP_PAGES` pages per step, into a temporary file that is
+then compressed chunk by chunk; the database is never read into memory and other connections may keep using it.
+Snapshots live in `BACKUP_DIR`, named after the `source_name` of the database; only the newest `DEFAULT_KEEP` of
+every database are kept.
+
+Write commands (`convert`, item rename and merge, cleanup) take a snapshot before touching the file.
+"""
+
+import asyncio
+import gzip
+import re
+import shutil
+import sqlite3
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+from hashlib import blake2b
+from pathlib import Path
+from types import ModuleType
+from typing import IO
+
+import xdg
+
+from cluecoins.database import browse_uri
+
+BACKUP_DIR = xdg.XDG_DATA_HOME / 'cluecoins' / 'backups'
+BACKUP_PAGES = 1024
+DEFAULT_KEEP = 10
+
+COMPRESSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+_CHUNK_SIZE = 1024 * 1024
+_TIMESTAMP_FORMAT = '%Y%m%dT%H%M%S%f'
+_SNAPSHOT_RE = re.compile(r'^(?P<name>.+)-(?P<created>\d{8}T\d{12})-(?P<reason>[a-z_]+)\.fydb\.(?P<ext>gz|zst)$')
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    path: Path
+    name: str
+    created: datetime
+    reason: str
+    compression: str
+
+    @property
+    def size(self) -> int:
+        return self.path.stat().st_size
+
+    @classmethod
+    def from_path(cls, path: Path) -> 'Snapshot | None':
+        match = _SNAPSHOT_RE.match(path.name)
+        if not match:
+            return None
+        compression = next(k for k, v in COMPRESSIONS.items() if v == f'.{match["ext"]}')
+        created = datetime.strptime(match['created'], _TIMESTAMP_FORMAT)
+        return cls(path, match['name'], created, match['reason'], compression)
+
+
+def source_name(path: Path) -> str:
+    """Name the snapshots of a database are kept under.
+
+    The file stem with a hash of the resolved path, so that databases with the same file name in different
+    directories don't share (and prune) each other's snapshots.
+    """
+    digest = blake2b(str(path.resolve()).encode(), digest_size=4).hexdigest()
+    return f'{path.stem}-{digest}'
+
+
+def _zstd_module() -> ModuleType | None:
+    # NOTE: `compression.zstd` is in the stdlib since Python 3.14; `zstandard` is an optional dependency before that
+    try:
+        from compression import zstd  # type: ignore[import-not-found]
+    except ImportError:
+        try:
+            import zstandard as zstd  # type: ignore[import-not-found,no-redef]
+        except ImportError:
+            return None
+    return zstd
+
+
+def available_compressions() -> list[str]:
+    """Supported compressions, the preferred one first."""
+    return ['zstd', 'gzip'] if _zstd_module() else ['gzip']
+
+
+def _open_compressed(path: Path, mode: str, compression: str) -> IO[bytes]:
+    if compression == 'zstd':
+        zstd = _zstd_module()
+        if zstd is None:
+            raise Exception('zstd compression requires Python 3.14 or the `zstandard` package')
+        return zstd.open(path, mode)
+    return gzip.open(path, mode)  # type: ignore[return-value]
+
+
+def _backup(source: Path, target: Path, progress: Callable[[int, int], None] | None) -> None:
+    def step(status: int, remaining: int, total: int) -> None:
+        if progress:
+            progress(total - remaining, total)
+
+    src = sqlite3.connect(browse_uri(source), uri=True)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst, pages=BACKUP_PAGES, progress=step)
+    finally:
+        dst.close()
+        src.close()
+
+
+def _create_snapshot(
+    path: Path,
+    target: Path,
+    compression: str,
+    progress: Callable[[int, int], None] | None,
+) -> None:
+    tmp = target.with_name(f'.{target.name}.tmp')
+    try:
+        _backup(path, tmp, progress)
+        with tmp.open('rb') as src, _open_compressed(target, 'wb', compression) as dst:
+            shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+    except BaseException:
+        target.unlink(missing_ok=True)
+        raise
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def list_snapshots(name: str | None = None, backup_dir: Path | None = None) -> list[Snapshot]:
+    """Snapshots of the database with the given `source_name` (all by default), newest first."""
+    backup_dir = backup_dir or BACKUP_DIR
+    if not backup_dir.is_dir():
+        return []
+    snapshots = [s for p in backup_dir.iterdir() if (s := Snapshot.from_path(p)) and name in (None, s.name)]
+    return sorted(snapshots, key=lambda s: s.created, reverse=True)
+
+
+def prune_snapshots(name: str, keep: int = DEFAULT_KEEP, backup_dir: Path | None = None) -> list[Path]:
+    """Delete all but the newest `keep` snapshots of a database; returns deleted paths."""
+    deleted = []
+    for snapshot in list_snapshots(name, backup_dir)[keep:]:
+        snapshot.path.unlink(missing_ok=True)
+        deleted.append(snapshot.path)
+    return deleted
+
+
+async def _take_snapshot(
+    path: Path,
+    reason: str,
+    compression: str | None,
+    backup_dir: Path,
+    progress: Callable[[int, int], None] | None,
+) -> Snapshot:
+    compression = compression or available_compressions()[0]
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    created = datetime.now()
+    name = source_name(path)
+    target = backup_dir / f'{name}-{created.strftime(_TIMESTAMP_FORMAT)}-{reason}.fydb{COMPRESSIONS[compression]}'
+    await asyncio.to_thread(_create_snapshot, path, target, compression, progress)
+    return Snapshot(target, name, created, reason, compression)
+
+
+async def create_snapshot(
+    path: Path,
+    reason: str = 'manual',
+    compression: str | None = None,
+    keep: int = DEFAULT_KEEP,
+    backup_dir: Path | None = None,
+    progress: Callable[[int, int], None] | None = None,
+) -> Snapshot:
+    """Take a compressed snapshot of the database in a worker thread and apply the retention policy.
+
+    `progress` is called with copied and total pages after every step, from the worker thread.
+    """
+    backup_dir = backup_dir or BACKUP_DIR
+    snapshot = await _take_snapshot(path, reason, compression, backup_dir, progress)
+    prune_snapshots(snapshot.name, keep, backup_dir)
+    return snapshot
+
+
+def replace_contents(source: Path, target: Path, progress: Callable[[int, int], None] | None = None) -> None:
+    """Check the `source` database and copy it into `target`, page by page."""
+    conn = sqlite3.connect(browse_uri(source), uri=True)
+    try:
+        result = conn.execute('PRAGMA quick_check').fetchone()
+    finally:
+        conn.close()
+    if not result or result[0] != 'ok':
+        raise Exception(f'`{source.name}` is corrupted: {result[0] if result else "empty"}')
+
+    # NOTE: Backup into the target instead of replacing the file, so open connections see the restored data
+    _backup(source, target, progress)
+
+
+def extract_snapshot(snapshot: Snapshot, target: Path) -> None:
+    """Decompress the snapshot into a plain database file."""
+    with _open_compressed(snapshot.path, 'rb', snapshot.compression) as src, target.open('wb') as dst:
+        shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+
+
+def _restore(snapshot: Snapshot, target: Path, progress: Callable[[int, int], None] | None) -> None:
+    tmp = target.with_name(f'.{target.name}.restore')
+    try:
+        extract_snapshot(snapshot, tmp)
+        replace_contents(tmp, target, progress)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+async def restore_snapshot(
+    snapshot: Snapshot,
+    target: Path,
+    backup_dir: Path | None = None,
+    progress: Callable[[int, int], None] | None = None,
+) -> Snapshot | None:
+    """Replace the contents of `target` with the snapshot; the current contents are snapshotted first.
+
+    Returns the snapshot of the replaced contents, if there were any.
+    """
+    previous = None
+    if target.is_file() and target.stat().st_size:
+        # NOTE: Not pruned here, or the snapshot being restored could be the one to go
+        previous = await _take_snapshot(target, 'restore', snapshot.compression, backup_dir or BACKUP_DIR, None)
+    await asyncio.to_thread(_restore, snapshot, target, progress)
+    return previous
@@ -0,0 +1,455 @@
+"""Headless command line interface for scripts and cron jobs.
+
+    cluecoins-batch [--json] [--jobs N] convert --base USD [--no-backup] FILE...
+    cluecoins-batch [--json] [--jobs N] stats FILE...
+    cluecoins-batch [--json] [--jobs N] export [--format csv|jsonl|parquet] [--output DIR] FILE...
+    cluecoins-batch [--json] [--jobs N] verify FILE...
+    cluecoins-batch [--json] [--jobs N] cleanup [--rule NAME]... [--apply] [--no-backup] FILE...
+    cluecoins-batch [--json] [--jobs N] backup [--compression gzip|zstd | --dedup] [--keep N] FILE...
+    cluecoins-batch [--json] [--jobs N] restore [--snapshot PATH | --stored ID] FILE...
+    cluecoins-batch [--json] [--jobs N] diff [--against PATH] [--limit N] [--output DIR] FILE...
+    cluecoins-batch [--json] [--jobs N] archive|unarchive --account NAME [--no-backup] FILE...
+    cluecoins-batch [--json] [--jobs N] networth [--bucket day|week|month|year] [--until DATE] [--output DIR] FILE...
+
+Every file is processed independently; a failure doesn't stop the others. Exit code is `EXIT_OK` if every file
+succeeded, `EXIT_FAILED` otherwise and `EXIT_USAGE` on invalid arguments. Textual is never imported here.
+`--profile` writes a cProfile run of the whole command to the cache directory (see `cluecoins.profiling`).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from collections.abc import Awaitable
+from collections.abc import Callable
+from dataclasses import asdict
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import date
+from pathlib import Path
+from typing import Any
+
+from cluecoins.backup import COMPRESSIONS
+from cluecoins.backup import DEFAULT_KEEP
+from cluecoins.cleanup import CLEANUP_RULES
+from cluecoins.database import browse_db
+from cluecoins.database import connect_db
+from cluecoins.database import count_tables
+from cluecoins.export import EXPORT_FORMATS
+from cluecoins.header import read_header
+from cluecoins.ledger import BUCKETS
+from cluecoins.profiling import enable as enable_profiling
+from cluecoins.profiling import profile
+from cluecoins.schema import SchemaMismatchError
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+# NOTE: Integer fields that are meaningless when added up across files
+_NOT_SUMMED = {'page_size', 'user_version'}
+
+_logger = logging.getLogger('cluecoins.batch')
+
+
+class FileFailed(Exception):
+    """Failure of a single file with details to include in the result."""
+
+    def __init__(self, message: str, data: dict[str, Any] | None = None) -> None:
+        super().__init__(message)
+        self.data = data or {}
+
+
+@dataclass
+class FileResult:
+    path: str
+    ok: bool = True
+    error: str | None = None
+    data: dict[str, Any] = field(default_factory=dict)
+
+
+async def convert_file(path: Path, args: argparse.Namespace) -> dict[str, Any]:
+    from cluecoins.cli import convert
+
+    result = await convert(
+        args.base,
+        str(path),
+        lambda msg: _logger.info('%s: %s', path.name, msg),
+        snapshot=not args.no_backup,
+    )
+    return asdict(result)
+
+
+async def stats_file(path: Path, args: argparse.Namespace) -> dict[str, Any]:
+    header = read_header(path)
+    async with browse_db(path) as conn:
+        tables = dict(await count_tables(conn))
+    return {
+        'sqlite_version': header.sqlite_version if header else None,
+        'page_size': header.page_size if header else None,
+        'page_count': header.page_count if header else None,
+        'user_version': header.user_version if header else None,
+        'fingerprint': header.fingerprint if header else None,
+        'tables': tables,
+    }
+
+
+async def export_file(path: Path, args: argparse.Namespace) -> dict[str, Any]:
+    from cluecoins.export import export_transactions
+
+    output_dir = args.output or path.parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output = output_dir / f'{path.stem}.{args.format}'
+    async with browse_db(path) as conn:
+        rows = await export_transactions(conn, output, args.format)
+    return {'output': str(output), 'rows': rows}
+
+
+async def verify_file(path: Path, args: argparse.Namespace) -> dict[str, Any]:
+    from cluecoins.schema import verify_schema
+
+    header = read_header(path)
+    if header is None:
+        raise FileFailed('empty file')
+    async with browse_db(path) as conn:
+        async with conn.execute('PRAGMA integrity_check') as cur:
+            problems = [row[0] async for row in cur if row[0] != 'ok']
+        diff = await verify_schema(conn)
+    problems.extend(diff.describe())
+    if problems:
+        raise FileFailed('; '.join(problems), {'schema': asdict(diff)})
+    return {'user_version': header.user_version}
+
+
+async def cleanup_file(path: Path, args: argparse.Namespace) -> dict[str, Any]:
+    from cluecoins.backup import create_snapshot
+    from cluecoins.cleanup import cleanup
+    from cluecoins.cleanup import count_candidates
+
+    if args.apply:
+        if not args.no_backup:
+            snapshot = await create_snapshot(path, 'cleanup')
+            _logger.info('%s: snapshot saved to `%s`', path.name, snapshot.path)
+        async with connect_db(path) as conn:
+            return await cleanup(conn, args.rule)
+    async with browse_db(path) as conn:
+        return {
+            name: await count_candidates(conn, rule)
+            for name, rule in CLEANUP_RULES.items()
+            if args.rule is None or name in args.rule
+        }
+
+
+async def backup_file(path: Path, args: argparse.Namespace) -> dict[str, Any]:
+    from cluecoins.backup import create_snapshot
+
+    if args.dedup:
+        return await _store_file(path, args)
+    snapshot = await create_snapshot(path, 'manual', args.compression, args.keep)
+    return {'snapshot': str(snapshot.path), 'size': snapshot.size, 'database_size': path.stat().st_size}
+
+
+async def _store_file(path: Path, args: argparse.Namespace) -> dict[str, Any]:
+    from cluecoins.pagestore import PageStore
+
+    store = PageStore()
+    stored = await store.add(path)
+    freed = store.prune(stored.name, args.keep)
+    stats = store.stats()
+    return {
+        'stored': stored.id,
+        'pages': stored.page_count,
+        'new_pages': stored.new_pages,
+        'freed_pages': freed,
+        'store_bytes': stats.stored_bytes,
+    }
+
+
+async def restore_file(path: Path, args: argparse.Namespace) -> dict[str, Any]:
+    from cluecoins.backup import Snapshot
+    from cluecoins.backup import list_snapshots
+    from cluecoins.backup import restore_snapshot
+    from cluecoins.backup import source_name
+
+    if args.stored is not None:
+        from cluecoins.pagestore import PageStore
+
+        stored = await PageStore().restore(args.stored, path)
+        return {'stored': args.stored, 'previous': stored.id if stored else None}
+
+    if args.snapshot:
+        snapshot = Snapshot.from_path(args.snapshot)
+        if snapshot is None or not args.snapshot.is_file():
+            raise FileFailed(f'`{args.snapshot}` is not a snapshot')
+    else:
+        snapshots = list_snapshots(source_name(path))
+        if not snapshots:
+            raise FileFailed('no snapshots')
+        snapshot = snapshots[0]
+    previous = await restore_snapshot(snapshot, path)
+    return {'snapshot': str(snapshot.path), 'previous': str(previous.path) if previous else None}
+
+
+def _diff(old: Path, new: Path, args: argparse.Namespace, snapshot: bool = False) -> dict[str, Any]:
+    from cluecoins.diff import DatabaseDiff
+
+    changes: list[dict[str, Any]] = []
+    output = None
+    if args.output:
+        args.output.mkdir(parents=True, exist_ok=True)
+        output = (args.output / f'{new.stem}.diff.jsonl').open('w')
+    try:
+        with DatabaseDiff(old, new, old_immutable=snapshot) as diff:
+            for change in diff.changes():
+                if output:
+                    output.write(json.dumps(change.to_dict(), ensure_ascii=False) + '\n')
+                if len(changes) < args.limit:
+                    changes.append(change.to_dict())
+    finally:
+        if output:
+            output.close()
+
+    tables = diff.tables.values()
+    return {
+        'inserted': sum(t.inserted for t in tables),
+        'deleted': sum(t.deleted for t in tables),
+        'updated': sum(t.updated for t in tables),
+        'skipped_partitions': sum(t.skipped for t in tables),
+        'tables': {t.table: asdict(t) for t in tables if t.changed},
+        'changes': changes,
+    }
+
+
+async def diff_file(path: Path, args: argparse.Namespace) -> dict[str, Any]:
+    import tempfile
+
+    from cluecoins.backup import extract_snapshot
+    from cluecoins.backup import list_snapshots
+    from cluecoins.backup import source_name
+
+    if args.against:
+        return {'against': str(args.against), **await asyncio.to_thread(_diff, args.against, path, args)}
+
+    snapshots = list_snapshots(source_name(path))
+    if not snapshots:
+        raise FileFailed('no snapshots to compare with; use --against')
+    with tempfile.TemporaryDirectory() as tmp:
+        old = Path(tmp) / path.name
+        await asyncio.to_thread(extract_snapshot, snapshots[0], old)
+        return {'against': str(snapshots[0].path), **await asyncio.to_thread(_diff, old, path, args, True)}
+
+
+async def archive_file(path: Path, args: argparse.Namespace) -> dict[str, Any]:
+    from cluecoins.cli import archive
+
+    return asdict(await archive(args.account, str(path), _logger.info, snapshot=not args.no_backup))
+
+
+async def unarchive_file(path: Path, args: argparse.Namespace) -> dict[str, Any]:
+    from cluecoins.cli import unarchive
+
+    return asdict(await unarchive(args.account, str(path), _logger.info, snapshot=not args.no_backup))
+
+
+async def networth_file(path: Path, args: argparse.Namespace) -> dict[str, Any]:
+    from cluecoins.networth import load_net_worth
+    from cluecoins.networth import write_net_worth
+
+    result = await load_net_worth(path, args.bucket, args.until)
+    output = None
+    if args.output:
+        args.output.mkdir(parents=True, exist_ok=True)
+        output = args.output / f'{path.stem}.networth.csv'
+        write_net_worth(result, output)
+    last = result.points[-1] if result.points else None
+    return {
+        'base_currency': result.base_currency,
+        'points': len(result.points),
+        'first': result.points[0].date.isoformat() if result.points else None,
+        'last': last.date.isoformat() if last else None,
+        'net_worth': str(last.amount) if last else None,
+        'estimated': sorted(result.estimated),
+        'output': str(output) if output else None,
+    }
+
+
+COMMANDS: dict[str, Callable[[Path, argparse.Namespace], Awaitable[dict[str, Any]]]] = {
+    'convert': convert_file,
+    'stats': stats_file,
+    'export': export_file,
+    'verify': verify_file,
+    'cleanup': cleanup_file,
+    'backup': backup_file,
+    'restore': restore_file,
+    'diff': diff_file,
+    'archive': archive_file,
+    'unarchive': unarchive_file,
+    'networth': networth_file,
+}
+
+
+async def _run_file(command: str, path: Path, args: argparse.Namespace, semaphore: asyncio.Semaphore) -> FileResult:
+    async with semaphore:
+        if not path.is_file():
+            return FileResult(str(path), ok=False, error='no such file')
+        try:
+            data = await COMMANDS[command](path, args)
+        except FileFailed as e:
+            return FileResult(str(path), ok=False, error=str(e), data=e.data)
+        except SchemaMismatchError as e:
+            return FileResult(str(path), ok=False, error=str(e), data={'schema': asdict(e.diff)})
+        except Exception as e:
+            _logger.debug('%s failed', path, exc_info=True)
+            return FileResult(str(path), ok=False, error=str(e) or type(e).__name__)
+        return FileResult(str(path), data=data)
+
+
+async def convert_many_files(paths: list[Path], args: argparse.Namespace) -> list[FileResult]:
+    from cluecoins.cli import convert_many
+
+    existing = [str(path) for path in paths if path.is_file()]
+    report = await convert_many(args.base, existing, _logger.info, args.jobs, snapshot=not args.no_backup)
+    _logger.info('%s quotes prefetched', report.quotes)
+
+    results = []
+    for path in paths:
+        if str(path) in report.results:
+            results.append(FileResult(str(path), data=asdict(report.results[str(path)])))
+        else:
+            results.append(FileResult(str(path), ok=False, error=report.errors.get(str(path), 'no such file')))
+    return results
+
+
+async def run_command(command: str, paths: list[Path], args: argparse.Namespace) -> list[FileResult]:
+    """Run the command for every file, at most `args.jobs` at a time; results are in the order of `paths`."""
+    if command == 'convert' and args.jobs > 1 and len(paths) > 1:
+        return await convert_many_files(paths, args)
+
+    semaphore = asyncio.Semaphore(max(args.jobs, 1))
+    return list(await asyncio.gather(*(_run_file(command, path, args, semaphore) for path in paths)))
+
+
+def _totals(results: list[FileResult]) -> dict[str, int]:
+    """Sum of numeric fields over successful files, plus file counts."""
+    totals = {'files': len(results), 'failed': sum(not r.ok for r in results)}
+    for r in results:
+        if not r.ok:
+            continue
+        for key, value in r.data.items():
+            if isinstance(value, int) and not isinstance(value, bool) and key not in _NOT_SUMMED:
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _print_results(command: str, results: list[FileResult], as_json: bool) -> None:
+    if as_json:
+        document = {
+            'command': command,
+            'ok': all(r.ok for r in results),
+            'totals': _totals(results),
+            'results': [asdict(r) for r in results],
+        }
+        print(json.dumps(document, indent=2, ensure_ascii=False))
+        return
+
+    for r in results:
+        if not r.ok:
+            print(f'{r.path}\tFAILED\t{r.error}')
+            continue
+        details = ' '.join(f'{k}={v}' for k, v in r.data.items() if not isinstance(v, dict | list))
+        print(f'{r.path}\tok\t{details}'.rstrip())
+    if len(results) > 1:
+        print('total\t\t' + ' '.join(f'{k}={v}' for k, v in _totals(results).items()))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='cluecoins-batch', description='Process Bluecoins databases without the UI')
+    parser.add_argument('--json', action='store_true', help='print results as a JSON document')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='number of files processed at once')
+    parser.add_argument('-v', '--verbose', action='count', default=0, help='log progress to stderr')
+    parser.add_argument('--profile', action='store_true', help='profile the command, see `cluecoins.profiling`')
+
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help='update exchange rates of transactions and accounts')
+    convert.add_argument('--base', default='USD', help='base currency')
+    convert.add_argument('--no-backup', action='store_true', help="don't take a snapshot first")
+    convert.add_argument('paths', nargs='+', type=Path, metavar='FILE')
+
+    stats = commands.add_parser('stats', help='show header fields and table row counts')
+    stats.add_argument('paths', nargs='+', type=Path, metavar='FILE')
+
+    export = commands.add_parser('export', help='export transactions')
+    export.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+    export.add_argument('--output', type=Path, help='output directory (default: next to the database)')
+    export.add_argument('paths', nargs='+', type=Path, metavar='FILE')
+
+    verify = commands.add_parser('verify', help='check database integrity and required tables')
+    verify.add_argument('paths', nargs='+', type=Path, metavar='FILE')
+
+    cleanup = commands.add_parser('cleanup', help='count (or delete) empty transactions, orphan labels, unused items')
+    cleanup.add_argument('--rule', action='append', choices=tuple(CLEANUP_RULES), help='only this rule (repeatable)')
+    cleanup.add_argument('--apply', action='store_true', help='delete candidates instead of counting them')
+    cleanup.add_argument('--no-backup', action='store_true', help="don't take a snapshot before deleting")
+    cleanup.add_argument('paths', nargs='+', type=Path, metavar='FILE')
+
+    backup = commands.add_parser('backup', help='take a compressed snapshot')
+    backup_mode = backup.add_mutually_exclusive_group()
+    backup_mode.add_argument('--compression', choices=tuple(COMPRESSIONS), help='default: zstd if available, else gzip')
+    backup_mode.add_argument('--dedup', action='store_true', help='add to the deduplicated page store instead')
+    backup.add_argument('--keep', type=int, default=DEFAULT_KEEP, help='snapshots of each database to keep')
+    backup.add_argument('paths', nargs='+', type=Path, metavar='FILE')
+
+    restore = commands.add_parser('restore', help='restore a snapshot; the current contents are snapshotted first')
+    restore_from = restore.add_mutually_exclusive_group()
+    restore_from.add_argument('--snapshot', type=Path, help='snapshot file (default: the newest one of the database)')
+    restore_from.add_argument('--stored', type=int, metavar='ID', help='snapshot ID in the deduplicated page store')
+    restore.add_argument('paths', nargs='+', type=Path, metavar='FILE')
+
+    diff = commands.add_parser('diff', help='show rows changed since the newest snapshot (or another database)')
+    diff.add_argument('--against', type=Path, help='database to compare with (default: the newest snapshot)')
+    diff.add_argument('--limit', type=int, default=20, help='changed rows to include in the result')
+    diff.add_argument('--output', type=Path, help='write all changed rows to DIR/<name>.diff.jsonl')
+    diff.add_argument('paths', nargs='+', type=Path, metavar='FILE')
+
+    for name, help_ in (
+        ('archive', 'move an account with its transactions to CLUE_* tables, hiding it from Bluecoins'),
+        ('unarchive', 'move an archived account back'),
+    ):
+        command = commands.add_parser(name, help=help_)
+        command.add_argument('--account', required=True, help='account name')
+        command.add_argument('--no-backup', action='store_true', help="don't take a snapshot first")
+        command.add_argument('paths', nargs='+', type=Path, metavar='FILE')
+
+    networth = commands.add_parser('networth', help='net worth over time in the base currency')
+    networth.add_argument('--bucket', choices=BUCKETS, default='month', help='one point per bucket (default: month)')
+    networth.add_argument(
+        '--until', type=date.fromisoformat, metavar='DATE', help='last day (default: last transaction)'
+    )
+    networth.add_argument('--output', type=Path, help='write the series to DIR/<name>.networth.csv')
+    networth.add_argument('paths', nargs='+', type=Path, metavar='FILE')
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return EXIT_OK if e.code == 0 else EXIT_USAGE
+
+    level = {0: logging.WARNING, 1: logging.INFO}.get(args.verbose, logging.DEBUG)
+    logging.basicConfig(level=level, stream=sys.stderr, format='%(asctime)s %(levelname)s %(message)s')
+
+    if args.profile:
+        enable_profiling(args.command)
+    with profile(args.command, log=lambda line: print(line, file=sys.stderr)):
+        results = asyncio.run(run_command(args.command, args.paths, args))
+    _print_results(args.command, results, args.json)
+    return EXIT_OK if all(r.ok for r in results) else EXIT_FAILED
+
+
+def run() -> None:
+    sys.exit(main())
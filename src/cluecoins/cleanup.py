@@ -0,0 +1,94 @@
+"""Find and remove empty transactions, orphan labels and unused items.
+
+Every rule is a single predicate used both to preview candidates and to delete them, so a cleanup is a few
+`DELETE ... WHERE` statements no matter how many rows match. All of them run in one transaction.
+"""
+
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from typing import Any
+
+from cluecoins.items import SYSTEM_ITEM_IDS
+from cluecoins.schema import ensure_schema
+
+if TYPE_CHECKING:
+    from aiosqlite import Connection
+
+_CHUNK_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class CleanupRule:
+    name: str
+    description: str
+    table: str
+    columns: tuple[str, ...]
+    where: str
+
+
+# NOTE: Order matters: labels of deleted transactions become orphans, items used only by them become unused
+CLEANUP_RULES = {
+    rule.name: rule
+    for rule in (
+        CleanupRule(
+            'empty_transactions',
+            'transactions with zero amount',
+            'TRANSACTIONSTABLE',
+            ('transactionsTableID', 'date', 'transactionTypeID', 'accountID', 'notes'),
+            # NOTE: 'New Account' transactions hold the opening balance of an account, zero or not
+            'amount = 0 AND transactionTypeID != 2',
+        ),
+        CleanupRule(
+            'orphan_labels',
+            'labels of transactions that no longer exist',
+            'LABELSTABLE',
+            ('labelsTableID', 'labelName', 'transactionIDLabels'),
+            # NOTE: Labels with NULL `transactionIDLabels` are label definitions, not orphans
+            'transactionIDLabels IS NOT NULL AND NOT EXISTS '
+            '(SELECT 1 FROM TRANSACTIONSTABLE t WHERE t.transactionsTableID = transactionIDLabels)',
+        ),
+        CleanupRule(
+            'unused_items',
+            'items not used by any transaction',
+            'ITEMTABLE',
+            ('itemTableID', 'itemName'),
+            # NOTE: `itemID` isn't indexed; NOT IN builds the set of used IDs once instead of a scan per item
+            f'itemTableID NOT IN ({", ".join(map(str, sorted(SYSTEM_ITEM_IDS)))}) AND itemTableID NOT IN '
+            '(SELECT itemID FROM TRANSACTIONSTABLE WHERE itemID IS NOT NULL)',
+        ),
+    )
+}
+
+
+async def count_candidates(conn: 'Connection', rule: CleanupRule) -> int:
+    async with conn.execute(f'SELECT COUNT(*) FROM {rule.table} WHERE {rule.where}') as cur:
+        row = await cur.fetchone()
+    return row[0] if row else 0
+
+
+async def iter_candidates(
+    conn: 'Connection',
+    rule: CleanupRule,
+    chunk_size: int = _CHUNK_SIZE,
+) -> AsyncIterator[list[Any]]:
+    """Rows matching the rule, `chunk_size` at a time."""
+    async with conn.execute(f'SELECT {", ".join(rule.columns)} FROM {rule.table} WHERE {rule.where}') as cur:
+        while rows := await cur.fetchmany(chunk_size):
+            yield list(rows)
+
+
+async def cleanup(conn: 'Connection', names: list[str] | None = None) -> dict[str, int]:
+    """Delete candidates of the given rules (all by default) in one transaction; returns deleted rows per rule."""
+    await ensure_schema(conn)
+    rules = [rule for name, rule in CLEANUP_RULES.items() if names is None or name in names]
+    deleted = {}
+    try:
+        for rule in rules:
+            cur = await conn.execute(f'DELETE FROM {rule.table} WHERE {rule.where}')
+            deleted[rule.name] = cur.rowcount
+        await conn.commit()
+    except Exception:
+        await conn.rollback()
+        raise
+    return deleted
@@ -1,147 +1,227 @@
-import logging
+import asyncio
+import multiprocessing
 from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
 from datetime import date
 from decimal import Decimal
-
-# from cluecoins.database import ENCODED_LABEL_PREFIX
+from pathlib import Path
+
+from cluecoins.archive import ArchiveResult
+from cluecoins.archive import archive_account
+from cluecoins.archive import find_account
+from cluecoins.archive import unarchive_account
+from cluecoins.backup import create_snapshot
+from cluecoins.database import connect_db
 from cluecoins.database import connect_local_db
 
-# from cluecoins.database import create_archived_account
-# from cluecoins.database import delete_label
-# from cluecoins.database import find_labels_by_transaction_id
-# from cluecoins.database import find_transactions_by_label
 # from cluecoins.database import get_base_currency
-# from cluecoins.database import get_transactions_list
 from cluecoins.database import iter_accounts
+from cluecoins.database import iter_rate_dates
 from cluecoins.database import iter_transactions
-
-# from cluecoins.database import move_transactions_to_account_with_id
 from cluecoins.database import set_base_currency
 from cluecoins.database import update_account
 from cluecoins.database import update_transaction
+from cluecoins.profiling import profile
 from cluecoins.quotes import CurrencyBeaconQuoteProvider
+from cluecoins.schema import ensure_schema
 
 # from cluecoins.storage import BluecoinsStorage
 from cluecoins.storage import LocalStorage
 
-logging.basicConfig(level=logging.DEBUG)
-
 
 def q(v: Decimal, prec: int = 2) -> Decimal:
     return v.quantize(Decimal(f'0.{prec * "0"}'))
 
 
-# def cli(path: str) -> None:
-#     """Manual path database selection."""
-
-#     backup_path = Path(path).parent / (Path(path).name + '.bak')
-#     backup_path.write_bytes(Path(path).read_bytes())
-
-
-async def convert(base_currency: str, db_path: str, log: Callable) -> None:
-    conn = connect_local_db(db_path)
-
-    storage = LocalStorage()
-
-    async with storage.connect(), conn:
-        cache = CurrencyBeaconQuoteProvider(storage, log)
-        await storage.create_schema()
-
-        await set_base_currency(conn, base_currency)
-
-        async for date_, id_, rate, currency, amount in iter_transactions(conn):
-            true_rate = await cache.get_rate(date_.date(), base_currency, currency)
-
-            if true_rate is None or true_rate == rate:
-                continue
+@dataclass
+class ConvertResult:
+    transactions: int = 0
+    accounts: int = 0
 
-            amount_original = amount * rate
-            amount_quote = amount_original / true_rate
 
-            await update_transaction(conn, id_, true_rate, amount_quote)
-            log(
-                f'transaction `{id_}` updated: {q(amount_original)} {currency} -> {q(amount_quote)} {base_currency} ({q(rate)} -> {q(true_rate)})'
-            )
+@dataclass
+class ConvertReport:
+    quotes: int = 0
+    results: dict[str, ConvertResult] = field(default_factory=dict)
+    errors: dict[str, str] = field(default_factory=dict)
 
-        today = date.today()
-        async for id_, currency, rate in iter_accounts(conn):
-            true_rate = await cache.get_rate(today, base_currency, currency)
+    @property
+    def transactions(self) -> int:
+        return sum(r.transactions for r in self.results.values())
 
-            if true_rate is None or true_rate == rate:
-                continue
+    @property
+    def accounts(self) -> int:
+        return sum(r.accounts for r in self.results.values())
 
-            await update_account(conn, id_, true_rate)
-            log(f'account `{id_}` updated: {base_currency}{currency} ({q(rate)} -> {q(true_rate)})')
-
-        await storage.commit()
-        await conn.commit()
 
-        log('Done!')
-
-
-# async def archive(
-#     account_name: str,
-#     db_path: str,
-# ) -> None:
-#     """Archive account:
-#     1. Create CLUE tables, if doesn't exist: 'CLUE_ACCOUNTSTABLE', 'CLUE_TRANSACTIONSTABLE', 'CLUE_LABELSTABLE'
-#     2. Move the account, transactions, and labels to CLUE tables.
-#     """
+async def convert(
+    base_currency: str,
+    db_path: str,
+    log: Callable,
+    storage: LocalStorage | None = None,
+    snapshot: bool = True,
+) -> ConvertResult:
+    """Update exchange rates of transactions and accounts; a snapshot of the database is taken first."""
+    conn = connect_local_db(db_path)
+    result = ConvertResult()
 
-#     conn = connect_local_db(db_path)
+    storage = storage or LocalStorage()
 
-#     bluecoins_storage = BluecoinsStorage(conn)
+    with profile('convert', Path(db_path).stem, log):
+        async with storage.connect(), conn:
+            cache = CurrencyBeaconQuoteProvider(storage, log)
+            if not storage.read_only:
+                await storage.create_schema()
 
-#     async with conn:
-#         account_id = await bluecoins_storage.get_account_id(account_name)
-#         if account_id is None:
-#             raise Exception(f'Account {account_name} does not exist')
+            await ensure_schema(conn)
+            if snapshot:
+                backup = await create_snapshot(Path(db_path), 'convert')
+                log(f'snapshot saved to `{backup.path}`')
+            await set_base_currency(conn, base_currency)
 
-#         necessary_tables = ['ACCOUNTSTABLE', 'TRANSACTIONSTABLE', 'LABELSTABLE']
-#         await bluecoins_storage.create_clue_tables(necessary_tables)
+            async for date_, id_, rate, currency, amount in iter_transactions(conn):
+                true_rate = await cache.get_rate(date_.date(), base_currency, currency)
 
-#         transactions_list = await get_transactions_list(conn, account_id)
-#         for transaction_id in transactions_list:
-#             await bluecoins_storage.move_data_to_table_by_id('LABELSTABLE', 'transactionIDLabels', transaction_id[0])
+                if true_rate is None or true_rate == rate:
+                    continue
 
-#         await bluecoins_storage.move_data_to_table_by_id('TRANSACTIONSTABLE', 'accountID', account_id)
+                amount_original = amount * rate
+                amount_quote = amount_original / true_rate
 
-#         # NOTE: what to do if account already exist in CLUE_ACCOUNTSTABLE?
-#         # If account exist - add _2 in the end name of account
-#         await bluecoins_storage.move_data_to_table_by_id('ACCOUNTSTABLE', 'accountsTableID', account_id)
+                await update_transaction(conn, id_, true_rate, amount_quote)
+                result.transactions += 1
+                log(
+                    f'transaction `{id_}` updated: {q(amount_original)} {currency} -> {q(amount_quote)} {base_currency} ({q(rate)} -> {q(true_rate)})'
+                )
 
+            today = date.today()
+            async for id_, currency, rate in iter_accounts(conn):
+                true_rate = await cache.get_rate(today, base_currency, currency)
 
-# async def unarchive(
-#     account_name: str,
-#     db_path: str,
-# ) -> None:
-#     conn = connect_local_db(db_path)
+                if true_rate is None or true_rate == rate:
+                    continue
 
-#     bluecoins_storage = BluecoinsStorage(conn)
+                await update_account(conn, id_, true_rate)
+                result.accounts += 1
+                log(f'account `{id_}` updated: {base_currency}{currency} ({q(rate)} -> {q(true_rate)})')
 
-#     async with conn:
-#         # create account
-#         account_info = await bluecoins_storage.decode_account_info(account_name)
-#         await create_archived_account(conn, account_info)
+            if not storage.read_only:
+                await storage.commit()
+            await conn.commit()
 
-#         label_name = 'clue_' + account_name
-#         id_transactions = await find_transactions_by_label(conn, label_name)
+            log('Done!')
 
-#         # get account IDs
-#         acc_new_id = bluecoins_storage.get_account_id(account_name)
-#         if acc_new_id is None:
-#             raise Exception(f'Account {account_name} does not exist')
+    return result
 
-#         # move transactions
-#         for id in id_transactions:
-#             await move_transactions_to_account_with_id(conn, id[0], acc_new_id)
 
-#             await delete_label(conn, label_name)
+async def prefetch_quotes(base_currency: str, db_paths: list[str], log: Callable) -> int:
+    """Fill the quote cache with everything `convert` needs for these databases; returns the number of quotes."""
+    requests: set[tuple[date, str]] = set()
+    today = date.today()
+    for db_path in db_paths:
+        async with connect_db(db_path, read_only=True) as conn:
+            requests.update([key async for key in iter_rate_dates(conn)])
+            requests.update([(today, currency) async for _, currency, _ in iter_accounts(conn)])
 
-#             labels_list = await find_labels_by_transaction_id(conn, id[0])
-#             for label in labels_list:
-#                 if label[0].startswith(ENCODED_LABEL_PREFIX):
-#                     await delete_label(conn, label[0])
+    storage = LocalStorage()
+    async with storage.connect():
+        await storage.create_schema()
+        cache = CurrencyBeaconQuoteProvider(storage, log)
+        # NOTE: Newest first, like `convert`; every fetch covers the preceding months too
+        for date_, currency in sorted(requests, reverse=True):
+            await cache.get_rate(date_, base_currency, currency)
+        await storage.commit()
+    return len(requests)
+
+
+def _convert_worker(
+    base_currency: str, db_path: str, storage_db_path: Path, cache_path: Path
+) -> tuple[ConvertResult, list[str]]:
+    """Convert in a pool process; messages are returned to be logged by the parent, where logging is configured."""
+    storage = LocalStorage(storage_db_path, cache_path, read_only=True)
+    messages: list[str] = []
+    result = asyncio.run(convert(base_currency, db_path, messages.append, storage, snapshot=False))
+    return result, messages
+
+
+async def convert_many(
+    base_currency: str,
+    db_paths: list[str],
+    log: Callable,
+    jobs: int,
+    snapshot: bool = True,
+) -> ConvertReport:
+    """Convert databases in a process pool.
+
+    Quotes are prefetched and snapshots are taken once in this process; workers open the quote cache read-only, so
+    the only writers are the workers to their own database files and nothing waits on a shared SQLite lock.
+    """
+    report = ConvertReport()
+    report.quotes = await prefetch_quotes(base_currency, db_paths, log)
+    backups = await asyncio.gather(
+        *(create_snapshot(Path(p), 'convert') for p in db_paths if snapshot),
+        return_exceptions=True,
+    )
+    for db_path, backup in zip(db_paths if snapshot else [], backups, strict=True):
+        if isinstance(backup, BaseException):
+            report.errors[db_path] = f'snapshot failed: {backup}'
+            log(f'`{db_path}` failed: {report.errors[db_path]}')
+        else:
+            log(f'snapshot saved to `{backup.path}`')
+    db_paths = [p for p in db_paths if p not in report.errors]
+
+    paths = LocalStorage()
+    loop = asyncio.get_running_loop()
+    # NOTE: Not fork; aiosqlite threads are running here already and a forked child may inherit their locks
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context) as pool:
+        futures = [
+            loop.run_in_executor(pool, _convert_worker, base_currency, db_path, paths.db_path, paths.cache_path)
+            for db_path in db_paths
+        ]
+        outcomes = await asyncio.gather(*futures, return_exceptions=True)
+
+    for db_path, outcome in zip(db_paths, outcomes, strict=True):
+        if isinstance(outcome, BaseException):
+            report.errors[db_path] = str(outcome) or type(outcome).__name__
+            log(f'`{db_path}` failed: {report.errors[db_path]}')
+        else:
+            result, messages = outcome
+            for message in messages:
+                log(f'{Path(db_path).name}: {message}')
+            report.results[db_path] = result
+            log(f'`{db_path}` converted: {result.transactions} transactions, {result.accounts} accounts')
+    return report
+
+
+async def archive(account_name: str, db_path: str, log: Callable, snapshot: bool = True) -> ArchiveResult:
+    """Move the account with its transactions and labels to `CLUE_*` tables; a snapshot is taken first."""
+    async with connect_local_db(db_path) as conn:
+        account_id = await find_account(conn, account_name)
+        if account_id is None:
+            raise Exception(f'Account {account_name} does not exist')
+        if snapshot:
+            backup = await create_snapshot(Path(db_path), 'archive')
+            log(f'snapshot saved to `{backup.path}`')
+        result = await archive_account(conn, account_id)
+    log(f'account `{account_name}` archived: {result.transactions} transactions, {result.labels} labels')
+    return result
+
+
+async def unarchive(account_name: str, db_path: str, log: Callable, snapshot: bool = True) -> ArchiveResult:
+    """Move an archived account back from `CLUE_*` tables; a snapshot is taken first."""
+    async with connect_local_db(db_path) as conn:
+        account_id = await find_account(conn, account_name, archived=True)
+        if account_id is None:
+            raise Exception(f'Account {account_name} is not archived')
+        if snapshot:
+            backup = await create_snapshot(Path(db_path), 'unarchive')
+            log(f'snapshot saved to `{backup.path}`')
+        result = await unarchive_account(conn, account_id)
+    log(f'account `{account_name}` unarchived: {result.transactions} transactions, {result.labels} labels')
+    return result
 
 
 # async def create_account(
@@ -172,31 +252,3 @@ async def convert(base_currency: str, db_path: str, log: Callable) -> None:
 #             return print('account is not exist')
 #         await bluecoins_storage.add_label(account_id, label_name)
 #         return None
-
-
-# async def _unarchive_v2(
-#     account: str,
-#     db_path: str,
-# ) -> None:
-#     """Move all data: account, transactions, labels; from Cluecoins tables to Bluecoins Tables"""
-
-#     conn = connect_local_db(db_path)
-
-#     bluecoins_storage = BluecoinsStorage(conn)
-
-#     async with conn:
-#         account_id = await bluecoins_storage.get_account_id(account, True)
-#         if account_id is None:
-#             raise Exception(f'Account {account} does not exist')
-
-#         transactions_list = await get_transactions_list(conn, account_id)
-#         for transaction_id in transactions_list:
-#             await bluecoins_storage.move_data_to_table_by_id(
-#                 'LABELSSTABLE', 'transactionIDLabels', transaction_id[0], True
-#             )
-
-#         await bluecoins_storage.move_data_to_table_by_id('TRANSACTIONSTABLE', 'accountID', account_id, True)
-
-#         # NOTE: what to do if account already exist in CLUE_ACCOUNTSTABLE?
-#         # If account exist - add _2 in the end name of account
-#         await bluecoins_storage.move_data_to_table_by_id('ACCOUNTSTABLE', 'accountsTableID', account_id, True)
@@ -1,36 +1,98 @@
 """Module with queries to the Bluecoins database."""
 
 from collections.abc import AsyncIterator
+from collections.abc import Sequence
+from contextlib import asynccontextmanager
+from datetime import date
 from datetime import datetime
 from decimal import Decimal
+from pathlib import Path
+from typing import TYPE_CHECKING
 from typing import Any
 
-from aiosqlite import Connection
-from aiosqlite import connect
+from cluecoins.filters import TransactionFilter
+
+if TYPE_CHECKING:
+    from aiosqlite import Connection
 
 # LABEL_PREFIX = 'clue_'
 # ENCODED_LABEL_PREFIX = 'clue_base64_'
 
 
-def connect_local_db(path: str) -> Connection:
+# NOTE: Applied by `browse_db`; sizes are upper bounds, SQLite maps and caches only the pages it reads
+BROWSE_PRAGMAS = (
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA cache_size = -65536',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA query_only = ON',
+)
+
+
+def _connect(database: Path | str, **kwargs: Any) -> 'Connection':
+    # NOTE: aiosqlite is imported on first use to keep the app startup fast
+    from aiosqlite import connect
+
+    from cluecoins.tracing import TracedConnection
+    from cluecoins.tracing import get_tracer
+
+    if get_tracer():
+        kwargs['factory'] = TracedConnection
+    return connect(database, **kwargs)
+
+
+def browse_uri(path: Path | str, immutable: bool = False) -> str:
+    """URI opening the database read-only.
+
+    `immutable` also skips locking and change detection; only for files nothing writes to anymore, like snapshots.
+    """
+    uri = f'{Path(path).resolve().as_uri()}?mode=ro'
+    return f'{uri}&immutable=1' if immutable else uri
+
+
+def connect_db(path: Path | str, read_only: bool = False) -> 'Connection':
+    if read_only:
+        return _connect(browse_uri(path), uri=True)
+    return _connect(path)
+
+
+@asynccontextmanager
+async def browse_db(path: Path | str, immutable: bool = False) -> AsyncIterator['Connection']:
+    """Read-only connection for screens and reports that only read, with `BROWSE_PRAGMAS`.
+
+    Pages are read through a memory map instead of copied into the page cache, sorts of unindexed columns stay in
+    memory, and `query_only` turns any write into an error, so browsing can't change the file.
+    """
+    async with _connect(browse_uri(path, immutable), uri=True) as conn:
+        await conn.executescript(';'.join(BROWSE_PRAGMAS))
+        yield conn
+
+
+def connect_local_db(path: str) -> 'Connection':
     if not path.endswith('.fydb'):
         raise Exception('wrong extension')
-    return connect(path)
+    return connect_db(path)
 
 
-async def set_base_currency(conn: Connection, base_currency: str) -> None:
+async def get_base_currency(conn: 'Connection') -> str | None:
+    async with conn.execute('SELECT defaultSettings FROM SETTINGSTABLE WHERE settingsTableID = 1') as cur:
+        row = await cur.fetchone()
+    return row[0] if row else None
+
+
+async def set_base_currency(conn: 'Connection', base_currency: str) -> None:
     await conn.execute(
         'UPDATE SETTINGSTABLE SET defaultSettings = ? WHERE settingsTableID = "1";',
         (base_currency,),
     )
 
 
+ITER_TRANSACTIONS_QUERY = 'SELECT date, transactionsTableID, conversionRateNew, transactionCurrency, amount FROM TRANSACTIONSTABLE WHERE transactionTypeID IN (3, 4) ORDER BY date DESC'
+
+
 async def iter_transactions(
-    conn: Connection,
+    conn: 'Connection',
 ) -> AsyncIterator[tuple[datetime, int, Decimal, str, Decimal]]:
-    async with conn.execute(
-        'SELECT date, transactionsTableID, conversionRateNew, transactionCurrency, amount FROM TRANSACTIONSTABLE WHERE transactionTypeID IN (3, 4) ORDER BY date DESC'
-    ) as cursor:
+    async with conn.execute(ITER_TRANSACTIONS_QUERY) as cursor:
         async for date_, id_, rate, currency, amount in cursor:
             date_ = datetime.fromisoformat(date_)
             rate = Decimal(str(rate))
@@ -38,7 +100,16 @@ async def iter_transactions(
             yield date_, id_, rate, currency, amount
 
 
-async def update_transaction(conn: Connection, id_: int, rate: Decimal, amount: Decimal) -> None:
+async def iter_rate_dates(conn: 'Connection') -> AsyncIterator[tuple[date, str]]:
+    """Distinct days and currencies `convert` needs a quote for."""
+    async with conn.execute(
+        'SELECT DISTINCT substr(date, 1, 10), transactionCurrency FROM TRANSACTIONSTABLE WHERE transactionTypeID IN (3, 4)'
+    ) as cursor:
+        async for day, currency in cursor:
+            yield date.fromisoformat(day), currency
+
+
+async def update_transaction(conn: 'Connection', id_: int, rate: Decimal, amount: Decimal) -> None:
     int_amount = int(amount * 1000000)
     await conn.execute(
         'UPDATE TRANSACTIONSTABLE SET conversionRateNew = ?, amount = ? WHERE transactionsTableID = ?',
@@ -47,7 +118,7 @@ async def update_transaction(conn: Connection, id_: int, rate: Decimal, amount:
 
 
 async def iter_accounts(
-    conn: Connection, old_currency: str = 'USDT', new_currency: str = 'USD'
+    conn: 'Connection', old_currency: str = 'USDT', new_currency: str = 'USD'
 ) -> AsyncIterator[tuple[int, str, Decimal]]:
     async with conn.execute(
         'SELECT accountsTableID, accountCurrency, accountConversionRateNew FROM ACCOUNTSTABLE;'
@@ -58,7 +129,7 @@ async def iter_accounts(
             yield id_, currency, rate
 
 
-async def update_account(conn: Connection, id_: int, rate: Decimal) -> None:
+async def update_account(conn: 'Connection', id_: int, rate: Decimal) -> None:
     await conn.execute(
         'UPDATE ACCOUNTSTABLE SET accountConversionRateNew = ? WHERE accountsTableID = ?',
         (str(rate), id_),
@@ -82,37 +153,105 @@ _ITEM_COLS = ['itemTableID', 'itemName', 'itemAutoFillVisibility']
 
 
 async def fetch_transactions_page(
-    conn: Connection,
+    conn: 'Connection',
     offset: int = 0,
     limit: int = 1000,
     sort_col: str = 'date',
     sort_asc: bool = False,
+    filter_: TransactionFilter | None = None,
+    after: tuple[Any, int] | None = None,
 ) -> tuple[list[str], list[Any]]:
+    """Fetch a page of transactions matching the filter.
+
+    `after` is a keyset cursor, `(sort value, transactionsTableID)` of the last row of the previous page (see
+    `transactions_page_cursor`). With it the page starts right after that row using an index seek, and `offset`
+    should be 0.
+    """
+    rows: list[Any] = []
+    for keyset, keyset_params in _keyset_clauses(sort_col, sort_asc, after):
+        sql, params = transactions_page_query(sort_col, sort_asc, filter_, keyset)
+        async with conn.execute(sql, (*params, *keyset_params, limit - len(rows), offset)) as cur:
+            rows.extend(await cur.fetchall())
+        if len(rows) >= limit:
+            break
+    return _TRANSACTION_COLS, rows
+
+
+def transactions_page_cursor(row: Sequence[Any], sort_col: str) -> tuple[Any, int]:
+    """Keyset cursor pointing after a row returned by `fetch_transactions_page`."""
+    col = sort_col if sort_col in _TRANSACTION_SORT_MAP else 'date'
+    return row[_TRANSACTION_COLS.index(col)], row[0]
+
+
+def transactions_page_query(
+    sort_col: str,
+    sort_asc: bool,
+    filter_: TransactionFilter | None,
+    keyset: str | None = None,
+) -> tuple[str, list[Any]]:
     sql_col = _TRANSACTION_SORT_MAP.get(sort_col, 't.date')
     direction = 'ASC' if sort_asc else 'DESC'
-    async with conn.execute(
-        f"""SELECT t.transactionsTableID, t.date, t.amount, t.transactionCurrency,
+    where, params = (filter_ or TransactionFilter()).compile()
+    if keyset:
+        where = f'{where} AND {keyset}' if where else f'WHERE {keyset}'
+    sql = f"""SELECT t.transactionsTableID, t.date, t.amount, t.transactionCurrency,
                t.conversionRateNew, t.transactionTypeID, t.categoryID,
                t.accountID, t.accountPairID, t.notes,
                i.itemName
             FROM TRANSACTIONSTABLE t
             LEFT JOIN ITEMTABLE i ON i.itemTableID = t.itemID
-            ORDER BY {sql_col} {direction}
-            LIMIT ? OFFSET ?""",
-        (limit, offset),
-    ) as cur:
-        rows: list[Any] = list(await cur.fetchall())
-    return _TRANSACTION_COLS, rows
+            {where}
+            ORDER BY {sql_col} {direction}, t.transactionsTableID {direction}
+            LIMIT ? OFFSET ?"""
+    return sql, params
+
 
+def _keyset_clauses(sort_col: str, sort_asc: bool, after: tuple[Any, int] | None) -> list[tuple[str, list[Any]]]:
+    """Conditions selecting rows after the cursor, in order; each of them is a single index range.
 
-async def count_transactions(conn: Connection) -> int:
-    async with conn.execute('SELECT COUNT(*) FROM TRANSACTIONSTABLE') as cur:
+    SQLite puts NULLs first in ascending order and last in descending. Mixing NULL handling into one condition
+    (row values can't be used, NULL never compares) leaves no range to seek, so the region of the cursor and the
+    region following it are queried separately.
+    """
+    if after is None:
+        return [('', [])]
+    sql_col = _TRANSACTION_SORT_MAP.get(sort_col, 't.date')
+    value, id_ = after
+    match sort_asc, value is None:
+        case True, True:
+            return [(f'{sql_col} IS NULL AND t.transactionsTableID > ?', [id_]), (f'{sql_col} IS NOT NULL', [])]
+        case True, False:
+            return [(f'{sql_col} >= ? AND ({sql_col} > ? OR t.transactionsTableID > ?)', [value, value, id_])]
+        case False, False:
+            return [
+                (f'{sql_col} <= ? AND ({sql_col} < ? OR t.transactionsTableID < ?)', [value, value, id_]),
+                (f'{sql_col} IS NULL', []),
+            ]
+        case _:
+            return [(f'{sql_col} IS NULL AND t.transactionsTableID < ?', [id_])]
+
+
+async def explain_transactions_page(
+    conn: 'Connection',
+    sort_col: str = 'date',
+    sort_asc: bool = False,
+    filter_: TransactionFilter | None = None,
+) -> list[str]:
+    """`EXPLAIN QUERY PLAN` of the page query, one line per step."""
+    sql, params = transactions_page_query(sort_col, sort_asc, filter_)
+    async with conn.execute(f'EXPLAIN QUERY PLAN {sql}', (*params, 1, 0)) as cur:
+        return [row[3] async for row in cur]
+
+
+async def count_transactions(conn: 'Connection', filter_: TransactionFilter | None = None) -> int:
+    where, params = (filter_ or TransactionFilter()).compile()
+    async with conn.execute(f'SELECT COUNT(*) FROM TRANSACTIONSTABLE t {where}', params) as cur:
         row = await cur.fetchone()
     return row[0] if row else 0
 
 
 async def fetch_accounts_page(
-    conn: Connection,
+    conn: 'Connection',
     offset: int = 0,
     limit: int = 1000,
     sort_col: str = 'accountsTableID',
@@ -129,14 +268,14 @@ async def fetch_accounts_page(
     return _ACCOUNT_COLS, rows
 
 
-async def count_accounts(conn: Connection) -> int:
+async def count_accounts(conn: 'Connection') -> int:
     async with conn.execute('SELECT COUNT(*) FROM ACCOUNTSTABLE') as cur:
         row = await cur.fetchone()
     return row[0] if row else 0
 
 
 async def fetch_items_page(
-    conn: Connection,
+    conn: 'Connection',
     offset: int = 0,
     limit: int = 1000,
     sort_col: str = 'itemTableID',
@@ -153,17 +292,37 @@ async def fetch_items_page(
     return _ITEM_COLS, rows
 
 
-async def count_items(conn: Connection) -> int:
+async def count_items(conn: 'Connection') -> int:
     async with conn.execute('SELECT COUNT(*) FROM ITEMTABLE') as cur:
         row = await cur.fetchone()
     return row[0] if row else 0
 
 
-async def rename_item(conn: Connection, item_id: int, new_name: str) -> None:
+async def count_tables(conn: 'Connection') -> list[tuple[str, int | str]]:
+    """Row count of every table; `'err'` if a table can't be read (e.g. a virtual table of an unknown module)."""
+    async with conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    ) as cur:
+        tables = await cur.fetchall()
+
+    counts: list[tuple[str, int | str]] = []
+    for (table_name,) in tables:
+        count: int | str
+        try:
+            async with conn.execute(f"SELECT COUNT(*) FROM '{table_name}'") as cur:
+                row = await cur.fetchone()
+            count = row[0] if row is not None else 0
+        except Exception:
+            count = 'err'
+        counts.append((table_name, count))
+    return counts
+
+
+async def rename_item(conn: 'Connection', item_id: int, new_name: str) -> None:
     await conn.execute('UPDATE ITEMTABLE SET itemName = ? WHERE itemTableID = ?', (new_name, item_id))
 
 
-# async def find_account(conn: Connection, account_name: str, revert: bool = False) -> Any:
+# async def find_account(conn: 'Connection', account_name: str, revert: bool = False) -> Any:
 #     table = 'ACCOUNTSTABLE'
 
 #     if revert:
@@ -176,33 +335,28 @@ async def rename_item(conn: Connection, item_id: int, new_name: str) -> None:
 #         return await cursor.fetchone()
 
 
-# async def get_accounts_list(conn: Connection) -> list[Any]:
+# async def get_accounts_list(conn: 'Connection') -> list[Any]:
 #     async with conn.execute(
 #         'SELECT accountName, accountConversionRateNew FROM ACCOUNTSTABLE',
 #     ) as cursor:
 #         return list(await cursor.fetchall())
 
 
-# async def find_account_transactions_id(conn: Connection, account_id: int) -> Cursor:
+# async def find_account_transactions_id(conn: 'Connection', account_id: int) -> Cursor:
 #     return await conn.execute(
 #         'SELECT transactionsTableID FROM TRANSACTIONSTABLE WHERE accountID = ?',
 #         (account_id,),
 #     )
 
 
-# async def add_label_to_transaction(conn: Connection, label_name: str, transaction_id: int) -> None:
+# async def add_label_to_transaction(conn: 'Connection', label_name: str, transaction_id: int) -> None:
 #     await conn.execute(
 #         'INSERT INTO LABELSTABLE(labelName,transactionIDLabels) VALUES(?, ?)',
 #         (label_name, transaction_id),
 #     )
 
 
-# async def get_base_currency(conn: Connection) -> Any:
-#     base_currency = await conn.execute('SELECT defaultSettings FROM SETTINGSTABLE WHERE settingsTableID = 1;')
-#     return (await base_currency.fetchone())[0]
-
-
-# async def create_new_account(conn: Connection, account_name: str, account_currency: str) -> None:
+# async def create_new_account(conn: 'Connection', account_name: str, account_currency: str) -> None:
 #     # TODO: make variables mutable - accountTypeID and accountConversionRateNew (type: asset, rate: n/a)
 #     await conn.execute(
 #         'INSERT INTO ACCOUNTSTABLE(accountName, accountTypeID, accountCurrency, accountConversionRateNew) \
@@ -211,7 +365,7 @@ async def rename_item(conn: Connection, item_id: int, new_name: str) -> None:
 #     )
 
 
-# async def create_archived_account(conn: Connection, account_info: tuple[Any, ...]) -> None:
+# async def create_archived_account(conn: 'Connection', account_info: tuple[Any, ...]) -> None:
 #     (
 #         account_name,
 #         account_type_id,
@@ -252,7 +406,7 @@ async def rename_item(conn: Connection, item_id: int, new_name: str) -> None:
 #     )
 
 
-# async def move_transactions_to_account(conn: Connection, account_id_old: int, account_id_new: int) -> None:
+# async def move_transactions_to_account(conn: 'Connection', account_id_old: int, account_id_new: int) -> None:
 #     await conn.execute(
 #         'UPDATE TRANSACTIONSTABLE SET accountID = ? WHERE accountID = ?',
 #         (account_id_new, account_id_old),
@@ -263,14 +417,14 @@ async def rename_item(conn: Connection, item_id: int, new_name: str) -> None:
 #     )
 
 
-# async def delete_account(conn: Connection, account_id: int) -> None:
+# async def delete_account(conn: 'Connection', account_id: int) -> None:
 #     await conn.execute(
 #         'DELETE FROM ACCOUNTSTABLE WHERE accountsTableID = ?',
 #         (account_id,),
 #     )
 
 
-# async def find_transactions_by_label(conn: Connection, label_name: str) -> list[tuple[int]]:
+# async def find_transactions_by_label(conn: 'Connection', label_name: str) -> list[tuple[int]]:
 #     async with await conn.execute(
 #         'SELECT transactionIDLabels FROM LABELSTABLE where labelName = ?',
 #         (label_name,),
@@ -278,7 +432,7 @@ async def rename_item(conn: Connection, item_id: int, new_name: str) -> None:
 #         return await cursor.fetchall()
 
 
-# async def get_archived_accounts(conn: Connection) -> list[Any]:  # change Any
+# async def get_archived_accounts(conn: 'Connection') -> list[Any]:  # change Any
 #     async with conn.execute(
 #         f"SELECT DISTINCT substr(labelName, 6) FROM LABELSTABLE \
 #             WHERE labelName LIKE '{LABEL_PREFIX}%' \
@@ -289,7 +443,7 @@ async def rename_item(conn: Connection, item_id: int, new_name: str) -> None:
 #         return list(await cursor.fetchall())
 
 
-# async def move_transactions_to_account_with_id(conn: Connection, transaction_id: int, acc_new_id: int) -> None:
+# async def move_transactions_to_account_with_id(conn: 'Connection', transaction_id: int, acc_new_id: int) -> None:
 #     await conn.execute(
 #         'UPDATE TRANSACTIONSTABLE SET accountID = ? WHERE transactionsTableID = ?',
 #         (acc_new_id, transaction_id),
@@ -300,14 +454,14 @@ async def rename_item(conn: Connection, item_id: int, new_name: str) -> None:
 #     )
 
 
-# async def delete_label(conn: Connection, label_name: str) -> None:
+# async def delete_label(conn: 'Connection', label_name: str) -> None:
 #     await conn.execute(
 #         'DELETE FROM LABELSTABLE WHERE labelName = ?',
 #         (label_name,),
 #     )
 
 
-# async def find_labels_by_transaction_id(conn: Connection, transaction_id: int) -> list[tuple[str]]:
+# async def find_labels_by_transaction_id(conn: 'Connection', transaction_id: int) -> list[tuple[str]]:
 #     labels = await conn.execute(
 #         'SELECT labelName FROM LABELSTABLE WHERE transactionIDLabels = ?',
 #         (transaction_id,),
@@ -315,18 +469,7 @@ async def rename_item(conn: Connection, item_id: int, new_name: str) -> None:
 #     return list(await labels.fetchall())
 
 
-# def move_to_clue_table_by_id(conn: Connection, blue_id: int, table_blue: str, id_name: str) -> None:
-#     conn.execute(
-#         'INSERT INTO CLUE:table SELECT * FROM ? WHERE ?=?',
-#         (table_blue, table_blue, id_name, blue_id,),
-#     )
-#     conn.execute(
-#         'DELETE FROM ? WHERE ? = ?',
-#         (table_blue, id_name, blue_id,),
-#     )
-
-
-# async def get_transactions_list(conn: Connection, account_id: int) -> list[tuple[int]]:
+# async def get_transactions_list(conn: 'Connection', account_id: int) -> list[tuple[int]]:
 #     async with conn.execute(
 #         'SELECT transactionsTableID FROM TRANSACTIONSTABLE WHERE accountID = ?',
 #         (account_id,),
@@ -334,21 +477,5 @@ async def rename_item(conn: Connection, item_id: int, new_name: str) -> None:
 #         return list(await cursor.fetchall())
 
 
-# async def execute_command(conn: Connection, command: str) -> None:
+# async def execute_command(conn: 'Connection', command: str) -> None:
 #     conn.execute(command)
-
-
-# async def copy_data_to_table_by_id(conn: Connection, table: str, filter: str, id_: int, revert: bool = False) -> None:
-#     if revert is False:
-#         new_table = f'CLUE_{table}'
-#     else:
-#         new_table = table
-#         table = f'CLUE_{table}'
-
-#     await conn.execute(f'INSERT INTO {new_table} SELECT * FROM {table} WHERE {filter} = {id_}')
-
-
-# async def delete_data_by_id(conn: Connection, table: str, filter: str, id_: int, revert: bool = False) -> None:
-#     if revert:
-#         table = f'CLUE_{table}'
-#     await conn.execute(f'DELETE FROM {table} WHERE {filter} = {id_}')
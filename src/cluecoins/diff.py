@@ -0,0 +1,294 @@
+"""Row-level diff of two databases.
+
+Tables are compared by primary key (`PRAGMA table_info`; `rowid` for tables without one). Rows of both sides are
+split into partitions, `CHUNK_ROWS` consecutive keys each for a single integer key or hash buckets otherwise, and
+a digest of every partition is computed in one grouped scan per side. Partitions with equal digests are skipped;
+only rows of the others are read, ordered by key and merge-joined, so memory depends on the number of partitions,
+not rows.
+
+Only columns present on both sides are compared; see `cluecoins.schema` for schema differences.
+"""
+
+import sqlite3
+from collections.abc import Iterator
+from dataclasses import dataclass
+from hashlib import blake2b
+from itertools import batched
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+from typing import Self
+
+from cluecoins.database import browse_uri
+
+CHUNK_ROWS = 1024
+
+_IGNORED_PREFIXES = ('sqlite_',)
+_SEPARATOR = chr(31)
+
+
+def _row_hash(*values: Any) -> int:
+    return int.from_bytes(blake2b(repr(values).encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+def _digest(rows: str | None) -> int:
+    return int.from_bytes(blake2b((rows or '').encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+@dataclass(frozen=True)
+class RowChange:
+    table: str
+    kind: str
+    key: tuple[Any, ...]
+    old: dict[str, Any] | None = None
+    new: dict[str, Any] | None = None
+
+    @property
+    def columns(self) -> list[str]:
+        """Columns that differ in an updated row."""
+        if self.old is None or self.new is None:
+            return []
+        return [c for c in self.new if self.old.get(c) != self.new[c]]
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON-serializable form; blobs are hex-encoded and unchanged columns of updated rows are omitted."""
+
+        def values(row: dict[str, Any] | None, columns: list[str] | None = None) -> dict[str, Any] | None:
+            if row is None:
+                return None
+            return {
+                k: v.hex() if isinstance(v, bytes) else v for k, v in row.items() if columns is None or k in columns
+            }
+
+        columns = self.columns if self.kind == 'update' else None
+        return {
+            'table': self.table,
+            'kind': self.kind,
+            'key': list(self.key),
+            'old': values(self.old, columns),
+            'new': values(self.new, columns),
+        }
+
+
+@dataclass
+class TableDiff:
+    table: str
+    partitions: int = 0
+    skipped: int = 0
+    inserted: int = 0
+    deleted: int = 0
+    updated: int = 0
+
+    @property
+    def changed(self) -> int:
+        return self.inserted + self.deleted + self.updated
+
+
+@dataclass
+class _Table:
+    name: str
+    key: list[str]
+    columns: list[str]
+    old: bool
+    new: bool
+    ranged: bool = False
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _printf(specifier: str, values: tuple[str, ...]) -> str:
+    return f"printf('{_SEPARATOR.join([specifier] * len(values))}', {', '.join(values)})"
+
+
+def _serialized(columns: list[str]) -> str:
+    """SQL expression of a row as text, columns separated by char(31)."""
+    # NOTE: `%Q` tells NULL from text and is much cheaper than `quote()`; that's only needed for reals, which `%Q`
+    #  rounds to 15 digits, and blobs
+    values = [f"iif(typeof({_quote(c)}) IN ('real', 'blob'), quote({_quote(c)}), {_quote(c)})" for c in columns]
+    # NOTE: A `printf` builds the row at once, chained `||` would copy it again for every column. SQL functions take
+    #  up to 127 arguments, so wide tables are built in groups.
+    parts = [_printf('%Q', group) for group in batched(values, 100)]
+    while len(parts) > 1:
+        parts = [_printf('%s', group) for group in batched(parts, 100)]
+    return parts[0]
+
+
+class DatabaseDiff:
+    """Compare `old` and `new` databases, both opened read-only.
+
+    with DatabaseDiff(old_path, new_path) as diff:
+        for change in diff.changes():
+            ...
+        print(diff.tables)
+    """
+
+    def __init__(self, old: Path, new: Path, chunk_rows: int = CHUNK_ROWS, old_immutable: bool = False) -> None:
+        self._old = old
+        # NOTE: Set for snapshots; SQLite then skips locking the file and checking it for changes
+        self._old_immutable = old_immutable
+        self._new = new
+        self._chunk_rows = chunk_rows
+        self._conn: sqlite3.Connection | None = None
+        self.tables: dict[str, TableDiff] = {}
+
+    def __enter__(self) -> Self:
+        conn = sqlite3.connect(browse_uri(self._old, self._old_immutable), uri=True)
+        conn.execute('ATTACH DATABASE ? AS new', (browse_uri(self._new),))
+        conn.create_function('row_hash', -1, _row_hash, deterministic=True)
+        conn.create_function('digest', 1, _digest, deterministic=True)
+        self._conn = conn
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            raise Exception('DatabaseDiff is not opened')
+        return self._conn
+
+    def _describe(self, schema: str) -> dict[str, tuple[list[str], list[str], bool]]:
+        """Key columns, all columns and whether the key is a single integer column, by table name."""
+        tables = {}
+        names = self.conn.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'").fetchall()
+        for (name,) in names:
+            if name.lower().startswith(_IGNORED_PREFIXES):
+                continue
+            info = self.conn.execute(f'PRAGMA {schema}.table_info({_quote(name)})').fetchall()
+            columns = [row[1] for row in info]
+            key = [row[1] for row in sorted(info, key=lambda r: r[5]) if row[5]]
+            ranged = len(key) == 1 and next(r[2] for r in info if r[1] == key[0]).upper() == 'INTEGER'
+            if not key:
+                key, ranged = ['rowid'], True
+            tables[name] = (key, columns, ranged)
+        return tables
+
+    def _tables(self, names: list[str] | None) -> list[_Table]:
+        old, new = self._describe('main'), self._describe('new')
+        tables = []
+        for name in sorted(old.keys() | new.keys()):
+            if names is not None and name not in names:
+                continue
+            if name in old and name in new and old[name][0] != new[name][0]:
+                raise Exception(f'primary key of `{name}` differs: {old[name][0]} -> {new[name][0]}')
+            key, _, ranged = old.get(name) or new[name]
+            if name in old and name in new:
+                columns = [c for c in old[name][1] if c in new[name][1]]
+                ranged = old[name][2] and new[name][2]
+            else:
+                columns = (old.get(name) or new[name])[1]
+            tables.append(_Table(name, key, columns, name in old, name in new, ranged))
+        return tables
+
+    @staticmethod
+    def _partition(table: _Table, buckets: int) -> str:
+        key = ', '.join(_quote(c) for c in table.key)
+        return f'abs(row_hash({key})) % {buckets}'
+
+    def _digests(self, schema: str, table: _Table, buckets: int) -> dict[int, tuple[int, int]]:
+        # NOTE: Rows are hashed once per partition in Python
+        key = ', '.join(_quote(c) for c in table.key)
+        row = _serialized(table.columns)
+        source = f'{schema}.{_quote(table.name)}'
+        if not table.ranged:
+            # NOTE: If SQLite concatenates rows in a different order on the two sides, the bucket is merely compared
+            #  row by row
+            query = f"""SELECT part, COUNT(*), digest(group_concat(row, char(30))) FROM (
+                SELECT {self._partition(table, buckets)} AS part, {row} AS row FROM {source} ORDER BY {key}
+            ) GROUP BY part"""
+            return {part: (count, digest) for part, count, digest in self.conn.execute(query)}
+
+        # NOTE: A range scan of the key per partition, jumping over empty ones; unlike GROUP BY, no temporary
+        #  b-tree of all rows is built
+        size = self._chunk_rows
+        digests = {}
+        next_key = self.conn.execute(f'SELECT MIN({key}) FROM {source}').fetchone()[0]
+        while next_key is not None:
+            part = next_key // size
+            count, digest = self.conn.execute(
+                f'SELECT COUNT(*), digest(group_concat({row}, char(30))) FROM {source} WHERE {key} >= ? AND {key} < ?',
+                (part * size, (part + 1) * size),
+            ).fetchone()
+            digests[part] = (count, digest)
+            next_key = self.conn.execute(
+                f'SELECT MIN({key}) FROM {source} WHERE {key} >= ?', ((part + 1) * size,)
+            ).fetchone()[0]
+        return digests
+
+    def _rows(self, schema: str, table: _Table, part: int, buckets: int, present: bool) -> Iterator[tuple]:
+        if not present:
+            return iter(())
+        key = ', '.join(_quote(c) for c in table.key)
+        columns = ', '.join(_quote(c) for c in table.columns)
+        params: tuple[int, ...]
+        if table.ranged:
+            where, params = f'{key} >= ? AND {key} < ?', (part * self._chunk_rows, (part + 1) * self._chunk_rows)
+        else:
+            where, params = f'{self._partition(table, buckets)} = ?', (part,)
+        query = f'SELECT {key}, {columns} FROM {schema}.{_quote(table.name)} WHERE {where} ORDER BY {key}'
+        return iter(self.conn.execute(query, params))
+
+    def _compare(self, table: _Table, part: int, buckets: int, stats: TableDiff) -> Iterator[RowChange]:
+        width = len(table.key)
+        old_rows = self._rows('main', table, part, buckets, table.old)
+        new_rows = self._rows('new', table, part, buckets, table.new)
+        old, new = next(old_rows, None), next(new_rows, None)
+        while old is not None or new is not None:
+            old_key = old[:width] if old is not None else None
+            new_key = new[:width] if new is not None else None
+            if new is None or (old is not None and old_key < new_key):  # type: ignore[operator]
+                assert old is not None
+                stats.deleted += 1
+                yield RowChange(
+                    table.name, 'delete', old[:width], old=dict(zip(table.columns, old[width:], strict=True))
+                )
+                old = next(old_rows, None)
+            elif old is None or new_key < old_key:  # type: ignore[operator]
+                stats.inserted += 1
+                yield RowChange(
+                    table.name, 'insert', new[:width], new=dict(zip(table.columns, new[width:], strict=True))
+                )
+                new = next(new_rows, None)
+            else:
+                if old[width:] != new[width:]:
+                    stats.updated += 1
+                    yield RowChange(
+                        table.name,
+                        'update',
+                        new[:width],
+                        old=dict(zip(table.columns, old[width:], strict=True)),
+                        new=dict(zip(table.columns, new[width:], strict=True)),
+                    )
+                old, new = next(old_rows, None), next(new_rows, None)
+
+    def changes(self, tables: list[str] | None = None) -> Iterator[RowChange]:
+        """Inserted, deleted and updated rows, table by table in key order; fills `self.tables` as it goes."""
+        for table in self._tables(tables):
+            stats = self.tables[table.name] = TableDiff(table.name)
+            buckets = 1
+            if not table.ranged:
+                counts = [
+                    self.conn.execute(f'SELECT COUNT(*) FROM {schema}.{_quote(table.name)}').fetchone()[0]
+                    for schema, present in (('main', table.old), ('new', table.new))
+                    if present
+                ]
+                buckets = max(counts) // self._chunk_rows + 1
+
+            old = self._digests('main', table, buckets) if table.old else {}
+            new = self._digests('new', table, buckets) if table.new else {}
+            stats.partitions = len(old.keys() | new.keys())
+            for part in sorted(old.keys() | new.keys()):
+                if old.get(part) == new.get(part):
+                    stats.skipped += 1
+                    continue
+                yield from self._compare(table, part, buckets, stats)
@@ -0,0 +1,209 @@
+"""Export of Bluecoins transactions to flat files.
+
+Transactions are joined with their item, category, accounts and labels in a single query and streamed from one
+cursor, `CHUNK_ROWS` rows at a time, into a writer; memory doesn't depend on the number of transactions. Amounts
+are converted from micro-units to `Decimal`.
+
+Parquet files are written with `pyarrow` (the `parquet` extra; install it to enable the format) one row group per
+chunk; amounts are `decimal128(18, 6)` there.
+"""
+
+import csv
+import json
+from abc import ABC
+from abc import abstractmethod
+from collections.abc import AsyncIterator
+from collections.abc import Sequence
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from types import TracebackType
+from typing import IO
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Self
+
+from cluecoins.filters import TransactionFilter
+
+if TYPE_CHECKING:
+    from aiosqlite import Connection
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+EXPORT_COLUMNS = (
+    'transactionsTableID',
+    'date',
+    'amount',
+    'transactionCurrency',
+    'conversionRateNew',
+    'transactionTypeID',
+    'categoryID',
+    'accountID',
+    'accountPairID',
+    'notes',
+    'itemName',
+    'categoryName',
+    'parentCategoryName',
+    'accountName',
+    'accountPairName',
+    'labels',
+)
+
+CHUNK_ROWS = 5000
+
+_MICRO = Decimal(1000000)
+
+_EXPORT_QUERY = """SELECT t.transactionsTableID, t.date, t.amount, t.transactionCurrency,
+        t.conversionRateNew, t.transactionTypeID, t.categoryID,
+        t.accountID, t.accountPairID, t.notes,
+        i.itemName, c.childCategoryName, p.parentCategoryName, a.accountName, ap.accountName, l.labels
+    FROM TRANSACTIONSTABLE t
+    LEFT JOIN ITEMTABLE i ON i.itemTableID = t.itemID
+    LEFT JOIN CHILDCATEGORYTABLE c ON c.categoryTableID = t.categoryID
+    LEFT JOIN PARENTCATEGORYTABLE p ON p.parentCategoryTableID = c.parentCategoryID
+    LEFT JOIN ACCOUNTSTABLE a ON a.accountsTableID = t.accountID
+    LEFT JOIN ACCOUNTSTABLE ap ON ap.accountsTableID = t.accountPairID
+    LEFT JOIN (
+        SELECT transactionIDLabels AS id, group_concat(labelName, ',') AS labels
+        FROM LABELSTABLE WHERE transactionIDLabels IS NOT NULL GROUP BY transactionIDLabels
+    ) l ON l.id = t.transactionsTableID
+    {where}
+    ORDER BY t.date, t.transactionsTableID"""
+
+
+def _convert(row: Sequence[Any]) -> tuple:
+    id_, date_, amount, currency, rate, *rest = row
+    amount = Decimal(amount) / _MICRO if amount is not None else None
+    rate = Decimal(str(rate)) if rate is not None else None
+    return (id_, date_, amount, currency, rate, *rest)
+
+
+async def iter_export_rows(
+    conn: 'Connection',
+    filter_: TransactionFilter | None = None,
+    chunk_size: int = CHUNK_ROWS,
+) -> AsyncIterator[list[tuple]]:
+    """Rows of `EXPORT_COLUMNS` matching the filter, oldest first, `chunk_size` at a time."""
+    where, params = (filter_ or TransactionFilter()).compile()
+    async with conn.execute(_EXPORT_QUERY.format(where=where), params) as cur:
+        while rows := await cur.fetchmany(chunk_size):
+            yield [_convert(row) for row in rows]
+
+
+class _Writer(ABC):
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    @abstractmethod
+    def write(self, rows: list[tuple]) -> None: ...
+
+    @abstractmethod
+    def close(self) -> None: ...
+
+
+class _CsvWriter(_Writer):
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        self._file: IO[str] = path.open('w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows: list[tuple]) -> None:
+        self._writer.writerows(rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _JsonlWriter(_Writer):
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        self._file: IO[str] = path.open('w')
+
+    @staticmethod
+    def _default(value: Any) -> Any:
+        # NOTE: Strings, as in CSV; a JSON number would be read back as a float by most parsers
+        if isinstance(value, Decimal):
+            return str(value)
+        raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+    def write(self, rows: list[tuple]) -> None:
+        self._file.writelines(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row, strict=True)), ensure_ascii=False, default=self._default) + '\n'
+            for row in rows
+        )
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ParquetWriter(_Writer):
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise Exception('parquet export requires the `pyarrow` package') from e
+
+        self._pa = pa
+        types = {
+            'transactionsTableID': pa.int64(),
+            'date': pa.timestamp('s'),
+            'amount': pa.decimal128(18, 6),
+            'conversionRateNew': pa.float64(),
+            'transactionTypeID': pa.int64(),
+            'categoryID': pa.int64(),
+            'accountID': pa.int64(),
+            'accountPairID': pa.int64(),
+        }
+        self._schema = pa.schema([(name, types.get(name, pa.string())) for name in EXPORT_COLUMNS])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows: list[tuple]) -> None:
+        columns = [list(column) for column in zip(*rows, strict=True)]
+        date, rate = EXPORT_COLUMNS.index('date'), EXPORT_COLUMNS.index('conversionRateNew')
+        columns[date] = [datetime.fromisoformat(v) if v else None for v in columns[date]]
+        # NOTE: Rates are REAL in the database, a float column loses nothing
+        columns[rate] = [float(v) if v is not None else None for v in columns[rate]]
+        batch = self._pa.record_batch(columns, schema=self._schema)
+        self._writer.write_batch(batch)
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+_WRITERS: dict[str, type[_Writer]] = {
+    'csv': _CsvWriter,
+    'jsonl': _JsonlWriter,
+    'parquet': _ParquetWriter,
+}
+
+
+async def export_transactions(
+    conn: 'Connection',
+    path: Path,
+    format_: str = 'csv',
+    filter_: TransactionFilter | None = None,
+    chunk_size: int = CHUNK_ROWS,
+) -> int:
+    """Write transactions matching the filter to `path`, oldest first; returns the number of rows written."""
+    if format_ not in EXPORT_FORMATS:
+        raise ValueError(f'unknown export format `{format_}`')
+
+    written = 0
+    with _WRITERS[format_](path) as writer:
+        async for rows in iter_export_rows(conn, filter_, chunk_size):
+            writer.write(rows)
+            written += len(rows)
+    return written
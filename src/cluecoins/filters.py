@@ -0,0 +1,137 @@
+"""Structured filters for transactions compiled to parameterized SQL.
+
+Every predicate is written so SQLite can use an index for it: plain comparisons on raw columns, no functions applied
+to `t.date` or `t.amount`. Names are resolved with subqueries instead of joins to keep the outer scan on
+`TRANSACTIONSTABLE` (alias `t`).
+"""
+
+import json
+from collections.abc import Sequence
+from dataclasses import dataclass
+from dataclasses import fields
+from dataclasses import replace
+from datetime import date
+from datetime import timedelta
+from decimal import Decimal
+from decimal import InvalidOperation
+from typing import Any
+
+_FILTER_KEYS = ('from', 'to', 'date', 'account', 'category', 'currency', 'amount', 'type', 'label')
+
+FILTER_HELP = 'from:2024-01-01 to:2024-01-31 account:Checking category:3 currency:EUR amount:-100..0 type:3 label:Trip'
+
+
+@dataclass(frozen=True)
+class TransactionFilter:
+    date_from: date | None = None
+    date_to: date | None = None
+    account: int | str | None = None
+    category: int | str | None = None
+    currency: str | None = None
+    amount_min: Decimal | None = None
+    amount_max: Decimal | None = None
+    type_id: int | None = None
+    label: str | None = None
+    ids: Sequence[int] | None = None
+
+    def is_empty(self) -> bool:
+        return all(getattr(self, f.name) is None for f in fields(self))
+
+    def with_ids(self, ids: Sequence[int] | None) -> 'TransactionFilter':
+        return replace(self, ids=ids)
+
+    def compile(self) -> tuple[str, list[Any]]:
+        """Return a `WHERE` clause (empty if there's nothing to filter) and its parameters."""
+        conditions: list[str] = []
+        params: list[Any] = []
+
+        # NOTE: Dates are stored as 'YYYY-MM-DD HH:MM:SS' text, so a string range is a range scan
+        if self.date_from is not None:
+            conditions.append('t.date >= ?')
+            params.append(self.date_from.isoformat())
+        if self.date_to is not None:
+            conditions.append('t.date < ?')
+            params.append((self.date_to + timedelta(days=1)).isoformat())
+
+        if isinstance(self.account, int):
+            conditions.append('t.accountID = ?')
+            params.append(self.account)
+        elif self.account is not None:
+            conditions.append('t.accountID IN (SELECT accountsTableID FROM ACCOUNTSTABLE WHERE accountName = ?)')
+            params.append(self.account)
+
+        if isinstance(self.category, int):
+            conditions.append('t.categoryID = ?')
+            params.append(self.category)
+        elif self.category is not None:
+            conditions.append(
+                't.categoryID IN (SELECT categoryTableID FROM CHILDCATEGORYTABLE WHERE childCategoryName = ?)'
+            )
+            params.append(self.category)
+
+        if self.currency is not None:
+            conditions.append('t.transactionCurrency = ?')
+            params.append(self.currency)
+
+        # NOTE: Amounts are signed micro-units; expenses are negative
+        if self.amount_min is not None:
+            conditions.append('t.amount >= ?')
+            params.append(int(self.amount_min * 1000000))
+        if self.amount_max is not None:
+            conditions.append('t.amount <= ?')
+            params.append(int(self.amount_max * 1000000))
+
+        if self.type_id is not None:
+            conditions.append('t.transactionTypeID = ?')
+            params.append(self.type_id)
+
+        if self.label is not None:
+            conditions.append(
+                't.transactionsTableID IN (SELECT transactionIDLabels FROM LABELSTABLE WHERE labelName = ?)'
+            )
+            params.append(self.label)
+
+        if self.ids is not None:
+            # NOTE: A single JSON parameter instead of a placeholder per ID; there's a limit on host parameters.
+            conditions.append('t.transactionsTableID IN (SELECT value FROM json_each(?))')
+            params.append(json.dumps(list(self.ids)))
+
+        if not conditions:
+            return '', params
+        return 'WHERE ' + ' AND '.join(conditions), params
+
+    @classmethod
+    def parse(cls, text: str) -> 'TransactionFilter':
+        """Parse filter bar input, a list of `key:value` tokens (see `FILTER_HELP`)."""
+        values: dict[str, Any] = {}
+        for token in text.split():
+            key, sep, value = token.partition(':')
+            if not sep or not value:
+                raise ValueError(f'expected `key:value`, got `{token}`')
+            if key not in _FILTER_KEYS:
+                raise ValueError(f'unknown filter `{key}`')
+            try:
+                match key:
+                    case 'from':
+                        values['date_from'] = date.fromisoformat(value)
+                    case 'to':
+                        values['date_to'] = date.fromisoformat(value)
+                    case 'date':
+                        values['date_from'] = values['date_to'] = date.fromisoformat(value)
+                    case 'account' | 'category':
+                        values[key] = int(value) if value.lstrip('-').isdigit() else value
+                    case 'currency':
+                        values['currency'] = value.upper()
+                    case 'amount':
+                        low, dots, high = value.partition('..')
+                        if not dots:
+                            low = high = value
+                        values['amount_min'] = Decimal(low) if low else None
+                        values['amount_max'] = Decimal(high) if high else None
+                    case 'type':
+                        values['type_id'] = int(value)
+                    case 'label':
+                        values['label'] = value
+            except (InvalidOperation, ValueError) as e:
+                raise ValueError(f'invalid value for `{key}`: `{value}`') from e
+        return cls(**values)
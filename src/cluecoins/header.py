@@ -0,0 +1,130 @@
+"""Module to inspect the 100-byte SQLite database file header without opening a connection."""
+
+import struct
+from dataclasses import dataclass
+from hashlib import blake2b
+from pathlib import Path
+
+HEADER_SIZE = 100
+HEADER_MAGIC = b'SQLite format 3\x00'
+
+_ENCODINGS = {1: 'UTF-8', 2: 'UTF-16le', 3: 'UTF-16be'}
+
+# NOTE: See https://www.sqlite.org/fileformat.html#the_database_header
+_HEADER_STRUCT = struct.Struct('>16sHBBBBBBIIIIIIIIIIII20sII')
+
+
+@dataclass(frozen=True)
+class SqliteHeader:
+    page_size: int
+    write_version: int
+    read_version: int
+    change_counter: int
+    page_count: int
+    freelist_count: int
+    schema_cookie: int
+    schema_format: int
+    text_encoding: int
+    user_version: int
+    application_id: int
+    version_valid_for: int
+    sqlite_version_number: int
+    file_size: int
+    raw: bytes
+
+    @property
+    def encoding(self) -> str:
+        return _ENCODINGS.get(self.text_encoding, f'unknown ({self.text_encoding})')
+
+    @property
+    def sqlite_version(self) -> str:
+        major, rest = divmod(self.sqlite_version_number, 1000000)
+        minor, patch = divmod(rest, 1000)
+        return f'{major}.{minor}.{patch}'
+
+    @property
+    def is_wal(self) -> bool:
+        return self.read_version == 2 or self.write_version == 2
+
+    @property
+    def fingerprint(self) -> str:
+        """Cheap identifier of the file state; changes on every committed write (rollback journal mode)."""
+        digest = blake2b(self.raw[16:], digest_size=8)
+        digest.update(self.file_size.to_bytes(8, 'big'))
+        return digest.hexdigest()
+
+    def describe(self) -> str:
+        return (
+            f'SQLite {self.sqlite_version}, user version {self.user_version}, '
+            f'{self.page_count} pages x {self.page_size} B, {self.encoding}, '
+            f'file counter {self.change_counter}, schema cookie {self.schema_cookie}'
+        )
+
+    def summary(self) -> str:
+        return f'SQLite {self.sqlite_version} · {self.page_count}x{self.page_size} B · v{self.user_version}'
+
+
+def parse_header(data: bytes, file_size: int) -> SqliteHeader:
+    if len(data) < HEADER_SIZE or not data.startswith(HEADER_MAGIC):
+        raise ValueError('not a SQLite 3 database')
+
+    (
+        _magic,
+        page_size,
+        write_version,
+        read_version,
+        _reserved,
+        _max_fraction,
+        _min_fraction,
+        _leaf_fraction,
+        change_counter,
+        page_count,
+        _freelist_trunk,
+        freelist_count,
+        schema_cookie,
+        schema_format,
+        _cache_size,
+        _largest_root,
+        text_encoding,
+        user_version,
+        _incremental_vacuum,
+        application_id,
+        _reserved_expansion,
+        version_valid_for,
+        sqlite_version_number,
+    ) = _HEADER_STRUCT.unpack(data[:HEADER_SIZE])
+
+    # NOTE: 1 means 65536, the value doesn't fit into two bytes
+    if page_size == 1:
+        page_size = 65536
+    # NOTE: In-header page count is only valid if it was written by SQLite 3.7.0+ in the same transaction
+    if version_valid_for != change_counter or page_count == 0:
+        page_count = file_size // page_size
+
+    return SqliteHeader(
+        page_size=page_size,
+        write_version=write_version,
+        read_version=read_version,
+        change_counter=change_counter,
+        page_count=page_count,
+        freelist_count=freelist_count,
+        schema_cookie=schema_cookie,
+        schema_format=schema_format,
+        text_encoding=text_encoding,
+        user_version=user_version,
+        application_id=application_id,
+        version_valid_for=version_valid_for,
+        sqlite_version_number=sqlite_version_number,
+        file_size=file_size,
+        raw=bytes(data[:HEADER_SIZE]),
+    )
+
+
+def read_header(path: Path) -> SqliteHeader | None:
+    """Read the header of the database file; `None` for an empty (not yet initialized) database."""
+    with path.open('rb') as f:
+        data = f.read(HEADER_SIZE)
+        file_size = f.seek(0, 2)
+    if not data:
+        return None
+    return parse_header(data, file_size)
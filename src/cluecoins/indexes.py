@@ -0,0 +1,195 @@
+"""Optional performance indexes for the columns cluecoins sorts and filters on.
+
+Bluecoins indexes only `accountID` and `categoryID` of `TRANSACTIONSTABLE`, so most header clicks and filters in the
+UI are full scans followed by a sort. Extra indexes must never reach the phone: they are only created on a working
+copy managed by cluecoins, and `strip_indexes` removes them before the file goes back.
+"""
+
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING
+from typing import Any
+
+import xdg
+
+from cluecoins.database import ITER_TRANSACTIONS_QUERY
+from cluecoins.database import connect_db
+from cluecoins.database import transactions_page_query
+from cluecoins.filters import TransactionFilter
+
+if TYPE_CHECKING:
+    from aiosqlite import Connection
+
+INDEX_PREFIX = 'cluecoins_'
+WORKING_COPY_DIR = xdg.XDG_DATA_HOME / 'cluecoins' / 'working'
+
+PERFORMANCE_INDEXES: dict[str, tuple[str, tuple[str, ...]]] = {
+    'cluecoins_transactions_date': ('TRANSACTIONSTABLE', ('date',)),
+    'cluecoins_transactions_amount': ('TRANSACTIONSTABLE', ('amount',)),
+    'cluecoins_transactions_item': ('TRANSACTIONSTABLE', ('itemID',)),
+    'cluecoins_transactions_currency_date': ('TRANSACTIONSTABLE', ('transactionCurrency', 'date')),
+    'cluecoins_transactions_account_date': ('TRANSACTIONSTABLE', ('accountID', 'date')),
+    'cluecoins_transactions_category_date': ('TRANSACTIONSTABLE', ('categoryID', 'date')),
+    'cluecoins_transactions_type_date': ('TRANSACTIONSTABLE', ('transactionTypeID', 'date')),
+    'cluecoins_labels_name': ('LABELSTABLE', ('labelName', 'transactionIDLabels')),
+}
+
+
+@dataclass(frozen=True)
+class PlanQuery:
+    name: str
+    sql: str
+    params: tuple[Any, ...]
+    index: str
+
+
+@dataclass(frozen=True)
+class IndexProposal:
+    query: PlanQuery
+    plan: list[str]
+
+
+@dataclass(frozen=True)
+class QueryTiming:
+    query: PlanQuery
+    before: float
+    after: float
+    plan: list[str]
+
+
+def _page_query(name: str, index: str, sort_col: str, filter_: TransactionFilter | None = None) -> PlanQuery:
+    sql, params = transactions_page_query(sort_col, False, filter_)
+    return PlanQuery(name, sql, (*params, 1000, 0), index)
+
+
+def plan_queries() -> list[PlanQuery]:
+    """Queries issued by `cluecoins.database` that the performance indexes are meant for."""
+    month = TransactionFilter(account=1, date_from=date(2024, 1, 1), date_to=date(2024, 1, 31))
+    return [
+        _page_query('sort by date', 'cluecoins_transactions_date', 'date'),
+        _page_query('sort by amount', 'cluecoins_transactions_amount', 'amount'),
+        _page_query('one month of an account', 'cluecoins_transactions_account_date', 'date', month),
+        _page_query(
+            'one month of a category',
+            'cluecoins_transactions_category_date',
+            'date',
+            TransactionFilter(category=1, date_from=date(2024, 1, 1), date_to=date(2024, 1, 31)),
+        ),
+        _page_query(
+            'currency by date',
+            'cluecoins_transactions_currency_date',
+            'date',
+            TransactionFilter(currency='EUR'),
+        ),
+        _page_query('label', 'cluecoins_labels_name', 'date', TransactionFilter(label='Business')),
+        PlanQuery(
+            'transactions of an item',
+            'SELECT transactionsTableID FROM TRANSACTIONSTABLE WHERE itemID = ?',
+            (1,),
+            'cluecoins_transactions_item',
+        ),
+        PlanQuery('convert', ITER_TRANSACTIONS_QUERY, (), 'cluecoins_transactions_type_date'),
+    ]
+
+
+async def explain(conn: 'Connection', sql: str, params: tuple[Any, ...] = ()) -> list[str]:
+    async with conn.execute(f'EXPLAIN QUERY PLAN {sql}', params) as cur:
+        return [row[3] async for row in cur]
+
+
+def _is_slow_plan(plan: list[str]) -> bool:
+    """Full table scans and sorts in a temporary b-tree."""
+    return any(
+        (step.startswith('SCAN ') and 'INDEX' not in step and 'VIRTUAL TABLE' not in step)
+        or step.startswith('USE TEMP B-TREE')
+        for step in plan
+    )
+
+
+async def existing_indexes(conn: 'Connection') -> set[str]:
+    async with conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE ?",
+        (f'{INDEX_PREFIX}%',),
+    ) as cur:
+        return {row[0] async for row in cur}
+
+
+async def propose_indexes(conn: 'Connection') -> list[IndexProposal]:
+    """Run `EXPLAIN QUERY PLAN` on `plan_queries` and propose indexes for those doing scans or sorts."""
+    existing = await existing_indexes(conn)
+    proposals = []
+    for query in plan_queries():
+        plan = await explain(conn, query.sql, query.params)
+        if query.index not in existing and _is_slow_plan(plan):
+            proposals.append(IndexProposal(query, plan))
+    return proposals
+
+
+def is_working_copy(path: Path) -> bool:
+    return path.resolve().is_relative_to(WORKING_COPY_DIR.resolve())
+
+
+async def create_working_copy(path: Path, log: Callable = lambda _: None) -> Path:
+    """Copy the database into the working copy directory with the SQLite backup API.
+
+    An existing working copy of the same database may have edits of its own; it's snapshotted before it's replaced.
+    """
+    from cluecoins.backup import create_snapshot
+    from cluecoins.backup import source_name
+
+    WORKING_COPY_DIR.mkdir(parents=True, exist_ok=True)
+    target = WORKING_COPY_DIR / f'{source_name(path)}{path.suffix}'
+    if target.exists():
+        snapshot = await create_snapshot(target, 'working_copy')
+        log(f'previous working copy saved to `{snapshot.path}`')
+    # NOTE: A journal left next to the new file would be applied to it
+    for suffix in ('', '-wal', '-shm'):
+        target.with_name(target.name + suffix).unlink(missing_ok=True)
+    async with connect_db(path) as source, connect_db(target) as dest:
+        await source.backup(dest)
+    return target
+
+
+async def create_indexes(conn: 'Connection', path: Path, names: list[str]) -> None:
+    if not is_working_copy(path):
+        raise Exception(f'`{path}` is not a working copy; performance indexes would end up on the phone')
+    for name in names:
+        table, columns = PERFORMANCE_INDEXES[name]
+        await conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table}({", ".join(columns)})')
+    await conn.commit()
+
+
+async def strip_indexes(conn: 'Connection') -> list[str]:
+    """Drop every index created by cluecoins; run it before the file goes back to the phone."""
+    names = sorted(await existing_indexes(conn))
+    for name in names:
+        await conn.execute(f'DROP INDEX {name}')
+    if names:
+        await conn.commit()
+        await conn.execute('VACUUM')
+    return names
+
+
+async def _time_query(conn: 'Connection', query: PlanQuery, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        async with conn.execute(query.sql, query.params) as cur:
+            await cur.fetchall()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def apply_with_timings(conn: 'Connection', path: Path, proposals: list[IndexProposal]) -> list[QueryTiming]:
+    """Create proposed indexes on a working copy, timing each query before and after."""
+    before = {p.query.name: await _time_query(conn, p.query) for p in proposals}
+    await create_indexes(conn, path, sorted({p.query.index for p in proposals}))
+    timings = []
+    for proposal in proposals:
+        query = proposal.query
+        after = await _time_query(conn, query)
+        timings.append(QueryTiming(query, before[query.name], after, await explain(conn, query.sql, query.params)))
+    return timings
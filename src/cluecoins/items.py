@@ -0,0 +1,159 @@
+"""Bulk operations on Bluecoins items (payees and transaction titles in `ITEMTABLE`).
+
+Duplicates are found in memory with one pass over `ITEMTABLE`, then merged with a handful of set-based statements
+in a single transaction, no matter how many items are involved.
+"""
+
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import TYPE_CHECKING
+
+from cluecoins.schema import ensure_schema
+
+if TYPE_CHECKING:
+    from aiosqlite import Connection
+
+# NOTE: Items created by Bluecoins itself ('Transfer', 'Unnamed Expense', ...); never merged away or deleted
+SYSTEM_ITEM_IDS = frozenset(range(5))
+
+FUZZY_THRESHOLD = 0.9
+FUZZY_WINDOW = 3
+
+
+@dataclass(frozen=True)
+class Item:
+    id: int
+    name: str
+    transactions: int
+
+
+@dataclass(frozen=True)
+class ItemGroup:
+    """Items considered duplicates of each other; the first one is kept."""
+
+    items: list[Item]
+
+    @property
+    def winner(self) -> Item:
+        return self.items[0]
+
+    @property
+    def losers(self) -> list[Item]:
+        return self.items[1:]
+
+    @property
+    def name(self) -> str:
+        """Name the winner gets after merge; whitespace is cleaned up."""
+        return ' '.join(self.winner.name.split())
+
+
+@dataclass(frozen=True)
+class MergeResult:
+    items: int
+    transactions: int
+
+
+def normalize_item_name(name: str) -> str:
+    return ' '.join(unicodedata.normalize('NFKC', name).casefold().split())
+
+
+async def fetch_items_with_usage(conn: 'Connection') -> list[Item]:
+    # NOTE: `itemID` isn't indexed; counting separately is a single scan instead of a lookup per item
+    async with conn.execute('SELECT itemID, COUNT(*) FROM TRANSACTIONSTABLE GROUP BY itemID') as cur:
+        usage = {item_id: count async for item_id, count in cur}
+    async with conn.execute('SELECT itemTableID, itemName FROM ITEMTABLE') as cur:
+        return [Item(id_, name or '', usage.get(id_, 0)) async for id_, name in cur]
+
+
+def _rank(item: Item) -> tuple[bool, int, int]:
+    """Sort key of items in a group: system items first, then the most used, then the oldest."""
+    return item.id not in SYSTEM_ITEM_IDS, -item.transactions, item.id
+
+
+def _similar(a: str, b: str, threshold: float) -> bool:
+    matcher = SequenceMatcher(None, a, b)
+    return (
+        matcher.real_quick_ratio() >= threshold and matcher.quick_ratio() >= threshold and matcher.ratio() >= threshold
+    )
+
+
+def group_duplicates(
+    items: list[Item],
+    fuzzy: bool = False,
+    threshold: float = FUZZY_THRESHOLD,
+    window: int = FUZZY_WINDOW,
+) -> list[ItemGroup]:
+    """Group items with the same normalized name.
+
+    With `fuzzy`, groups whose normalized names are close enough are joined as well. Names are compared to the
+    next `window` names in sorted order only, so it stays linear on tens of thousands of items; typos near the
+    beginning of a name can be missed.
+    """
+    buckets: dict[str, list[Item]] = defaultdict(list)
+    for item in items:
+        buckets[normalize_item_name(item.name)].append(item)
+
+    keys = sorted(k for k in buckets if k)
+    parent = {key: key for key in keys}
+
+    def find(key: str) -> str:
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    if fuzzy:
+        for i, key in enumerate(keys):
+            for other in keys[i + 1 : i + 1 + window]:
+                if _similar(key, other, threshold):
+                    parent[find(other)] = find(key)
+
+    merged: dict[str, list[Item]] = defaultdict(list)
+    for key in keys:
+        merged[find(key)].extend(buckets[key])
+
+    groups = []
+    for group_items in merged.values():
+        winner, *rest = sorted(group_items, key=_rank)
+        # NOTE: Two system items are never merged with each other
+        losers = [item for item in rest if item.id not in SYSTEM_ITEM_IDS]
+        if losers:
+            groups.append(ItemGroup([winner, *losers]))
+    groups.sort(key=lambda g: g.name.casefold())
+    return groups
+
+
+async def find_duplicate_items(conn: 'Connection', fuzzy: bool = False) -> list[ItemGroup]:
+    return group_duplicates(await fetch_items_with_usage(conn), fuzzy)
+
+
+async def merge_items(conn: 'Connection', groups: list[ItemGroup]) -> MergeResult:
+    """Repoint transactions of the losers to the winner of each group and delete the losers, in one transaction."""
+    mapping = [(loser.id, group.winner.id) for group in groups for loser in group.losers]
+    renames = [(group.name, group.winner.id) for group in groups if group.name != group.winner.name]
+    if not mapping:
+        return MergeResult(0, 0)
+    await ensure_schema(conn)
+
+    await conn.execute('CREATE TEMP TABLE IF NOT EXISTS item_merge (loser INTEGER PRIMARY KEY, winner INTEGER)')
+    try:
+        await conn.execute('DELETE FROM temp.item_merge')
+        await conn.executemany('INSERT INTO temp.item_merge (loser, winner) VALUES (?, ?)', mapping)
+        cur = await conn.execute(
+            """UPDATE TRANSACTIONSTABLE
+                SET itemID = (SELECT winner FROM temp.item_merge WHERE loser = itemID)
+                WHERE itemID IN (SELECT loser FROM temp.item_merge)"""
+        )
+        transactions = cur.rowcount
+        cur = await conn.execute('DELETE FROM ITEMTABLE WHERE itemTableID IN (SELECT loser FROM temp.item_merge)')
+        items = cur.rowcount
+        await conn.executemany('UPDATE ITEMTABLE SET itemName = ? WHERE itemTableID = ?', renames)
+        await conn.commit()
+    except Exception:
+        await conn.rollback()
+        raise
+    finally:
+        await conn.execute('DROP TABLE IF EXISTS temp.item_merge')
+    return MergeResult(items, transactions)
@@ -0,0 +1,340 @@
+"""Columnar in-memory snapshot of `TRANSACTIONSTABLE` for analytics.
+
+The ledger is read in one scan into typed arrays: amounts are int64 micro-units (`amount` in the base currency,
+`native` in the currency of the transaction), dates int32 day numbers since 1970-01-01, transaction types int8, and
+accounts, categories and currencies int codes into small dictionaries. Reports filter and group those arrays
+instead of running their own SQL scans.
+
+Arrays are cached in `LEDGER_CACHE_DIR`, one file per database keyed by its `source_name` and header fingerprint,
+and memory-mapped on load, so opening an unchanged database costs no scan and no copy. There's no numpy here; masks
+are byte strings combined with big-integer bitwise operations and filtered with `itertools.compress`.
+"""
+
+import asyncio
+import json
+import mmap
+import struct
+from array import array
+from collections.abc import Iterable
+from collections.abc import Sequence
+from datetime import date
+from datetime import timedelta
+from itertools import compress
+from pathlib import Path
+from types import TracebackType
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Self
+
+import xdg
+
+from cluecoins.header import read_header
+
+if TYPE_CHECKING:
+    from aiosqlite import Connection
+
+LEDGER_CACHE_DIR = xdg.XDG_CACHE_HOME / 'cluecoins' / 'ledger'
+
+EPOCH = date(1970, 1, 1)
+
+# NOTE: Column name and `array` typecode; order is the order in the cache file
+COLUMNS = {
+    'id': 'q',
+    'day': 'i',
+    'amount': 'q',
+    'native': 'q',
+    'type': 'b',
+    'account': 'i',
+    'category': 'i',
+    'currency': 'h',
+}
+DICTIONARY_COLUMNS = ('account', 'category', 'currency')
+BUCKETS = ('day', 'week', 'month', 'year')
+
+_MAGIC = b'CLUELDG2'
+_HEADER = struct.Struct('<8sQQ')
+_ALIGN = 8
+_CHUNK_SIZE = 10000
+
+_LEDGER_QUERY = """SELECT transactionsTableID,
+        CAST(julianday(substr(date, 1, 10)) - julianday('1970-01-01') AS INTEGER),
+        amount, CAST(round(amount * conversionRateNew) AS INTEGER), transactionTypeID,
+        accountID, categoryID, transactionCurrency
+    FROM TRANSACTIONSTABLE ORDER BY transactionsTableID"""
+
+
+def _padding(size: int) -> int:
+    return -size % _ALIGN
+
+
+def day_to_date(day: int) -> date:
+    return EPOCH + timedelta(days=day)
+
+
+def date_to_day(date_: date) -> int:
+    return (date_ - EPOCH).days
+
+
+def _bucket_key(day: int, unit: str) -> Any:
+    date_ = day_to_date(day)
+    match unit:
+        case 'day':
+            return date_
+        case 'week':
+            return date_ - timedelta(days=date_.weekday())
+        case 'month':
+            return f'{date_.year:04}-{date_.month:02}'
+        case 'year':
+            return date_.year
+    raise ValueError(f'unknown bucket `{unit}`, expected one of {", ".join(BUCKETS)}')
+
+
+class Ledger:
+    """Columns of the ledger, `Sequence[int]` each, and the dictionaries of the coded ones.
+
+    with await load_ledger(path) as ledger:
+        expenses = ledger.mask(type_id=3, date_from=date(2024, 1, 1))
+        ledger.sum_by('month', expenses)
+    """
+
+    def __init__(
+        self,
+        columns: dict[str, Sequence[int]],
+        dictionaries: dict[str, list[Any]],
+        buffer: mmap.mmap | None = None,
+    ) -> None:
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self._buffer = buffer
+
+    def __len__(self) -> int:
+        return len(self.columns['id'])
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._buffer is None:
+            return
+        for column in self.columns.values():
+            if isinstance(column, memoryview):
+                column.release()
+        self._buffer.close()
+        self._buffer = None
+
+    @property
+    def is_mapped(self) -> bool:
+        return self._buffer is not None
+
+    def decode(self, column: str, code: int) -> Any:
+        return self.dictionaries[column][code] if column in self.dictionaries else code
+
+    def codes(self, column: str, values: Iterable[Any]) -> set[int]:
+        """Codes of the given dictionary values; unknown values are ignored."""
+        index = {value: code for code, value in enumerate(self.dictionaries[column])}
+        return {index[value] for value in values if value in index}
+
+    def _match(self, column: str, values: Any) -> bytes:
+        if not isinstance(values, set | frozenset | list | tuple):
+            values = (values,)
+        wanted = self.codes(column, values) if column in self.dictionaries else set(values)
+        return bytes(value in wanted for value in self.columns[column])
+
+    def mask(
+        self,
+        date_from: date | None = None,
+        date_to: date | None = None,
+        account: Any = None,
+        category: Any = None,
+        currency: Any = None,
+        type_id: Any = None,
+    ) -> bytes:
+        """Byte per row, 1 if it matches every given condition; values may be single or collections.
+
+        Accounts and categories are Bluecoins IDs, currencies are codes like `'USD'`; `date_to` is inclusive.
+        """
+        masks = []
+        days = self.columns['day']
+        if date_from is not None:
+            low = date_to_day(date_from)
+            masks.append(bytes(day >= low for day in days))
+        if date_to is not None:
+            high = date_to_day(date_to)
+            masks.append(bytes(day <= high for day in days))
+        for column, values in (('account', account), ('category', category), ('currency', currency)):
+            if values is not None:
+                masks.append(self._match(column, values))
+        if type_id is not None:
+            masks.append(self._match('type', type_id))
+        return combine(*masks) if masks else b'\x01' * len(self)
+
+    def select(self, column: str, mask: bytes | None = None) -> list[int]:
+        """Values of the column (codes for coded ones) where the mask is set."""
+        values = self.columns[column]
+        return list(values) if mask is None else list(compress(values, mask))
+
+    def total(self, mask: bytes | None = None, values: str = 'amount') -> int:
+        column = self.columns[values]
+        return sum(column) if mask is None else sum(compress(column, mask))
+
+    def buckets(self, unit: str) -> tuple[list[int], list[Any]]:
+        """Bucket code per row and the bucket keys (dates, `'YYYY-MM'` or years), codes sorted by key."""
+        days = self.columns['day']
+        keys = {day: _bucket_key(day, unit) for day in set(days)}
+        ordered = sorted(set(keys.values()))
+        index = {key: code for code, key in enumerate(ordered)}
+        by_day = {day: index[key] for day, key in keys.items()}
+        return [by_day[day] for day in days], ordered
+
+    def sum_by(self, key: str, mask: bytes | None = None, values: str = 'amount') -> dict[Any, int]:
+        """Sums of `values` grouped by a column or a date bucket (see `BUCKETS`), keys decoded and sorted."""
+        codes: Sequence[int]
+        names: list[Any] | None
+        if key in BUCKETS:
+            codes, names = self.buckets(key)
+        else:
+            codes, names = self.columns[key], self.dictionaries.get(key)
+        column: Sequence[int] = self.columns[values]
+        if mask is not None:
+            codes, column = list(compress(codes, mask)), list(compress(column, mask))
+
+        sums: dict[int, int] = {}
+        for code, value in zip(codes, column, strict=True):
+            sums[code] = sums.get(code, 0) + value
+        decoded = {(names[code] if names is not None else code): total for code, total in sums.items()}
+        # NOTE: `None` (e.g. transactions without a category) goes last
+        return dict(sorted(decoded.items(), key=lambda item: (item[0] is None, item[0] if item[0] is not None else 0)))
+
+
+def combine(*masks: bytes) -> bytes:
+    """Rows set in every mask."""
+    size = len(masks[0])
+    result = int.from_bytes(masks[0], 'little')
+    for mask in masks[1:]:
+        result &= int.from_bytes(mask, 'little')
+    return result.to_bytes(size, 'little')
+
+
+def invert(mask: bytes) -> bytes:
+    return mask.translate(bytes.maketrans(b'\x00\x01', b'\x01\x00'))
+
+
+async def read_ledger(conn: 'Connection', chunk_size: int = _CHUNK_SIZE) -> Ledger:
+    """Scan `TRANSACTIONSTABLE` once into in-memory arrays."""
+    ids, days, amounts, natives, types = array('q'), array('i'), array('q'), array('q'), array('b')
+    accounts, categories, currencies = array('i'), array('i'), array('h')
+    dictionaries: dict[str, list[Any]] = {name: [] for name in DICTIONARY_COLUMNS}
+    index: dict[str, dict[Any, int]] = {name: {} for name in DICTIONARY_COLUMNS}
+
+    def code(column: str, value: Any) -> int:
+        codes = index[column]
+        if value not in codes:
+            codes[value] = len(codes)
+            dictionaries[column].append(value)
+        return codes[value]
+
+    async with conn.execute(_LEDGER_QUERY) as cur:
+        while rows := await cur.fetchmany(chunk_size):
+            for id_, day, amount, native, type_id, account, category, currency in rows:
+                ids.append(id_)
+                days.append(day or 0)
+                amounts.append(amount or 0)
+                natives.append(native or 0)
+                types.append(type_id or 0)
+                accounts.append(code('account', account))
+                categories.append(code('category', category))
+                currencies.append(code('currency', currency))
+    columns: dict[str, Sequence[int]] = {
+        'id': ids,
+        'day': days,
+        'amount': amounts,
+        'native': natives,
+        'type': types,
+        'account': accounts,
+        'category': categories,
+        'currency': currencies,
+    }
+    return Ledger(columns, dictionaries)
+
+
+def write_ledger(ledger: Ledger, path: Path) -> None:
+    """Write the arrays to a cache file: a header, the dictionaries as JSON and the columns, 8-byte aligned."""
+    meta = json.dumps(ledger.dictionaries).encode()
+    tmp = path.with_name(f'.{path.name}.tmp')
+    try:
+        with tmp.open('wb') as f:
+            f.write(_HEADER.pack(_MAGIC, len(ledger), len(meta)))
+            f.write(meta + b'\x00' * _padding(len(meta)))
+            for name, typecode in COLUMNS.items():
+                data = array(typecode, ledger.columns[name]).tobytes()
+                f.write(data + b'\x00' * _padding(len(data)))
+        tmp.replace(path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def open_ledger(path: Path) -> Ledger:
+    """Memory-map a cache file written by `write_ledger`; columns are views of the mapping."""
+    with path.open('rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, rows, meta_size = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC:
+            raise ValueError(f'`{path.name}` is not a ledger cache file')
+        offset = _HEADER.size
+        dictionaries = json.loads(buffer[offset : offset + meta_size])
+        offset += meta_size + _padding(meta_size)
+
+        view = memoryview(buffer)
+        columns: dict[str, Sequence[int]] = {}
+        for name, typecode in COLUMNS.items():
+            size = rows * array(typecode).itemsize
+            if offset + size > len(buffer):
+                raise ValueError(f'`{path.name}` is truncated')
+            columns[name] = view[offset : offset + size].cast(typecode)  # type: ignore[call-overload]
+            offset += size + _padding(size)
+        view.release()
+    except BaseException:
+        buffer.close()
+        raise
+    return Ledger(columns, dictionaries, buffer)
+
+
+def _cache_path(db_path: Path, fingerprint: str, cache_dir: Path) -> Path:
+    from cluecoins.backup import source_name
+
+    return cache_dir / f'{source_name(db_path)}-{fingerprint}.ledger'
+
+
+async def load_ledger(db_path: Path, cache_dir: Path | None = None) -> Ledger:
+    """Ledger of the database, from the cache when the file hasn't changed since it was written."""
+    from cluecoins.database import browse_db
+
+    cache_dir = cache_dir or LEDGER_CACHE_DIR
+    header = read_header(db_path)
+    # NOTE: In WAL mode commits don't touch the main file header, so the fingerprint can't be trusted
+    cache = _cache_path(db_path, header.fingerprint, cache_dir) if header and not header.is_wal else None
+    if cache is not None and cache.is_file():
+        try:
+            return open_ledger(cache)
+        except (OSError, ValueError):
+            cache.unlink(missing_ok=True)
+
+    async with browse_db(db_path) as conn:
+        ledger = await read_ledger(conn)
+    if cache is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # NOTE: Compared, not globbed, as file names may contain `[` and other pattern characters
+        for stale in cache_dir.glob(f'*-{"?" * 16}.ledger'):
+            if stale != cache and stale.name.rsplit('-', 1)[0] == cache.name.rsplit('-', 1)[0]:
+                stale.unlink(missing_ok=True)
+        await asyncio.to_thread(write_ledger, ledger, cache)
+    return ledger
@@ -0,0 +1,171 @@
+"""Net worth over time in the base currency.
+
+A single sweep over the ledger (see `cluecoins.ledger`) sorted by date once: running balances are kept per account
+and currency, in the currency of the transactions. At the end of every bucket (day, week, month or year) the
+balances are revalued to the base currency with the rate of that day from the quotes cache. Days without a cached
+quote use the last cached one before them or, failing that, the rate of the last transaction in the currency.
+
+The cost is one sort plus O(buckets x currencies); no balance is ever recomputed from the transactions.
+"""
+
+import csv
+from collections import defaultdict
+from collections.abc import Sequence
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import date
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from cluecoins.database import browse_db
+from cluecoins.database import get_base_currency
+from cluecoins.ledger import BUCKETS
+from cluecoins.ledger import Ledger
+from cluecoins.ledger import date_to_day
+from cluecoins.ledger import day_to_date
+from cluecoins.ledger import load_ledger
+from cluecoins.storage import LocalStorage
+
+_MICRO = Decimal(1000000)
+
+
+@dataclass(frozen=True)
+class NetWorthPoint:
+    date: date
+    amount: Decimal
+
+
+@dataclass
+class NetWorth:
+    base_currency: str
+    bucket: str
+    points: list[NetWorthPoint] = field(default_factory=list)
+    # NOTE: Balances at the last point, in the base currency
+    accounts: dict[int, Decimal] = field(default_factory=dict)
+    # NOTE: Currencies valued with a transaction rate at least once, for lack of a cached quote
+    estimated: set[str] = field(default_factory=set)
+
+
+def bucket_ends(first: date, last: date, bucket: str) -> list[date]:
+    """Last day of every bucket from `first` to `last`; the last bucket is cut at `last`."""
+    if bucket not in BUCKETS:
+        raise ValueError(f'unknown bucket `{bucket}`, expected one of {", ".join(BUCKETS)}')
+    ends = []
+    current = first
+    while current <= last:
+        match bucket:
+            case 'day':
+                end = current
+            case 'week':
+                end = current + timedelta(days=6 - current.weekday())
+            case 'month':
+                next_month = current.replace(day=28) + timedelta(days=4)
+                end = next_month - timedelta(days=next_month.day)
+            case _:
+                end = date(current.year, 12, 31)
+        end = min(end, last)
+        ends.append(end)
+        current = end + timedelta(days=1)
+    return ends
+
+
+class _Rates:
+    """Rate of a currency on a day, for days queried in increasing order."""
+
+    def __init__(self, quotes: Sequence[tuple[date, Decimal]]) -> None:
+        self._days = [date_to_day(date_) for date_, _ in quotes]
+        self._rates = [float(rate) for _, rate in quotes]
+        self._next = 0
+        self._current: float | None = None
+
+    def at(self, day: int) -> float | None:
+        while self._next < len(self._days) and self._days[self._next] <= day:
+            self._current = self._rates[self._next]
+            self._next += 1
+        return self._current
+
+
+def net_worth(
+    ledger: Ledger,
+    base_currency: str,
+    bucket: str = 'month',
+    quotes: dict[str, list[tuple[date, Decimal]]] | None = None,
+    until: date | None = None,
+) -> NetWorth:
+    """Net worth at the end of every bucket from the first transaction to `until` (the last one by default).
+
+    `quotes` are units of a currency per unit of the base currency by date, e.g. from `LocalStorage.get_quotes`.
+    """
+    result = NetWorth(base_currency, bucket)
+    if not len(ledger):
+        return result
+
+    days = ledger.columns['day']
+    natives, amounts = ledger.columns['native'], ledger.columns['amount']
+    accounts, currencies = ledger.columns['account'], ledger.columns['currency']
+    currency_names = ledger.dictionaries['currency']
+    quotes = quotes or {}
+
+    order = sorted(range(len(ledger)), key=days.__getitem__)
+    last = until or day_to_date(days[order[-1]])
+    ends = bucket_ends(day_to_date(days[order[0]]), last, bucket)
+
+    # NOTE: Amounts without a currency are taken as in the base currency
+    is_base = [name in (base_currency, None) for name in currency_names]
+    rates = [_Rates(quotes.get(name) or ()) for name in currency_names]
+    last_rates: list[float | None] = [None] * len(currency_names)
+    by_currency = [0] * len(currency_names)
+    balances: dict[tuple[int, int], int] = defaultdict(int)
+
+    def rate(currency: int, day: int) -> float:
+        if is_base[currency]:
+            return 1.0
+        value = rates[currency].at(day)
+        if value is None:
+            result.estimated.add(currency_names[currency])
+            value = last_rates[currency]
+        return value or 1.0
+
+    i, size = 0, len(order)
+    end_day = 0
+    for end in ends:
+        end_day = date_to_day(end)
+        while i < size and days[order[i]] <= end_day:
+            row = order[i]
+            currency, native = currencies[row], natives[row]
+            balances[accounts[row], currency] += native
+            by_currency[currency] += native
+            if amounts[row]:
+                last_rates[currency] = native / amounts[row]
+            i += 1
+        total = sum(balance / rate(currency, end_day) for currency, balance in enumerate(by_currency) if balance)
+        result.points.append(NetWorthPoint(end, Decimal(round(total)) / _MICRO))
+
+    per_account: dict[int, float] = defaultdict(float)
+    for (account, currency), balance in balances.items():
+        per_account[ledger.decode('account', account)] += balance / rate(currency, end_day)
+    result.accounts = {account: Decimal(round(value)) / _MICRO for account, value in per_account.items()}
+    return result
+
+
+async def load_net_worth(db_path: Path, bucket: str = 'month', until: date | None = None) -> NetWorth:
+    """Net worth of the database, revalued with the cached quotes; nothing is fetched."""
+    async with browse_db(db_path) as conn:
+        base_currency = await get_base_currency(conn) or 'USD'
+    with await load_ledger(db_path) as ledger:
+        foreign = [c for c in ledger.dictionaries['currency'] if c not in (base_currency, None)]
+        quotes = {}
+        if foreign:
+            storage = LocalStorage()
+            async with storage.connect():
+                await storage.create_schema()
+                quotes = await storage.get_quotes(base_currency, foreign)
+        return net_worth(ledger, base_currency, bucket, quotes, until)
+
+
+def write_net_worth(result: NetWorth, path: Path) -> None:
+    with path.open('w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(('date', f'net_worth_{result.base_currency}'))
+        writer.writerows((point.date.isoformat(), point.amount) for point in result.points)
@@ -0,0 +1,257 @@
+"""Deduplicated store of database snapshots.
+
+A database is split into SQLite pages (the page size is taken from the header), every page is hashed and only
+pages not seen before are stored, zlib-compressed. The list of page hashes of a snapshot is itself split into
+chunks of `CHUNK_PAGES` hashes that are stored the same way, so the manifest of a snapshot is a few chunk hashes
+and a day of changes costs the changed pages plus the chunks listing them.
+
+Everything lives in a single SQLite file, `PAGE_STORE_PATH`. Restoring rebuilds the file page by page into a
+temporary file and copies it into the target with the backup API.
+"""
+
+import asyncio
+import sqlite3
+import tempfile
+import zlib
+from collections.abc import Callable
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from hashlib import blake2b
+from pathlib import Path
+
+import xdg
+
+from cluecoins.backup import replace_contents
+from cluecoins.backup import source_name
+from cluecoins.database import browse_uri
+from cluecoins.header import read_header
+
+PAGE_STORE_PATH = xdg.XDG_DATA_HOME / 'cluecoins' / 'pages.sqlite3'
+HASH_SIZE = 16
+CHUNK_PAGES = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (hash blob PRIMARY KEY, data blob) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS chunks (hash blob PRIMARY KEY, hashes blob) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS snapshots (
+    id integer PRIMARY KEY,
+    name text,
+    created text,
+    page_size integer,
+    page_count integer,
+    new_pages integer,
+    manifest blob
+);
+"""
+
+
+@dataclass(frozen=True)
+class StoredSnapshot:
+    id: int
+    name: str
+    created: datetime
+    page_size: int
+    page_count: int
+    new_pages: int
+
+    @property
+    def size(self) -> int:
+        return self.page_size * self.page_count
+
+
+@dataclass(frozen=True)
+class StoreStats:
+    snapshots: int
+    pages: int
+    stored_bytes: int
+    logical_bytes: int
+
+
+def _hash(data: bytes) -> bytes:
+    return blake2b(data, digest_size=HASH_SIZE).digest()
+
+
+def _split(hashes: bytes) -> list[bytes]:
+    return [hashes[i : i + HASH_SIZE] for i in range(0, len(hashes), HASH_SIZE)]
+
+
+class PageStore:
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path or PAGE_STORE_PATH
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.executescript(_SCHEMA)
+        return conn
+
+    @staticmethod
+    def _snapshot(row: tuple) -> StoredSnapshot:
+        id_, name, created, page_size, page_count, new_pages = row
+        return StoredSnapshot(id_, name, datetime.fromisoformat(created), page_size, page_count, new_pages)
+
+    def _add(self, path: Path, name: str) -> StoredSnapshot:
+        header = read_header(path)
+        if header is None:
+            raise Exception(f'`{path.name}` is empty')
+        if header.is_wal:
+            # NOTE: The file alone misses the pages in the WAL; take a consistent copy first
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.TemporaryDirectory(dir=self.path.parent) as tmp:
+                copy = Path(tmp) / path.name
+                replace_contents(path, copy)
+                # NOTE: The copy keeps the WAL flag of the header; without a WAL of its own it's a plain file
+                conn = sqlite3.connect(copy)
+                try:
+                    conn.execute('PRAGMA journal_mode = DELETE')
+                finally:
+                    conn.close()
+                return self._add(copy, name)
+
+        # NOTE: A read transaction holds a SHARED lock, so no writer can commit while the pages are read
+        source = sqlite3.connect(browse_uri(path), uri=True)
+        conn = self._connect()
+        try:
+            source.execute('BEGIN')
+            source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+            header = read_header(path)
+            assert header is not None
+            with path.open('rb') as f:
+                return self._store_pages(conn, name, header.page_size, iter(lambda: f.read(header.page_size), b''))
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+            source.close()
+
+    def _store_pages(
+        self, conn: sqlite3.Connection, name: str, page_size: int, pages: Iterator[bytes]
+    ) -> StoredSnapshot:
+        manifest: list[bytes] = []
+        chunk: list[bytes] = []
+        page_count = new_pages = 0
+
+        def put_chunk() -> None:
+            hashes = b''.join(chunk)
+            digest = _hash(hashes)
+            conn.execute('INSERT OR IGNORE INTO chunks (hash, hashes) VALUES (?, ?)', (digest, hashes))
+            manifest.append(digest)
+            chunk.clear()
+
+        for page in pages:
+            digest = _hash(page)
+            if not conn.execute('SELECT 1 FROM pages WHERE hash = ?', (digest,)).fetchone():
+                conn.execute('INSERT INTO pages (hash, data) VALUES (?, ?)', (digest, zlib.compress(page)))
+                new_pages += 1
+            chunk.append(digest)
+            page_count += 1
+            if len(chunk) == CHUNK_PAGES:
+                put_chunk()
+        if chunk:
+            put_chunk()
+
+        created = datetime.now()
+        cur = conn.execute(
+            """INSERT INTO snapshots (name, created, page_size, page_count, new_pages, manifest)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+            (name, created.isoformat(), page_size, page_count, new_pages, b''.join(manifest)),
+        )
+        conn.commit()
+        assert cur.lastrowid is not None
+        return StoredSnapshot(cur.lastrowid, name, created, page_size, page_count, new_pages)
+
+    def _iter_pages(self, conn: sqlite3.Connection, snapshot_id: int) -> Iterator[bytes]:
+        row = conn.execute('SELECT manifest FROM snapshots WHERE id = ?', (snapshot_id,)).fetchone()
+        if row is None:
+            raise Exception(f'snapshot {snapshot_id} does not exist')
+        for chunk_hash in _split(row[0]):
+            (hashes,) = conn.execute('SELECT hashes FROM chunks WHERE hash = ?', (chunk_hash,)).fetchone()
+            for page_hash in _split(hashes):
+                (data,) = conn.execute('SELECT data FROM pages WHERE hash = ?', (page_hash,)).fetchone()
+                yield zlib.decompress(data)
+
+    def _restore(self, snapshot_id: int, target: Path, progress: Callable[[int, int], None] | None) -> None:
+        conn = self._connect()
+        tmp = target.with_name(f'.{target.name}.restore')
+        try:
+            with tmp.open('wb') as f:
+                for page in self._iter_pages(conn, snapshot_id):
+                    f.write(page)
+            replace_contents(tmp, target, progress)
+        finally:
+            tmp.unlink(missing_ok=True)
+            conn.close()
+
+    async def add(self, path: Path, name: str | None = None) -> StoredSnapshot:
+        """Store the pages of the database not seen before; `name` defaults to its `source_name`."""
+        return await asyncio.to_thread(self._add, path, name or source_name(path))
+
+    async def restore(
+        self,
+        snapshot_id: int,
+        target: Path,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> StoredSnapshot | None:
+        """Rebuild the snapshot into `target`; the current contents are stored first and returned."""
+        previous = None
+        if target.is_file() and target.stat().st_size:
+            previous = await self.add(target)
+        await asyncio.to_thread(self._restore, snapshot_id, target, progress)
+        return previous
+
+    def snapshots(self, name: str | None = None) -> list[StoredSnapshot]:
+        """Stored snapshots of the database with the given name (all by default), newest first."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                """SELECT id, name, created, page_size, page_count, new_pages FROM snapshots
+                    WHERE ? IS NULL OR name = ? ORDER BY id DESC""",
+                (name, name),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [self._snapshot(row) for row in rows]
+
+    def prune(self, name: str, keep: int) -> int:
+        """Delete all but the newest `keep` snapshots of a database and pages no longer used; returns pages freed."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                'DELETE FROM snapshots WHERE name = ? AND id NOT IN (SELECT id FROM snapshots WHERE name = ? ORDER BY id DESC LIMIT ?)',
+                (name, name, keep),
+            )
+            freed = self._collect_garbage(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        return freed
+
+    @staticmethod
+    def _collect_garbage(conn: sqlite3.Connection) -> int:
+        chunks = {h for (manifest,) in conn.execute('SELECT manifest FROM snapshots') for h in _split(manifest)}
+        pages: set[bytes] = set()
+        for hash_, hashes in conn.execute('SELECT hash, hashes FROM chunks'):
+            if hash_ in chunks:
+                pages.update(_split(hashes))
+
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS used (hash blob PRIMARY KEY) WITHOUT ROWID')
+        conn.execute('DELETE FROM temp.used')
+        conn.executemany('INSERT INTO temp.used (hash) VALUES (?)', ((h,) for h in chunks))
+        conn.execute('DELETE FROM chunks WHERE hash NOT IN (SELECT hash FROM temp.used)')
+        conn.execute('DELETE FROM temp.used')
+        conn.executemany('INSERT INTO temp.used (hash) VALUES (?)', ((h,) for h in pages))
+        return conn.execute('DELETE FROM pages WHERE hash NOT IN (SELECT hash FROM temp.used)').rowcount
+
+    def stats(self) -> StoreStats:
+        conn = self._connect()
+        try:
+            snapshots, logical = conn.execute(
+                'SELECT COUNT(*), TOTAL(page_size * page_count) FROM snapshots'
+            ).fetchone()
+            pages, stored = conn.execute('SELECT COUNT(*), TOTAL(length(data)) FROM pages').fetchone()
+            (chunk_bytes,) = conn.execute('SELECT TOTAL(length(hashes)) FROM chunks').fetchone()
+        finally:
+            conn.close()
+        return StoreStats(snapshots, pages, int(stored + chunk_bytes), int(logical))
@@ -0,0 +1,185 @@
+"""Opt-in cProfile runs of single actions.
+
+Set `CLUECOINS_PROFILE` to a comma-separated list of actions, or `all`:
+
+- `convert`: updating the exchange rates of a database;
+- `mount`: a screen from its mount until it's drawn, including the first page of tables;
+- `reload`: a page of a table screen, e.g. after Next or a sort;
+- any `cluecoins-batch` command run with `--profile`.
+
+Every run writes `<action>-<name>-<time>.pstats` (open with `python -m pstats` or snakeviz) and `.collapsed` stacks
+(for `flamegraph.pl` or speedscope) to `PROFILE_DIR`, and passes a summary of the top functions to the log. Runs
+don't nest; an action started while another one is profiled is part of that profile. When an action isn't enabled
+`profile` returns a shared no-op context manager, so the hooks cost a set lookup.
+"""
+
+from collections import defaultdict
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+from contextlib import nullcontext
+from datetime import datetime
+from os import environ as env
+from pathlib import Path
+from types import TracebackType
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Self
+
+import xdg
+
+if TYPE_CHECKING:
+    import pstats
+
+PROFILE_DIR = xdg.XDG_CACHE_HOME / 'cluecoins' / 'profiles'
+TOP = 15
+
+# NOTE: Stacks below this share of the total time are left out of the collapsed file, or the walk would explode
+_MIN_SHARE = 0.0001
+_NULL = nullcontext()
+
+_Func = tuple[str, int, str]
+
+_enabled: set[str] = {name.strip() for name in env.get('CLUECOINS_PROFILE', '').split(',') if name.strip()}
+_active: 'Profile | None' = None
+
+
+def enable(*actions: str) -> None:
+    _enabled.update(actions)
+
+
+def disable(*actions: str) -> None:
+    """Stop profiling the actions, or all of them if none are given."""
+    if actions:
+        _enabled.difference_update(actions)
+    else:
+        _enabled.clear()
+
+
+def is_enabled(action: str) -> bool:
+    return action in _enabled or 'all' in _enabled
+
+
+def label(func: _Func) -> str:
+    filename, line, name = func
+    if filename == '~':
+        # NOTE: Built-ins, e.g. `<method 'execute' of 'sqlite3.Cursor' objects>`
+        return name
+    return f'{name} ({Path(filename).name}:{line})'
+
+
+def summary(stats: 'pstats.Stats', top: int = TOP) -> list[str]:
+    """Functions with the highest cumulative time."""
+    raw: dict[_Func, tuple] = stats.stats  # type: ignore[attr-defined]
+    lines = [f'{"cumulative":>12} {"own":>11} {"calls":>8}  function']
+    for func, (_, calls, own, cumulative, _) in sorted(raw.items(), key=lambda item: item[1][3], reverse=True)[:top]:
+        lines.append(f'{cumulative * 1000:9.1f} ms {own * 1000:8.1f} ms {calls:8}  {label(func)}')
+    return lines
+
+
+def collapsed_stacks(stats: 'pstats.Stats') -> dict[str, int]:
+    """Microseconds of own time per call stack, `root;caller;callee`.
+
+    cProfile keeps callers, not stacks, so the time of a function is split between the ways it was reached in
+    proportion to the time spent through each caller, like flameprof does.
+    """
+    raw: dict[_Func, tuple] = stats.stats  # type: ignore[attr-defined]
+    callees: dict[_Func, list[tuple[_Func, float]]] = defaultdict(list)
+    for func, (*_, callers) in raw.items():
+        for caller, (*_, cumulative) in callers.items():
+            callees[caller].append((func, cumulative))
+    roots = [func for func, (*_, callers) in raw.items() if not any(caller in raw for caller in callers)]
+    total = sum(raw[func][3] for func in roots) or 1.0
+
+    stacks: dict[str, float] = defaultdict(float)
+    # NOTE: Depth first with an explicit stack; deep recursion in the app would hit the interpreter limit here
+    todo: list[tuple[_Func, str, frozenset[_Func], float]] = [
+        (func, label(func), frozenset((func,)), raw[func][3]) for func in roots
+    ]
+    while todo:
+        func, path, seen, seconds = todo.pop()
+        _, _, own, cumulative, _ = raw[func]
+        share = seconds / cumulative if cumulative else 0.0
+        stacks[path] += own * share
+        for callee, through in callees[func]:
+            callee_seconds = through * share
+            if callee in seen or callee_seconds < total * _MIN_SHARE:
+                continue
+            todo.append((callee, f'{path};{label(callee)}', seen | {callee}, callee_seconds))
+    return {path: round(seconds * 1e6) for path, seconds in stacks.items() if seconds * 1e6 >= 1}
+
+
+class Profile:
+    """A cProfile run written to `PROFILE_DIR` when stopped."""
+
+    def __init__(self, action: str, name: str | None = None, log: Callable[[str], Any] | None = None) -> None:
+        # NOTE: Imported here, so that hooks of actions that aren't profiled don't load the profiler
+        import cProfile
+
+        self.action = action
+        self.name = name
+        self._log = log
+        self._profiler = cProfile.Profile()
+        self.path: Path | None = None
+
+    def start(self) -> None:
+        global _active
+        _active = self
+        self._profiler.enable()
+
+    def stop(self) -> None:
+        global _active
+        self._profiler.disable()
+        _active = None
+
+        import pstats
+
+        stats = pstats.Stats(self._profiler)
+        self.path = self.write(stats)
+        if self._log is not None:
+            self._log(f'{self.action} profiled, see `{self.path}` and `{self.path.with_suffix(".collapsed")}`')
+            for line in summary(stats):
+                self._log(line)
+
+    def write(self, stats: 'pstats.Stats') -> Path:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        stem = '-'.join(part for part in (self.action, self.name, stamp) if part).replace('/', '_')
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILE_DIR / f'{stem}.pstats'
+        stats.dump_stats(path)
+        stacks = collapsed_stacks(stats)
+        path.with_suffix('.collapsed').write_text(''.join(f'{stack} {us}\n' for stack, us in sorted(stacks.items())))
+        return path
+
+    def __enter__(self) -> Self:
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.stop()
+
+
+def start_profile(action: str, name: str | None = None, log: Callable[[str], Any] | None = None) -> Profile | None:
+    """Start profiling the action if it's enabled and nothing else is being profiled; `stop` the result when done."""
+    if not _enabled or not is_enabled(action) or _active is not None:
+        return None
+    profile_ = Profile(action, name, log)
+    profile_.start()
+    return profile_
+
+
+def profile(
+    action: str, name: str | None = None, log: Callable[[str], Any] | None = None
+) -> AbstractContextManager[Profile | None]:
+    """Profile the block if the action is enabled.
+
+    with profile('convert', db_path.stem, log):
+        ...
+    """
+    if not _enabled or not is_enabled(action) or _active is not None:
+        return _NULL
+    return Profile(action, name, log)
@@ -5,7 +5,6 @@ from datetime import timedelta
 from decimal import Decimal
 from os import environ as env
 
-import aiohttp
 from aiosqlite import IntegrityError
 
 from cluecoins.storage import LocalStorage
@@ -27,6 +26,9 @@ class CurrencyBeaconQuoteProvider:
         base_currency: str,
     ) -> None:
         """Getting quotes from the Exchangerate API and writing them to the local database"""
+        # NOTE: aiohttp takes longer to import than the rest of cluecoins; load it when quotes are actually fetched
+        import aiohttp
+
         _key = CB_API_KEY
 
         # FIXME: Overkill
@@ -77,7 +79,8 @@ class CurrencyBeaconQuoteProvider:
             return Decimal('1')
 
         rate = await self._storage.get_quote(date_, base_currency, quote_currency)
-        if not rate:
+        # NOTE: Read-only storage means quotes were prefetched by the parent process; don't fetch what's missing
+        if not rate and not self._storage.read_only:
             self._quote_currencies.add(quote_currency)
             await self._fetch_quotes(date_, base_currency)
             rate = await self._storage.get_quote(date_, base_currency, quote_currency)
@@ -0,0 +1,137 @@
+"""Income and expense per month over the category tree.
+
+Bluecoins categories are two levels deep: child categories (`CHILDCATEGORYTABLE`, the ones transactions point to)
+belong to parent categories (`PARENTCATEGORYTABLE`), which belong to a group (`CATEGORYGROUPTABLE`, e.g. Income or
+Expense). Per-month totals of child categories come from the summary cells (see `cluecoins.summary`), so only
+transactions added since the last report are scanned; parents and groups are rolled up from their children in
+memory, without another query.
+"""
+
+from dataclasses import dataclass
+from dataclasses import field
+from decimal import Decimal
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from cluecoins.database import browse_db
+from cluecoins.header import read_header
+from cluecoins.storage import LocalStorage
+from cluecoins.summary import CategoryMonth
+from cluecoins.summary import SummaryCache
+
+if TYPE_CHECKING:
+    from aiosqlite import Connection
+
+_TREE_QUERY = """SELECT c.categoryTableID, c.childCategoryName, p.parentCategoryTableID, p.parentCategoryName,
+        g.categoryGroupTableID, g.categoryGroupName
+    FROM CHILDCATEGORYTABLE c
+    LEFT JOIN PARENTCATEGORYTABLE p ON p.parentCategoryTableID = c.parentCategoryID
+    LEFT JOIN CATEGORYGROUPTABLE g ON g.categoryGroupTableID = p.categoryGroupID
+    ORDER BY g.categoryGroupTableID, p.parentCategoryName, c.childCategoryName"""
+
+_UNKNOWN = '(unknown)'
+
+
+@dataclass
+class CategoryNode:
+    """A group, parent or child category with its net amount (income minus expense) per `'YYYY-MM'` month."""
+
+    id: int | None
+    name: str
+    months: dict[str, Decimal] = field(default_factory=dict)
+    children: list['CategoryNode'] = field(default_factory=list)
+
+    def between(self, month_from: str | None = None, month_to: str | None = None) -> dict[str, Decimal]:
+        """Months in the range, both ends inclusive."""
+        return {
+            month: amount
+            for month, amount in self.months.items()
+            if (month_from is None or month >= month_from) and (month_to is None or month <= month_to)
+        }
+
+    def total(self, month_from: str | None = None, month_to: str | None = None) -> Decimal:
+        return sum(self.between(month_from, month_to).values(), Decimal(0))
+
+    def add(self, months: dict[str, Decimal]) -> None:
+        for month, amount in months.items():
+            self.months[month] = self.months.get(month, Decimal(0)) + amount
+
+
+@dataclass
+class CategoryReport:
+    groups: list[CategoryNode] = field(default_factory=list)
+
+    @property
+    def months(self) -> list[str]:
+        """Months with any income or expense, oldest first."""
+        return sorted({month for group in self.groups for month in group.months})
+
+    def walk(self) -> list[tuple[int, CategoryNode]]:
+        """Every node with its depth (0 for groups), depth first."""
+        nodes = []
+        stack = [(0, group) for group in reversed(self.groups)]
+        while stack:
+            depth, node = stack.pop()
+            nodes.append((depth, node))
+            stack.extend((depth + 1, child) for child in reversed(node.children))
+        return nodes
+
+
+def build_report(tree: list[tuple], cells: list[CategoryMonth]) -> CategoryReport:
+    """Arrange the per-category cells into the tree and roll them up; categories without transactions are left out.
+
+    `tree` rows are `(child_id, child_name, parent_id, parent_name, group_id, group_name)` in display order.
+    """
+    by_category: dict[int, dict[str, Decimal]] = {}
+    for cell in cells:
+        months = by_category.setdefault(cell.category_id, {})
+        months[cell.month] = months.get(cell.month, Decimal(0)) + cell.income + cell.expense
+
+    groups: dict[int | None, CategoryNode] = {}
+    parents: dict[int | None, CategoryNode] = {}
+    known = set()
+    for child_id, child_name, parent_id, parent_name, group_id, group_name in tree:
+        known.add(child_id)
+        if child_id not in by_category:
+            continue
+        child = CategoryNode(child_id, child_name, by_category[child_id])
+        if parent_id not in parents:
+            group = groups.get(group_id)
+            if group is None:
+                group = groups[group_id] = CategoryNode(group_id, group_name or _UNKNOWN)
+            parents[parent_id] = CategoryNode(parent_id, parent_name or _UNKNOWN)
+            group.children.append(parents[parent_id])
+        parents[parent_id].children.append(child)
+
+    # NOTE: Transactions may point to categories deleted since
+    orphans = [CategoryNode(id_, f'#{id_}', months) for id_, months in by_category.items() if id_ not in known]
+    if orphans:
+        unknown = CategoryNode(None, _UNKNOWN, children=orphans)
+        groups.setdefault(None, CategoryNode(None, _UNKNOWN)).children.append(unknown)
+
+    for group in groups.values():
+        for parent in group.children:
+            for child in parent.children:
+                parent.add(child.months)
+            group.add(parent.months)
+    return CategoryReport(list(groups.values()))
+
+
+async def fetch_category_tree(conn: 'Connection') -> list[tuple]:
+    async with conn.execute(_TREE_QUERY) as cur:
+        return [tuple(row) async for row in cur]
+
+
+async def load_category_report(db_path: Path) -> CategoryReport:
+    """Report of the database; the summary cells are brought up to date first."""
+    header = read_header(db_path)
+    source = str(db_path.resolve())
+    storage = LocalStorage()
+    async with storage.connect(), browse_db(db_path) as conn:
+        summary = SummaryCache(storage)
+        await summary.create_schema()
+        # NOTE: In WAL mode commits don't touch the main file header, so the fingerprint can't be trusted
+        await summary.refresh(conn, source, header.fingerprint if header and not header.is_wal else None)
+        cells = await summary.category_months(source)
+        tree = await fetch_category_tree(conn)
+    return build_report(tree, cells)
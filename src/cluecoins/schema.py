@@ -0,0 +1,199 @@
+"""Verification of the database schema against the one of the supported Bluecoins version.
+
+`sqlite_master` entries and `user_version` are normalized and hashed; the result is compared with
+`REFERENCE_FINGERPRINT`, the hash of `bluecoins.sql`. That's a single small query for a matching file. Only on a
+mismatch both schemas are described column by column to build a `SchemaDiff`.
+
+Tables and indexes created by cluecoins itself (`CLUE_*` archive tables, `cluecoins_*` performance indexes) are
+ignored.
+"""
+
+import re
+import sqlite3
+from collections.abc import Iterable
+from dataclasses import dataclass
+from dataclasses import field
+from functools import cache
+from hashlib import blake2b
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from aiosqlite import Connection
+
+REFERENCE_SCHEMA_PATH = Path(__file__).parent / 'bluecoins.sql'
+# NOTE: Not a part of `bluecoins.sql`; the value Bluecoins 12.9.5 files report, see `docs/database.md`
+REFERENCE_USER_VERSION = 42
+REFERENCE_FINGERPRINT = '794b1e9da87e988f7c46aec81146f53a'
+
+_IGNORED_PREFIXES = ('sqlite_', 'cluecoins_', 'clue_')
+
+_MASTER_QUERY = (
+    "SELECT type, name, tbl_name, sql FROM sqlite_master WHERE type IN ('table', 'index', 'view', 'trigger')"
+)
+
+SchemaEntry = tuple[str, str, str, str | None]
+
+
+@dataclass
+class SchemaDiff:
+    user_version: tuple[int, int] | None = None
+    missing_tables: list[str] = field(default_factory=list)
+    extra_tables: list[str] = field(default_factory=list)
+    missing_columns: dict[str, list[str]] = field(default_factory=dict)
+    extra_columns: dict[str, list[str]] = field(default_factory=dict)
+    changed_columns: dict[str, list[str]] = field(default_factory=dict)
+    missing_indexes: list[str] = field(default_factory=list)
+    extra_indexes: list[str] = field(default_factory=list)
+    changed_indexes: list[str] = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        return not any(vars(self).values())
+
+    def describe(self) -> list[str]:
+        lines = []
+        if self.user_version:
+            lines.append(f'user version {self.user_version[0]}, expected {self.user_version[1]}')
+        lines.extend(f'missing table `{name}`' for name in self.missing_tables)
+        lines.extend(f'unexpected table `{name}`' for name in self.extra_tables)
+        for kind, columns in (
+            ('missing', self.missing_columns),
+            ('unexpected', self.extra_columns),
+            ('changed', self.changed_columns),
+        ):
+            lines.extend(f'{kind} column `{table}.{column}`' for table, names in columns.items() for column in names)
+        lines.extend(f'missing index `{name}`' for name in self.missing_indexes)
+        lines.extend(f'unexpected index `{name}`' for name in self.extra_indexes)
+        lines.extend(f'changed index `{name}`' for name in self.changed_indexes)
+        return lines
+
+
+class SchemaMismatchError(Exception):
+    def __init__(self, diff: SchemaDiff) -> None:
+        super().__init__(diff)
+        self.diff = diff
+
+    def __str__(self) -> str:
+        return 'unsupported database schema: ' + '; '.join(self.diff.describe())
+
+
+def normalize_sql(sql: str | None) -> str:
+    """Whitespace-insensitive form of a `CREATE` statement."""
+    if not sql:
+        return ''
+    sql = ' '.join(sql.split())
+    return re.sub(r'\s*([(),])\s*', r'\1', sql)
+
+
+def _is_ignored(name: str) -> bool:
+    return name.lower().startswith(_IGNORED_PREFIXES)
+
+
+def schema_fingerprint(entries: Iterable[SchemaEntry], user_version: int) -> str:
+    digest = blake2b(digest_size=16)
+    for type_, name, tbl_name, sql in sorted(entries):
+        if _is_ignored(name) or _is_ignored(tbl_name):
+            continue
+        digest.update(f'{type_}\x1f{name.lower()}\x1f{normalize_sql(sql)}\x1e'.encode())
+    digest.update(f'user_version={user_version}'.encode())
+    return digest.hexdigest()
+
+
+async def read_schema(conn: 'Connection') -> tuple[list[SchemaEntry], int]:
+    async with conn.execute(_MASTER_QUERY) as cur:
+        entries = [(type_, name, tbl_name, sql) async for type_, name, tbl_name, sql in cur]
+    async with conn.execute('PRAGMA user_version') as cur:
+        row = await cur.fetchone()
+    return entries, row[0] if row else 0
+
+
+def reference_script() -> str:
+    """`bluecoins.sql` as a runnable script."""
+    # NOTE: The dump lists `sqlite_sequence`, which SQLite creates by itself for the first AUTOINCREMENT table
+    return re.sub(
+        r'^CREATE TABLE sqlite_sequence\b[^;]*;\n?', '', REFERENCE_SCHEMA_PATH.read_text(), flags=re.MULTILINE
+    )
+
+
+@cache
+def _reference_connection() -> sqlite3.Connection:
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    conn.executescript(reference_script())
+    conn.execute(f'PRAGMA user_version = {REFERENCE_USER_VERSION}')
+    return conn
+
+
+def reference_fingerprint() -> str:
+    """Fingerprint of `bluecoins.sql`; `REFERENCE_FINGERPRINT` must be updated when it changes."""
+    conn = _reference_connection()
+    return schema_fingerprint(conn.execute(_MASTER_QUERY).fetchall(), conn.execute('PRAGMA user_version').fetchone()[0])
+
+
+def _describe_reference() -> tuple[dict[str, dict[str, tuple]], dict[str, str]]:
+    conn = _reference_connection()
+    entries = conn.execute(_MASTER_QUERY).fetchall()
+    tables = {
+        name: {row[1]: tuple(row[2:]) for row in conn.execute(f"PRAGMA table_info('{name}')")}
+        for type_, name, _, _ in entries
+        if type_ == 'table' and not _is_ignored(name)
+    }
+    indexes = {
+        name: normalize_sql(sql) for type_, name, _, sql in entries if type_ == 'index' and not _is_ignored(name)
+    }
+    return tables, indexes
+
+
+async def _describe(
+    conn: 'Connection', entries: list[SchemaEntry]
+) -> tuple[dict[str, dict[str, tuple]], dict[str, str]]:
+    tables = {}
+    for type_, name, _, _ in entries:
+        if type_ != 'table' or _is_ignored(name):
+            continue
+        async with conn.execute(f"PRAGMA table_info('{name}')") as cur:
+            tables[name] = {row[1]: tuple(row[2:]) async for row in cur}
+    indexes = {
+        name: normalize_sql(sql) for type_, name, _, sql in entries if type_ == 'index' and not _is_ignored(name)
+    }
+    return tables, indexes
+
+
+def _diff_names(actual: Iterable[str], expected: Iterable[str]) -> tuple[list[str], list[str]]:
+    actual, expected = set(actual), set(expected)
+    return sorted(expected - actual), sorted(actual - expected)
+
+
+async def verify_schema(conn: 'Connection') -> SchemaDiff:
+    """Compare the schema with the reference one; an empty diff means it's supported."""
+    entries, user_version = await read_schema(conn)
+    if schema_fingerprint(entries, user_version) == REFERENCE_FINGERPRINT:
+        return SchemaDiff()
+
+    ref_tables, ref_indexes = _describe_reference()
+    ref_version = _reference_connection().execute('PRAGMA user_version').fetchone()[0]
+    tables, indexes = await _describe(conn, entries)
+
+    diff = SchemaDiff()
+    if user_version != ref_version:
+        diff.user_version = (user_version, ref_version)
+    diff.missing_tables, diff.extra_tables = _diff_names(tables, ref_tables)
+    for table in sorted(tables.keys() & ref_tables.keys()):
+        columns, ref_columns = tables[table], ref_tables[table]
+        missing, extra = _diff_names(columns, ref_columns)
+        changed = sorted(c for c in columns.keys() & ref_columns.keys() if columns[c] != ref_columns[c])
+        if missing:
+            diff.missing_columns[table] = missing
+        if extra:
+            diff.extra_columns[table] = extra
+        if changed:
+            diff.changed_columns[table] = changed
+    diff.missing_indexes, diff.extra_indexes = _diff_names(indexes, ref_indexes)
+    diff.changed_indexes = sorted(i for i in indexes.keys() & ref_indexes.keys() if indexes[i] != ref_indexes[i])
+    return diff
+
+
+async def ensure_schema(conn: 'Connection') -> None:
+    """Raise `SchemaMismatchError` unless the schema is the supported one; call it before writing."""
+    diff = await verify_schema(conn)
+    if not diff.is_empty():
+        raise SchemaMismatchError(diff)
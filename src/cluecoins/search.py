@@ -0,0 +1,140 @@
+"""Full-text search over Bluecoins transactions.
+
+The FTS5 index lives in cluecoins' own `db.sqlite3`, so the Bluecoins database is never modified. Every indexed
+transaction has a digest of its searchable text; on refresh only changed, added and removed rows are touched.
+"""
+
+from collections.abc import Callable
+from hashlib import blake2b
+from typing import TYPE_CHECKING
+
+from cluecoins.storage import LocalStorage
+
+if TYPE_CHECKING:
+    from aiosqlite import Connection
+
+_SEARCH_SOURCE_QUERY = """
+SELECT t.transactionsTableID, t.notes, i.itemName, l.labels, c.childCategoryName
+FROM TRANSACTIONSTABLE t
+LEFT JOIN ITEMTABLE i ON i.itemTableID = t.itemID
+LEFT JOIN CHILDCATEGORYTABLE c ON c.categoryTableID = t.categoryID
+LEFT JOIN (
+    SELECT transactionIDLabels AS transactionID, group_concat(labelName, ' ') AS labels
+    FROM LABELSTABLE
+    WHERE transactionIDLabels IS NOT NULL
+    GROUP BY transactionIDLabels
+) l ON l.transactionID = t.transactionsTableID
+"""
+
+_BATCH_SIZE = 5000
+
+
+def _digest(notes: str | None, item: str | None, labels: str | None, category: str | None) -> int:
+    data = '\x1f'.join(v or '' for v in (notes, item, labels, category)).encode()
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), 'big', signed=True)
+
+
+def build_match_query(text: str) -> str:
+    """Turn user input into an FTS5 query: every word must match as a prefix."""
+    tokens = [token.replace('"', '""') for token in text.split()]
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+class TransactionSearchIndex:
+    def __init__(self, storage: LocalStorage, log: Callable = lambda _: None) -> None:
+        self._storage = storage
+        self._log = log
+
+    async def create_schema(self) -> None:
+        await self._storage.db_conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS search_sources (source text PRIMARY KEY, fingerprint text);
+            CREATE TABLE IF NOT EXISTS search_rows (
+                id integer PRIMARY KEY,
+                source text,
+                transaction_id integer,
+                digest integer,
+                UNIQUE (source, transaction_id)
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+                notes, item, labels, category, tokenize = 'unicode61 remove_diacritics 2'
+            );
+            """
+        )
+
+    async def get_fingerprint(self, source: str) -> str | None:
+        async with self._storage.db_conn.execute(
+            'SELECT fingerprint FROM search_sources WHERE source = ?',
+            (source,),
+        ) as cur:
+            row = await cur.fetchone()
+        return row[0] if row else None
+
+    async def refresh(self, conn: 'Connection', source: str, fingerprint: str | None) -> int:
+        """Bring the index of `source` up to date with the Bluecoins database; returns the number of changed rows."""
+        if fingerprint is not None and await self.get_fingerprint(source) == fingerprint:
+            return 0
+
+        db = self._storage.db_conn
+        async with db.execute('SELECT transaction_id, id, digest FROM search_rows WHERE source = ?', (source,)) as cur:
+            indexed = {transaction_id: (id_, digest) async for transaction_id, id_, digest in cur}
+        async with db.execute('SELECT max(id) FROM search_rows') as cur:
+            row = await cur.fetchone()
+        next_id = (row[0] if row and row[0] is not None else 0) + 1
+
+        changed = 0
+        async with conn.execute(_SEARCH_SOURCE_QUERY) as cur:
+            while rows := await cur.fetchmany(_BATCH_SIZE):
+                new_rows, updated_rows, fts_rows = [], [], []
+                for transaction_id, notes, item, labels, category in rows:
+                    digest = _digest(notes, item, labels, category)
+                    known = indexed.pop(transaction_id, None)
+                    if known is None:
+                        id_, next_id = next_id, next_id + 1
+                        new_rows.append((id_, source, transaction_id, digest))
+                    elif known[1] != digest:
+                        id_ = known[0]
+                        updated_rows.append((digest, id_))
+                    else:
+                        continue
+                    fts_rows.append((id_, notes, item, labels, category))
+
+                await db.executemany(
+                    'INSERT INTO search_rows (id, source, transaction_id, digest) VALUES (?, ?, ?, ?)',
+                    new_rows,
+                )
+                await db.executemany('UPDATE search_rows SET digest = ? WHERE id = ?', updated_rows)
+                await db.executemany('DELETE FROM search_fts WHERE rowid = ?', [(id_,) for _, id_ in updated_rows])
+                await db.executemany(
+                    'INSERT INTO search_fts (rowid, notes, item, labels, category) VALUES (?, ?, ?, ?, ?)',
+                    fts_rows,
+                )
+                changed += len(fts_rows)
+
+        # NOTE: Whatever is left wasn't found in the database anymore
+        removed = [(id_,) for id_, _ in indexed.values()]
+        await db.executemany('DELETE FROM search_fts WHERE rowid = ?', removed)
+        await db.executemany('DELETE FROM search_rows WHERE id = ?', removed)
+        changed += len(removed)
+
+        await db.execute(
+            'INSERT OR REPLACE INTO search_sources (source, fingerprint) VALUES (?, ?)',
+            (source, fingerprint),
+        )
+        await db.commit()
+        self._log(f'search index of `{source}` updated: {changed} rows changed')
+        return changed
+
+    async def search(self, source: str, text: str) -> list[int]:
+        """Return IDs of transactions matching the text; they're shown in the order of the table, not by rank."""
+        query = build_match_query(text)
+        if not query:
+            return []
+        async with self._storage.db_conn.execute(
+            """SELECT r.transaction_id
+                FROM search_fts f
+                JOIN search_rows r ON r.id = f.rowid
+                WHERE search_fts MATCH ? AND r.source = ?""",
+            (query, source),
+        ) as cur:
+            return [row[0] async for row in cur]
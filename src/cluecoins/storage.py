@@ -1,12 +1,17 @@
 from collections.abc import AsyncGenerator
+from collections.abc import Iterable
 from contextlib import asynccontextmanager
 from datetime import date
 from decimal import Decimal
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import xdg
-from aiosqlite import Connection
-from aiosqlite import connect
+
+from cluecoins.database import connect_db
+
+if TYPE_CHECKING:
+    from aiosqlite import Connection
 
 DEFAULT_DB_PATH = xdg.XDG_DATA_HOME / 'cluecoins' / 'db.sqlite3'
 DEFAULT_CACHE_PATH = xdg.XDG_CACHE_HOME / 'cluecoins' / 'cache.sqlite3'
@@ -17,34 +22,46 @@ class LocalStorage:
         self,
         db_path: Path | None = None,
         cache_path: Path | None = None,
+        read_only: bool = False,
     ) -> None:
         self._db_path = db_path or DEFAULT_DB_PATH
         self._cache_path = cache_path or DEFAULT_CACHE_PATH
+        self.read_only = read_only
         self._db_conn: Connection | None = None
         self._cache_conn: Connection | None = None
 
     @property
-    def db_conn(self) -> Connection:
+    def db_conn(self) -> 'Connection':
         if self._db_conn is None:
             raise Exception
         return self._db_conn
 
     @property
-    def cache_conn(self) -> Connection:
+    def cache_conn(self) -> 'Connection':
         if self._cache_conn is None:
             raise Exception
         return self._cache_conn
 
+    @property
+    def db_path(self) -> Path:
+        return self._db_path
+
+    @property
+    def cache_path(self) -> Path:
+        return self._cache_path
+
     @asynccontextmanager
     async def connect(self) -> AsyncGenerator[None, None]:
-        self._db_path.parent.mkdir(parents=True, exist_ok=True)
-        self._db_path.touch(exist_ok=True)
+        # NOTE: Read-only storage is used by worker processes; it takes no locks and never creates files
+        if not self.read_only:
+            self._db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db_path.touch(exist_ok=True)
 
-        self._cache_path.parent.mkdir(parents=True, exist_ok=True)
-        self._cache_path.touch(exist_ok=True)
+            self._cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self._cache_path.touch(exist_ok=True)
 
-        self._db_conn = connect(self._db_path)
-        self._cache_conn = connect(self._cache_path)
+        self._db_conn = connect_db(self._db_path, self.read_only)
+        self._cache_conn = connect_db(self._cache_path, self.read_only)
 
         async with self._db_conn, self._cache_conn:
             yield
@@ -73,6 +90,21 @@ class LocalStorage:
             return Decimal(str(res[0]))
         return None
 
+    async def get_quotes(
+        self, base_currency: str, quote_currencies: Iterable[str]
+    ) -> dict[str, list[tuple[date, Decimal]]]:
+        """All cached quotes of the currencies, by currency, oldest first."""
+        wanted = set(quote_currencies)
+        quotes: dict[str, list[tuple[date, Decimal]]] = {currency: [] for currency in wanted}
+        async with self.cache_conn.execute(
+            'SELECT date, quote_currency, rate FROM quotes WHERE base_currency = ? ORDER BY date',
+            (base_currency,),
+        ) as cur:
+            async for date_, currency, rate in cur:
+                if currency in wanted:
+                    quotes[currency].append((date.fromisoformat(date_), Decimal(str(rate))))
+        return quotes
+
     async def add_quote(self, date_: date, base_currency: str, quote_currency: str, rate: Decimal) -> None:
         await self.cache_conn.execute(
             'INSERT INTO quotes (date, base_currency, quote_currency, rate) VALUES (?, ?, ?, ?)',
@@ -81,7 +113,7 @@ class LocalStorage:
 
 
 class BluecoinsStorage:
-    def __init__(self, conn: Connection) -> None:
+    def __init__(self, conn: 'Connection') -> None:
         self.conn = conn
 
     # async def create_account(self, account_name: str, account_currency: str) -> bool:
@@ -167,30 +199,3 @@ class BluecoinsStorage:
 
     #     account_info_list.pop(0)
     #     return tuple(account_info_list)
-
-    # async def create_clue_tables(self, necessary_tables: list[str]) -> None:
-    #     """Create CLUE tables if not exists"""
-
-    #     # TODO: get table from currently Bluecoins DB
-    #     path = Path(__file__).parent / 'bluecoins.sql'
-    #     schema = path.read_text()
-    #     queries = schema.split(';')
-
-    #     for query in queries:
-    #         regex = 'CREATE TABLE (\w*)'
-
-    #         re_query = re.search(regex, query)
-    #         if re_query is None:
-    #             continue
-
-    #         table_blue = re_query.group(1)
-    #         if table_blue not in necessary_tables:
-    #             continue
-    #         part_of_blue_query = re_query.group(0)
-
-    #         create_table_query = query.replace(part_of_blue_query, f'CREATE TABLE IF NOT EXISTS CLUE_{table_blue}')
-    #         await db.execute_command(self.conn, create_table_query)
-
-    # async def move_data_to_table_by_id(self, table: str, filter: str, filter_id: int, revert: bool = False) -> None:
-    #     await db.copy_data_to_table_by_id(self.conn, table, filter, filter_id, revert)
-    #     await db.delete_data_by_id(self.conn, table, filter, filter_id, revert)
@@ -0,0 +1,214 @@
+"""Precomputed aggregates of Bluecoins transactions.
+
+One grouped scan of `TRANSACTIONSTABLE` produces summary cells, sums by (account, category, month, currency, type).
+Account balances, monthly income and expense per category and currency totals are all read from the cells. They
+live in cluecoins' own `db.sqlite3` keyed by the database fingerprint, so the Bluecoins file is never modified.
+
+When the database changes, the signature of rows up to the previously seen maximum ID is compared to the stored
+one; if they match, only newer rows are scanned and added to the cells.
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import TYPE_CHECKING
+
+from cluecoins.storage import LocalStorage
+
+if TYPE_CHECKING:
+    from aiosqlite import Connection
+
+# NOTE: `amount` is in the base currency, `amount * conversionRateNew` is in `transactionCurrency`
+_CELLS_QUERY = """
+SELECT accountID, categoryID, substr(date, 1, 7), transactionCurrency, transactionTypeID,
+       SUM(amount), CAST(round(SUM(amount * conversionRateNew)) AS INTEGER), COUNT(*)
+FROM TRANSACTIONSTABLE
+WHERE transactionsTableID > ? AND transactionsTableID <= ?
+GROUP BY 1, 2, 3, 4, 5
+"""
+
+# NOTE: Every column a cell depends on, as integers; currency codes are up to 5 characters
+_HASHED_COLUMNS = (
+    'accountID',
+    'categoryID',
+    'transactionTypeID',
+    'amount',
+    'CAST(julianday(date) * 86400 AS INTEGER)',
+    'CAST(conversionRateNew * 1000000000000 AS INTEGER)',
+    *(f'unicode(substr(transactionCurrency, {i}))' for i in range(1, 6)),
+)
+_PRIME = 2147483647
+
+
+def _row_hash_sql() -> str:
+    """Polynomial hash of a row modulo `_PRIME`, computed in SQL so the scan stays in SQLite."""
+    sql = 'transactionsTableID'
+    for column in _HASHED_COLUMNS:
+        sql = f'({sql} * 1000003 + IFNULL({column}, -1)) % {_PRIME}'
+    return sql
+
+
+# NOTE: Signature of the rows already summarized; a change of any of them forces a full recompute. Each row hash is
+#       weighted by a function of the ID, so edits can't cancel out in the sum, e.g. two rows swapping accounts.
+_SIGNATURE_QUERY = f"""
+SELECT COUNT(*), MAX(transactionsTableID),
+       SUM({_row_hash_sql()} * (transactionsTableID * 40503 % {_PRIME} + 1) % {_PRIME})
+FROM TRANSACTIONSTABLE
+WHERE transactionsTableID > ? AND transactionsTableID <= ?
+"""
+
+_Signature = tuple[int, int, int]
+
+_MICRO = Decimal(1000000)
+
+EXPENSE_TYPE_ID = 3
+INCOME_TYPE_ID = 4
+
+
+@dataclass(frozen=True)
+class AccountBalance:
+    account_id: int
+    amount: Decimal
+    transactions: int
+
+
+@dataclass(frozen=True)
+class CategoryMonth:
+    month: str
+    category_id: int
+    income: Decimal
+    expense: Decimal
+
+
+@dataclass(frozen=True)
+class CurrencyTotal:
+    currency: str
+    amount: Decimal
+    base_amount: Decimal
+    transactions: int
+
+
+class SummaryCache:
+    def __init__(self, storage: LocalStorage, log: Callable = lambda _: None) -> None:
+        self._storage = storage
+        self._log = log
+
+    async def create_schema(self) -> None:
+        await self._storage.db_conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS summary_sources (
+                source text PRIMARY KEY,
+                fingerprint text,
+                max_id integer,
+                signature text
+            );
+            CREATE TABLE IF NOT EXISTS summary_cells (
+                source text,
+                account_id integer,
+                category_id integer,
+                month text,
+                currency text,
+                type_id integer,
+                amount integer,
+                native_amount integer,
+                count integer,
+                PRIMARY KEY (source, account_id, category_id, month, currency, type_id)
+            );
+            """
+        )
+
+    async def _get_source(self, source: str) -> tuple[str | None, int, str | None] | None:
+        async with self._storage.db_conn.execute(
+            'SELECT fingerprint, max_id, signature FROM summary_sources WHERE source = ?',
+            (source,),
+        ) as cur:
+            row = await cur.fetchone()
+        return (row[0], row[1], row[2]) if row else None
+
+    @staticmethod
+    async def _signature(conn: 'Connection', after: int, max_id: int) -> _Signature:
+        """Signature of rows with IDs in `(after, max_id]`; signatures of adjacent ranges add up."""
+        async with conn.execute(_SIGNATURE_QUERY, (after, max_id)) as cur:
+            row = await cur.fetchone()
+        count, max_, hashes = row or (0, None, None)
+        return count, max_ or 0, hashes or 0
+
+    async def refresh(self, conn: 'Connection', source: str, fingerprint: str | None) -> str:
+        """Bring the cells of `source` up to date; returns `'fresh'`, `'incremental'` or `'full'`."""
+        known = await self._get_source(source)
+        if known and fingerprint is not None and known[0] == fingerprint:
+            return 'fresh'
+
+        db = self._storage.db_conn
+        seen = known[1] if known else -1
+        prefix = await self._signature(conn, -1, seen)
+        after = seen if known and repr(prefix) == known[2] else -1
+        if after < 0:
+            await db.execute('DELETE FROM summary_cells WHERE source = ?', (source,))
+
+        # NOTE: max_id first, so rows appended during the scan are picked up next time
+        async with conn.execute('SELECT MAX(transactionsTableID) FROM TRANSACTIONSTABLE') as cur:
+            row = await cur.fetchone()
+        max_id = row[0] if row and row[0] is not None else 0
+
+        async with conn.execute(_CELLS_QUERY, (after, max_id)) as cur:
+            cells = [(source, *row) for row in await cur.fetchall()]
+        await db.executemany(
+            """INSERT INTO summary_cells
+                (source, account_id, category_id, month, currency, type_id, amount, native_amount, count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT DO UPDATE SET
+                    amount = amount + excluded.amount,
+                    native_amount = native_amount + excluded.native_amount,
+                    count = count + excluded.count""",
+            cells,
+        )
+
+        # NOTE: Only the rows after the ones already signed are scanned again
+        count, max_, hashes = await self._signature(conn, seen, max_id)
+        signature = (prefix[0] + count, max(prefix[1], max_), prefix[2] + hashes)
+        await db.execute(
+            'INSERT OR REPLACE INTO summary_sources (source, fingerprint, max_id, signature) VALUES (?, ?, ?, ?)',
+            (source, fingerprint, max_id, repr(signature)),
+        )
+        await db.commit()
+
+        mode = 'incremental' if after >= 0 else 'full'
+        self._log(f'summary of `{source}` updated ({mode}): {len(cells)} cells')
+        return mode
+
+    async def account_balances(self, source: str) -> list[AccountBalance]:
+        async with self._storage.db_conn.execute(
+            """SELECT account_id, SUM(amount), SUM(count) FROM summary_cells
+                WHERE source = ? GROUP BY account_id ORDER BY account_id""",
+            (source,),
+        ) as cur:
+            return [AccountBalance(id_, Decimal(amount) / _MICRO, count) async for id_, amount, count in cur]
+
+    async def category_months(self, source: str) -> list[CategoryMonth]:
+        """Income and expense per category and month, newest month first."""
+        async with self._storage.db_conn.execute(
+            """SELECT month, category_id,
+                    SUM(CASE WHEN type_id = ? THEN amount ELSE 0 END),
+                    SUM(CASE WHEN type_id = ? THEN amount ELSE 0 END)
+                FROM summary_cells
+                WHERE source = ? AND type_id IN (?, ?)
+                GROUP BY month, category_id
+                ORDER BY month DESC, category_id""",
+            (INCOME_TYPE_ID, EXPENSE_TYPE_ID, source, INCOME_TYPE_ID, EXPENSE_TYPE_ID),
+        ) as cur:
+            return [
+                CategoryMonth(month, category_id, Decimal(income) / _MICRO, Decimal(expense) / _MICRO)
+                async for month, category_id, income, expense in cur
+            ]
+
+    async def currency_totals(self, source: str) -> list[CurrencyTotal]:
+        async with self._storage.db_conn.execute(
+            """SELECT currency, SUM(native_amount), SUM(amount), SUM(count) FROM summary_cells
+                WHERE source = ? GROUP BY currency ORDER BY currency""",
+            (source,),
+        ) as cur:
+            return [
+                CurrencyTotal(currency, Decimal(native) / _MICRO, Decimal(amount) / _MICRO, count)
+                async for currency, native, amount, count in cur
+            ]
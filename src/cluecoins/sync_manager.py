@@ -1,34 +1,82 @@
-# from cluecoins.adb import Device
-# from cluecoins.adb import generate_new_db_name
-
-
-# class SyncManager:
-#     """
-#     Class functions:
-#         1. create empty db with new name
-#         2. pull db
-#         3. push db
-#         4. clone db
-#         5. track db state
-#     """
-
-#     def __init__(self) -> None:
-#         self.db = generate_new_db_name()
-#         self.device: Device | None = None
-
-#     def get_device(self) -> Device:
-#         if self.device is None:
-#             self.device = Device.connect()
-#         return self.device
-
-#     def prepare_local_db(self) -> str:
-#         device = self.get_device()
-#         device.stop_app()
-#         device.pull_db(self.db)
-#         return f'{self.db}.fydb'
-
-#     def push_changes_to_app(self, activity: str) -> None:
-#         device = self.get_device()
-#         device.pull_db(f'{self.db}.bak')
-#         device.push_db_root(self.db)
-#         device.start_app(activity)
+import asyncio
+import dataclasses
+import datetime
+import tempfile
+from pathlib import Path
+
+import xdg
+
+from cluecoins.adb import Device
+from cluecoins.adb import TransferError
+from cluecoins.adb import TransferResult
+from cluecoins.backup import replace_contents
+from cluecoins.database import connect_db
+from cluecoins.indexes import existing_indexes
+from cluecoins.indexes import strip_indexes
+
+DEVICE_DIR = xdg.XDG_DATA_HOME / 'cluecoins' / 'device'
+
+
+def generate_new_db_name() -> str:
+    current_time = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    return f'cluecoins-{current_time}'
+
+
+class SyncManager:
+    """
+    Class functions:
+        1. pull db into a new local file
+        2. track db state on the device
+        3. push db, unless it changed on the device since the pull
+    """
+
+    def __init__(self, device: Device, local_dir: Path | None = None) -> None:
+        self.device = device
+        self.local_dir = local_dir or DEVICE_DIR
+        self.path: Path | None = None
+        self.remote_checksum: str | None = None
+        self.remote_wal_checksum: str | None = None
+
+    async def pull(self) -> Path:
+        self.local_dir.mkdir(parents=True, exist_ok=True)
+        target = self.local_dir / f'{generate_new_db_name()}.fydb'
+        result = await asyncio.to_thread(self.device.pull, target)
+        self.path, self.remote_checksum, self.remote_wal_checksum = target, result.checksum, result.wal_checksum
+        return target
+
+    async def push(self, path: Path | None = None, force: bool = False) -> TransferResult:
+        """Push the database (the pulled one by default) and start the app.
+
+        Performance indexes are stripped from a copy first, the local file is left as is.
+        """
+        path = path or self.path
+        if path is None:
+            raise TransferError('nothing to push; pull the database first')
+        if (
+            not force
+            and self.remote_checksum is not None
+            and (
+                await asyncio.to_thread(self.device.checksum) != self.remote_checksum
+                or await asyncio.to_thread(self.device.wal_checksum) != self.remote_wal_checksum
+            )
+        ):
+            raise TransferError('the database on the device changed since it was pulled')
+
+        async with connect_db(path, read_only=True) as conn:
+            indexes = await existing_indexes(conn)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            source = path
+            if indexes:
+                source = Path(tmp) / path.name
+                await asyncio.to_thread(replace_contents, path, source)
+                async with connect_db(source) as conn:
+                    await strip_indexes(conn)
+            result = await asyncio.to_thread(self.device.push, source, force, self.remote_wal_checksum)
+
+        self.remote_checksum = result.checksum
+        if not result.skipped:
+            # NOTE: The device removed its `-wal` with the old database
+            self.remote_wal_checksum = None
+            await asyncio.to_thread(self.device.start_app)
+        return dataclasses.replace(result, path=path)
@@ -0,0 +1,391 @@
+"""Synthetic Bluecoins databases for tests and benchmarks.
+
+Files are created from the reference schema (`bluecoins.sql`), so `verify_schema` accepts them, with the system rows
+Bluecoins creates itself (groups, transaction and account types, `(No category)`...) plus generated accounts,
+categories, items, transactions and labels. The same seed and config always produce the same rows.
+
+Transactions are generated as a stream in date order (gaps between them are exponential, i.e. a Poisson process)
+and inserted in chunks with journaling off; table indexes are created after the data. A million transactions take
+seconds and memory doesn't depend on their number.
+
+    python -m cluecoins.synthetic [--transactions N] [--accounts N] [--seed N] FILE
+"""
+
+import argparse
+import itertools
+import math
+import random
+import re
+import sqlite3
+import sys
+from bisect import bisect
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import date
+from datetime import timedelta
+from pathlib import Path
+from statistics import NormalDist
+
+from cluecoins.schema import REFERENCE_USER_VERSION
+from cluecoins.schema import reference_script
+
+# NOTE: Units per USD; rates between other currencies are derived from these
+REFERENCE_RATES = {
+    'USD': 1.0,
+    'EUR': 0.92,
+    'GBP': 0.79,
+    'CHF': 0.88,
+    'CAD': 1.36,
+    'AUD': 1.52,
+    'JPY': 150.0,
+    'CNY': 7.2,
+    'INR': 83.0,
+    'RUB': 90.0,
+}
+
+CHUNK_ROWS = 50000
+
+_QUANTILES = 4096
+
+_TRANSACTION_COLUMNS = (
+    'transactionsTableID',
+    'itemID',
+    'amount',
+    'transactionCurrency',
+    'conversionRateNew',
+    'date',
+    'transactionTypeID',
+    'categoryID',
+    'accountID',
+    'accountReference',
+    'accountPairID',
+    'uidPairID',
+)
+# NOTE: Same for every row: not a note, status, not deleted
+_TRANSACTION_CONSTANTS = {'notes': 'NULL', 'status': '0', 'deletedTransaction': '6'}
+
+# NOTE: Rows every Bluecoins database starts with
+_SYSTEM_ROWS = """
+INSERT INTO android_metadata VALUES ('en_US');
+INSERT INTO ACCOUNTINGGROUPTABLE VALUES (0, '(Unaccounted)'), (1, 'Assets'), (2, 'Liabilities');
+INSERT INTO ACCOUNTTYPETABLE VALUES
+    (0, '(No Account)', 0), (1, 'Other Assets', 1), (2, 'Other Liabilities', 2), (3, 'Bank', 1), (4, 'Cash', 1),
+    (5, 'Investments', 1), (6, 'Receivables', 1), (7, 'Properties', 1), (8, 'Credit Card', 2), (9, 'Loans', 2),
+    (10, 'Payables', 2), (11, 'Mortgages', 2), (12, 'Foreign Assets', 1), (13, 'Foreign Liabilities', 2),
+    (15, 'Virtual Accounts', 1), (16, 'CryptoCurrencies', 1);
+INSERT INTO TRANSACTIONTYPETABLE VALUES (2, 'New Account'), (3, 'Expense'), (4, 'Income'), (5, 'Transfer');
+INSERT INTO CATEGORYGROUPTABLE VALUES (0, '(No category)'), (1, 'Transfer'), (2, 'Income'), (3, 'Expense');
+INSERT INTO PARENTCATEGORYTABLE (parentCategoryTableID, parentCategoryName, categoryGroupID) VALUES
+    (0, 'Others', 3), (1, 'Others', 2), (2, '(New Account)', 0), (3, '(Transfer)', 1), (4, '(No category)', 2),
+    (5, '(No category)', 3);
+INSERT INTO CHILDCATEGORYTABLE (categoryTableID, childCategoryName, parentCategoryID) VALUES
+    (0, 'Others', 0), (1, 'Others', 1), (2, '(New Account)', 2), (3, '(Transfer)', 3), (4, '(No category)', 4),
+    (5, '(No category)', 5);
+INSERT INTO ITEMTABLE VALUES
+    (0, '(System Generated Account)', 1), (1, 'Transfer', 1), (2, 'Unnamed Expense', 1), (3, 'Unnamed Income', 1),
+    (4, 'Unnamed transaction', 1);
+INSERT INTO ACCOUNTSTABLE (accountsTableID, accountName, accountTypeID, accountCurrency, accountConversionRateNew)
+    VALUES (-1, '(No Account)', 0, 'USD', 1.0), (0, '(No Account)', 0, 'USD', 1.0);
+"""
+
+# NOTE: Columns of the generated reference rows; the rest are left NULL
+_REFERENCE_COLUMNS = {
+    'ACCOUNTSTABLE': (
+        'accountsTableID',
+        'accountName',
+        'accountTypeID',
+        'accountHidden',
+        'accountCurrency',
+        'accountConversionRateNew',
+        'creditLimit',
+        'cutOffDa',
+        'creditCardDueDate',
+        'cashBasedAccounts',
+        'accountSelectorVisibility',
+    ),
+    'PARENTCATEGORYTABLE': ('parentCategoryTableID', 'parentCategoryName', 'categoryGroupID'),
+    'CHILDCATEGORYTABLE': ('categoryTableID', 'childCategoryName', 'parentCategoryID'),
+    'ITEMTABLE': ('itemTableID', 'itemName', 'itemAutoFillVisibility'),
+    'SETTINGSTABLE': ('settingsTableID', 'defaultSettings'),
+}
+
+_FIRST_ID = 6
+_NEW_ACCOUNT_CATEGORY = 2
+_TRANSFER_CATEGORY = 3
+_TRANSFER_ITEM = 1
+
+_NEW_ACCOUNT, _EXPENSE, _INCOME, _TRANSFER = 2, 3, 4, 5
+
+
+@dataclass(frozen=True)
+class SyntheticConfig:
+    transactions: int = 10000
+    accounts: int = 10
+    items: int = 500
+    # NOTE: Child categories; there's a parent for every 4 of them and about a fifth are income ones
+    categories: int = 40
+    # NOTE: Distinct label names and the share of transactions having one
+    labels: int = 20
+    labeled: float = 0.3
+    base_currency: str = 'USD'
+    # NOTE: Share of accounts in a currency other than the base one, and the currencies to pick from
+    foreign_accounts: float = 0.3
+    currencies: tuple[str, ...] = ('EUR', 'GBP', 'JPY', 'CHF', 'CAD')
+    income: float = 0.03
+    transfers: float = 0.05
+    start: date = date(2015, 1, 1)
+    end: date = date(2024, 12, 31)
+    seed: int = 0
+
+
+@dataclass
+class _Account:
+    id: int
+    currency: str
+    rate: float
+
+
+def _schema() -> tuple[str, list[str]]:
+    """Reference schema split into tables and indexes; indexes are cheaper to build after the data."""
+    script = reference_script()
+    indexes = re.findall(r'^CREATE INDEX [^;]*;', script, flags=re.MULTILINE)
+    for index in indexes:
+        script = script.replace(index, '')
+    return script, indexes
+
+
+class _Generator:
+    def __init__(self, config: SyntheticConfig) -> None:
+        if config.base_currency not in REFERENCE_RATES:
+            raise ValueError(f'unknown currency `{config.base_currency}`')
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.accounts: list[_Account] = []
+        self.income_categories: list[int] = []
+        self.expense_categories: list[int] = []
+        # NOTE: Category of every item by its ID
+        self.item_categories: list[int] = [0] * 5
+        self.income_items: list[int] = []
+        self.expense_items: list[int] = []
+        self.label_names = [f'Label {i}' for i in range(1, config.labels + 1)]
+
+    def rate(self, currency: str, drift: float = 0.0) -> float:
+        """Units of `currency` per unit of the base currency."""
+        if currency == self.config.base_currency:
+            return 1.0
+        return REFERENCE_RATES[currency] / REFERENCE_RATES[self.config.base_currency] * (1 + drift)
+
+    def reference_rows(self) -> dict[str, list[tuple]]:
+        config, rng = self.config, self.rng
+        foreign = [c for c in config.currencies if c != config.base_currency and c in REFERENCE_RATES]
+        accounts = []
+        for id_ in range(1, config.accounts + 1):
+            currency = rng.choice(foreign) if foreign and rng.random() < config.foreign_accounts else None
+            type_id = 12 if currency else rng.choice((3, 3, 3, 4, 8))
+            account = _Account(id_, currency or config.base_currency, self.rate(currency or config.base_currency))
+            self.accounts.append(account)
+            accounts.append((id_, f'Account {id_}', type_id, 0, account.currency, account.rate, 0, 0, 1, 1, 0))
+
+        parents, children = [], []
+        parent_count = max(math.ceil(config.categories / 4), 2)
+        for i in range(parent_count):
+            group = 2 if i < max(parent_count // 5, 1) else 3
+            parents.append((_FIRST_ID + i, f'Parent {i + 1}', group))
+        for i in range(config.categories):
+            id_ = _FIRST_ID + i
+            parent_id, _, group = parents[i % parent_count]
+            children.append((id_, f'Category {i + 1}', parent_id))
+            (self.income_categories if group == 2 else self.expense_categories).append(id_)
+
+        items = []
+        for i in range(config.items):
+            id_ = 5 + i
+            is_income = bool(self.income_categories) and i % 20 == 0
+            categories = self.income_categories if is_income else self.expense_categories or self.income_categories
+            self.item_categories.append(rng.choice(categories) if categories else 0)
+            (self.income_items if is_income else self.expense_items).append(id_)
+            items.append((id_, f'Item {i + 1}', 0))
+
+        settings = [(1, config.base_currency), (2, 'en'), (3, f'{config.end} 00:00:00')]
+        return {
+            'ACCOUNTSTABLE': accounts,
+            'PARENTCATEGORYTABLE': parents,
+            'CHILDCATEGORYTABLE': children,
+            'ITEMTABLE': items,
+            'SETTINGSTABLE': settings,
+        }
+
+    def _amounts(self, mu: float, sigma: float) -> list[float]:
+        """Quantiles of a log-normal distribution to draw amounts from; cheaper than a variate per row."""
+        dist = NormalDist(mu, sigma)
+        return [round(math.exp(dist.inv_cdf((i + 0.5) / _QUANTILES)), 2) for i in range(_QUANTILES)]
+
+    def _rates(self, drifts: dict[str, float]) -> list[float]:
+        return [self.rate(account.currency, drifts[account.currency]) for account in self.accounts]
+
+    def transactions(self) -> Iterator[tuple[list[tuple], list[tuple]]]:
+        """Chunks of transaction and label rows, oldest first."""
+        config, rng = self.config, self.rng
+        days = (config.end - config.start).days + 1
+        dates = [(config.start + timedelta(days=day)).isoformat() for day in range(days)]
+        times = [f'{minute // 60:02}:{minute % 60:02}:00' for minute in range(1440)]
+        accounts = self.accounts
+        # NOTE: Zipf-like popularity: a few items make most of the transactions
+        expense_weights = list(itertools.accumulate(1 / (k + 1) for k in range(len(self.expense_items))))
+        income_weights = list(itertools.accumulate(1 / (k + 1) for k in range(len(self.income_items))))
+        expense_amounts, income_amounts = self._amounts(3, 1.2), self._amounts(7, 0.7)
+        transfer_amounts = self._amounts(5, 1)
+        # NOTE: Rates walk randomly, one step per month
+        drifts = dict.fromkeys(REFERENCE_RATES, 0.0)
+        rates = self._rates(drifts)
+
+        rows: list[tuple] = []
+        next_id = 1
+        for account in accounts:
+            amount = round(rng.choice(income_amounts) * 10 / account.rate * 1000000)
+            rows.append(
+                (next_id, 0, amount, account.currency, account.rate, f'{dates[0]} {times[0]}', _NEW_ACCOUNT,
+                 _NEW_ACCOUNT_CATEGORY, account.id, 3, account.id, next_id)
+            )  # fmt: skip
+            next_id += 1
+
+        # NOTE: A transfer is two rows, so there are fewer events than rows
+        events = max(round((config.transactions - len(rows)) / (1 + config.transfers)), 1)
+        step = days * 1440 / events
+        minute, month = 0.0, 0
+        transfer_below, income_below = config.transfers if len(accounts) > 1 else 0, config.transfers + config.income
+        if not self.income_items:
+            income_below = transfer_below
+        last_minute = days * 1440 - 1
+        item_categories, income_items = self.item_categories, self.income_items
+        random_, log, choices = rng.random, math.log, rng.choices
+        while next_id <= config.transactions:
+            size = min(CHUNK_ROWS, config.transactions - next_id + 1)
+            labels: list[tuple] = []
+            gaps = [-log(1.0 - random_()) * step for _ in range(size)]
+            minutes = list(itertools.accumulate(gaps, initial=minute))[1:]
+            kinds = [random_() for _ in range(size)]
+            picked = choices(range(len(accounts)), k=size)
+            items = choices(self.expense_items or [2], cum_weights=expense_weights or None, k=size)
+            expenses = choices(expense_amounts, k=size)
+            labeled = [random_() < config.labeled for _ in range(size)] if self.label_names else [False] * size
+            rows_ = zip(minutes, kinds, picked, items, expenses, labeled, strict=True)
+            for minute, kind, index, item, native, has_label in rows_:
+                if next_id > config.transactions:
+                    break
+                if minute >= (month + 1) * 43200:
+                    month = int(minute // 43200)
+                    drifts = {c: max(min(d + rng.gauss(0, 0.02), 0.5), -0.5) for c, d in drifts.items()}
+                    rates = self._rates(drifts)
+                day, time = divmod(min(int(minute), last_minute), 1440)
+                date_ = f'{dates[day]} {times[time]}'
+                account, rate = accounts[index], rates[index]
+
+                if kind < transfer_below and next_id < config.transactions:
+                    other = int(random_() * (len(accounts) - 1))
+                    other += other >= index
+                    amount = round(rng.choice(transfer_amounts) * 1000000)
+                    rows.append(
+                        (next_id, _TRANSFER_ITEM, -amount, account.currency, rate, date_, _TRANSFER,
+                         _TRANSFER_CATEGORY, account.id, 1, accounts[other].id, next_id + 1)
+                    )  # fmt: skip
+                    rows.append(
+                        (next_id + 1, _TRANSFER_ITEM, amount, accounts[other].currency, rates[other], date_,
+                         _TRANSFER, _TRANSFER_CATEGORY, accounts[other].id, 2, account.id, next_id)
+                    )  # fmt: skip
+                    next_id += 2
+                    continue
+
+                type_id = _EXPENSE
+                native = -native
+                if kind < income_below:
+                    type_id = _INCOME
+                    item = income_items[
+                        min(bisect(income_weights, random_() * income_weights[-1]), len(income_items) - 1)
+                    ]
+                    native = rng.choice(income_amounts)
+                rows.append(
+                    (next_id, item, round(native / rate * 1000000), account.currency, rate, date_, type_id,
+                     item_categories[item], account.id, 1, account.id, next_id)
+                )  # fmt: skip
+                if has_label:
+                    labels.append((self.label_names[int(random_() * len(self.label_names))], next_id))
+                next_id += 1
+
+            yield rows, labels
+            rows = []
+        if rows:
+            yield rows, []
+
+
+def generate_database(path: Path, config: SyntheticConfig | None = None) -> int:
+    """Create a Bluecoins database at `path` (replacing it); returns the number of transactions."""
+    config = config or SyntheticConfig()
+    generator = _Generator(config)
+    tables, indexes = _schema()
+
+    path.unlink(missing_ok=True)
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.executescript(tables)
+        conn.execute(f'PRAGMA user_version = {REFERENCE_USER_VERSION}')
+        conn.executescript(_SYSTEM_ROWS)
+
+        conn.execute('BEGIN')
+        for table, rows in generator.reference_rows().items():
+            columns = _REFERENCE_COLUMNS[table]
+            conn.executemany(
+                f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})', rows
+            )
+
+        count = 0
+        columns = (*_TRANSACTION_COLUMNS, *_TRANSACTION_CONSTANTS)
+        values = ('?',) * len(_TRANSACTION_COLUMNS) + tuple(_TRANSACTION_CONSTANTS.values())
+        insert = f'INSERT INTO TRANSACTIONSTABLE ({", ".join(columns)}) VALUES ({", ".join(values)})'
+        for rows, labels in generator.transactions():
+            conn.executemany(insert, rows)
+            conn.executemany('INSERT INTO LABELSTABLE (labelName, transactionIDLabels) VALUES (?, ?)', labels)
+            count += len(rows)
+        conn.execute('COMMIT')
+
+        for index in indexes:
+            conn.execute(index)
+    finally:
+        conn.close()
+    return count
+
+
+def main(argv: list[str] | None = None) -> int:
+    defaults = SyntheticConfig()
+    parser = argparse.ArgumentParser(prog='python -m cluecoins.synthetic', description=__doc__.splitlines()[0])
+    parser.add_argument('--transactions', type=int, default=defaults.transactions)
+    parser.add_argument('--accounts', type=int, default=defaults.accounts)
+    parser.add_argument('--items', type=int, default=defaults.items)
+    parser.add_argument('--categories', type=int, default=defaults.categories)
+    parser.add_argument('--labels', type=int, default=defaults.labels)
+    parser.add_argument('--base', default=defaults.base_currency, help='base currency')
+    parser.add_argument('--years', type=int, help='span ending on the last day of the default period')
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+    parser.add_argument('path', type=Path, metavar='FILE')
+    args = parser.parse_args(argv)
+
+    start = defaults.start if args.years is None else date(defaults.end.year - args.years + 1, 1, 1)
+    config = SyntheticConfig(
+        transactions=args.transactions,
+        accounts=args.accounts,
+        items=args.items,
+        categories=args.categories,
+        labels=args.labels,
+        base_currency=args.base,
+        start=start,
+        seed=args.seed,
+    )
+    count = generate_database(args.path, config)
+    print(f'{args.path}: {count} transactions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
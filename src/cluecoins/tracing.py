@@ -0,0 +1,237 @@
+"""Opt-in tracing of the SQL sent through `cluecoins.database.connect_db`.
+
+Set `CLUECOINS_TRACE_SQL=1` (or call `enable`) and every connection opened afterwards is a `TracedConnection`: each
+statement is timed in the worker thread of aiosqlite, from `execute` until its last row is fetched, and counted by
+normalized text (literals replaced with `?`) and by the screen that issued it. `EXPLAIN QUERY PLAN` is taken once per
+statement, so full scans stand out. Statements slower than `CLUECOINS_SLOW_QUERY_MS` (100 by default) are appended
+to `SLOW_QUERY_LOG` with their plan.
+
+When tracing is off connections are plain `sqlite3` ones; the only cost is a check in `connect_db`.
+"""
+
+import re
+import sqlite3
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from os import environ as env
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+import xdg
+
+SLOW_QUERY_LOG = xdg.XDG_CACHE_HOME / 'cluecoins' / 'slow-queries.log'
+DEFAULT_SLOW_MS = 100.0
+
+_SPACE = re.compile(r'\s+')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+# NOTE: Statements worth a plan; others are either trivial or would be run again by `EXPLAIN`
+_EXPLAINED = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+
+def normalize(sql: str) -> str:
+    """Statement text with literals replaced by `?` and `IN` lists collapsed, so executions can be grouped."""
+    sql = _LITERAL.sub('?', _SPACE.sub(' ', sql).strip())
+    return _LIST.sub('(?, ...)', sql)
+
+
+@dataclass
+class QueryStats:
+    statement: str
+    # NOTE: Screen that issued the statement, `None` outside of the UI
+    scope: str | None
+    calls: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    rows: int = 0
+    plan: list[str] = field(default_factory=list)
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.calls if self.calls else 0.0
+
+    @property
+    def full_scan(self) -> bool:
+        """The plan reads a whole table or index, e.g. `SCAN TRANSACTIONSTABLE`."""
+        return any(step.startswith('SCAN') for step in self.plan)
+
+
+class Tracer:
+    def __init__(self, slow_ms: float = DEFAULT_SLOW_MS, slow_log: Path | None = None) -> None:
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self.scope: str | None = None
+        self._stats: dict[tuple[str | None, str], QueryStats] = {}
+        # NOTE: Every aiosqlite connection records from its own thread
+        self._lock = threading.Lock()
+
+    def stats(self) -> list[QueryStats]:
+        """Statements by total time, slowest first."""
+        with self._lock:
+            return sorted(self._stats.values(), key=lambda s: s.total_ms, reverse=True)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def record(self, conn: sqlite3.Connection, sql: str, parameters: Any, seconds: float, rows: int) -> None:
+        statement = normalize(sql)
+        key = (self.scope, statement)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = QueryStats(statement, self.scope)
+            is_new = not stats.calls
+            stats.calls += 1
+            stats.total_ms += seconds * 1000
+            stats.max_ms = max(stats.max_ms, seconds * 1000)
+            stats.rows += rows
+
+        if is_new and parameters is not None and statement.upper().startswith(_EXPLAINED):
+            stats.plan = explain(conn, sql, parameters)
+        if seconds * 1000 >= self.slow_ms and self.slow_log is not None:
+            self._log_slow(stats, seconds * 1000, rows)
+
+    def _log_slow(self, stats: QueryStats, ms: float, rows: int) -> None:
+        lines = [f'{datetime.now().isoformat(timespec="seconds")} {ms:.1f} ms, {rows} rows, {stats.scope or "-"}']
+        lines.append(f'  {stats.statement}')
+        lines.extend(f'    {step}' for step in stats.plan)
+        assert self.slow_log is not None
+        with self._lock:
+            self.slow_log.parent.mkdir(parents=True, exist_ok=True)
+            with self.slow_log.open('a') as f:
+                f.write('\n'.join(lines) + '\n')
+
+
+def explain(conn: sqlite3.Connection, sql: str, parameters: Any = ()) -> list[str]:
+    """Steps of `EXPLAIN QUERY PLAN`, indented by depth; empty if the statement can't be explained."""
+    try:
+        steps = sqlite3.Connection.execute(conn, f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()
+    except sqlite3.Error:
+        return []
+    depths: dict[int, int] = {0: -1}
+    plan = []
+    for id_, parent, _, detail in steps:
+        depths[id_] = depths.get(parent, -1) + 1
+        plan.append('  ' * depths[id_] + detail)
+    return plan
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor timing each statement until it's exhausted; the time spent in the caller between fetches isn't counted."""
+
+    _sql: str | None = None
+    _parameters: Any = None
+    _seconds = 0.0
+    _rows = 0
+
+    def _start(self, sql: str, parameters: Any, seconds: float) -> None:
+        self._sql, self._parameters, self._seconds, self._rows = sql, parameters, seconds, 0
+        # NOTE: Statements without a result set are done already
+        if self.description is None:
+            self._rows = max(self.rowcount, 0)
+            self._finish()
+
+    def _finish(self) -> None:
+        tracer = _tracer
+        if self._sql is not None and tracer is not None:
+            tracer.record(self.connection, self._sql, self._parameters, self._seconds, self._rows)
+        self._sql = None
+
+    def execute(self, sql: str, parameters: Any = (), /) -> 'TracedCursor':
+        self._finish()
+        start = perf_counter()
+        super().execute(sql, parameters)
+        self._start(sql, parameters, perf_counter() - start)
+        return self
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Any], /) -> 'TracedCursor':
+        self._finish()
+        start = perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        # NOTE: The parameters are consumed, so there's nothing to explain with
+        self._start(sql, None, perf_counter() - start)
+        return self
+
+    def fetchone(self) -> Any:
+        start = perf_counter()
+        row = super().fetchone()
+        self._seconds += perf_counter() - start
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size: int | None = None) -> list[Any]:
+        size = self.arraysize if size is None else size
+        start = perf_counter()
+        rows = super().fetchmany(size)
+        self._seconds += perf_counter() - start
+        self._rows += len(rows)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self) -> list[Any]:
+        start = perf_counter()
+        rows = super().fetchall()
+        self._seconds += perf_counter() - start
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def close(self) -> None:
+        self._finish()
+        super().close()
+
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose cursors are `TracedCursor`s, including the ones `execute` creates."""
+
+    def cursor(self, factory: Any = None) -> Any:
+        return super().cursor(factory or TracedCursor)
+
+    def execute(self, sql: str, parameters: Any = (), /) -> Any:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, parameters: Iterable[Any], /) -> Any:
+        return self.cursor().executemany(sql, parameters)
+
+
+_tracer: Tracer | None = None
+_from_env = False
+
+
+def get_tracer() -> Tracer | None:
+    """The active tracer; on first call one is enabled if `CLUECOINS_TRACE_SQL` is set."""
+    global _from_env
+    if not _from_env:
+        _from_env = True
+        if _tracer is None and env.get('CLUECOINS_TRACE_SQL', '') not in ('', '0'):
+            enable(float(env.get('CLUECOINS_SLOW_QUERY_MS', DEFAULT_SLOW_MS)))
+    return _tracer
+
+
+def enable(slow_ms: float = DEFAULT_SLOW_MS, slow_log: Path | None = None) -> Tracer:
+    """Trace connections opened from now on; slow statements go to `slow_log` (`SLOW_QUERY_LOG` by default)."""
+    global _tracer, _from_env
+    _from_env = True
+    _tracer = Tracer(slow_ms, slow_log or SLOW_QUERY_LOG)
+    return _tracer
+
+
+def disable() -> None:
+    global _tracer, _from_env
+    _from_env = True
+    _tracer = None
+
+
+def set_scope(scope: str | None) -> None:
+    """Attribute the statements that follow to `scope`, e.g. the name of the screen on display."""
+    if _tracer is not None:
+        _tracer.scope = scope
@@ -1,11 +1,9 @@
 import logging
-import subprocess
 from collections import defaultdict
 from pathlib import Path
 from typing import TYPE_CHECKING
 from typing import ClassVar
 
-from aiosqlite import connect
 from textual import on
 from textual.app import App
 from textual.app import ComposeResult
@@ -13,27 +11,49 @@ from textual.containers import Container
 from textual.css.query import NoMatches
 from textual.screen import Screen
 from textual.widgets import Button
+from textual.widgets import Checkbox
 from textual.widgets import DataTable
 from textual.widgets import DirectoryTree
+from textual.widgets import Input
 from textual.widgets import RichLog
+from textual.widgets import Select
+from textual.widgets import Sparkline
 from textual.widgets import Static
+from textual.widgets import Tree
 from zandev_textual_widgets import MenuScreen
 from zandev_textual_widgets.menu import Menu
 from zandev_textual_widgets.menu import MenuItem
 
+from cluecoins.database import browse_db
+from cluecoins.database import connect_db
 from cluecoins.database import count_accounts
 from cluecoins.database import count_items
+from cluecoins.database import count_tables
 from cluecoins.database import count_transactions
+from cluecoins.database import explain_transactions_page
 from cluecoins.database import fetch_accounts_page
 from cluecoins.database import fetch_items_page
 from cluecoins.database import fetch_transactions_page
 from cluecoins.database import rename_item
+from cluecoins.database import transactions_page_cursor
+from cluecoins.filters import FILTER_HELP
+from cluecoins.filters import TransactionFilter
+from cluecoins.header import SqliteHeader
+from cluecoins.header import read_header
 from cluecoins.storage import LocalStorage
 from cluecoins.ui import menu
 
 if TYPE_CHECKING:
     from aiosqlite import Connection
 
+    from cluecoins.backup import Snapshot
+    from cluecoins.items import ItemGroup
+    from cluecoins.networth import NetWorth
+    from cluecoins.report import CategoryNode
+    from cluecoins.report import CategoryReport
+    from cluecoins.sync_manager import SyncManager
+    from cluecoins.tracing import QueryStats
+
 
 # TODO: cleanup
 _file_logger = logging.getLogger('file_logger')
@@ -77,6 +97,14 @@ class BaseScreen(Screen):
         yield from ()
 
     def on_mount(self) -> None:
+        from cluecoins.profiling import start_profile
+        from cluecoins.tracing import set_scope
+
+        set_scope(type(self).__name__)
+        # NOTE: Async `on_mount` of subclasses is done by the first refresh
+        mount_profile = start_profile('mount', type(self).__name__, self.app.log_write)
+        if mount_profile is not None:
+            self.call_after_refresh(mount_profile.stop)
         log = self.query_one('#log', RichLog)
         for msg in self.app._log_history:
             log.write(msg)
@@ -105,6 +133,7 @@ class FetchQuotesScreen(BaseScreen):
     @on(Button.Pressed, '#ok')
     async def on_ok_pressed(self, event):
         from cluecoins.cli import convert
+        from cluecoins.schema import SchemaMismatchError
 
         self.query_one('#status_bar', Static).update('fetching quotes...')
         self.query_one('#ok').disabled = True
@@ -114,11 +143,14 @@ class FetchQuotesScreen(BaseScreen):
 
         try:
             await convert('USD', str(self.app._db_path), self.app.log_write)
+            self.app._status_text = 'quotes fetched'
+        except SchemaMismatchError as e:
+            self.app.log_write(str(e))
+            self.app._status_text = 'unsupported database schema'
         finally:
             self.app._is_busy = False
             self.app.refresh_menu_state()
 
-        self.app._status_text = 'quotes fetched'
         self.query_one('#status_bar', Static).update(self.app._status_text)
         self.query_one('#ok').disabled = False
         self.query_one('#back').disabled = False
@@ -187,7 +219,7 @@ class TableRowsScreen(BaseScreen):
 
     async def on_mount(self):
         super().on_mount()
-        async with connect(self._db_path) as conn:
+        async with browse_db(self._db_path) as conn:
             columns = await self._get_columns(conn)
             if not columns:
                 self.app.log_write(f"no columns found for table '{self._table_name}'")
@@ -228,6 +260,9 @@ class StatisticsScreen(BaseScreen):
     def __init__(self):
         super().__init__()
         self._data = DataTable()
+        self._balances: DataTable = DataTable()
+        self._currencies: DataTable = DataTable()
+        self._months: DataTable = DataTable()
 
     async def on_mount(self):
         super().on_mount()
@@ -236,36 +271,73 @@ class StatisticsScreen(BaseScreen):
         self._data.add_column('table')
         self._data.add_column('count')
         self._data.cursor_type = 'row'
+        self._balances.add_columns('account', 'balance', 'transactions')
+        self._currencies.add_columns('currency', 'amount', 'base amount', 'transactions')
+        self._months.add_columns('month', 'category', 'income', 'expense')
 
         if not db_path:
             self.app.log_write('no database connected')
             return
 
-        async with connect(db_path) as conn:
-            cur = await conn.execute(
-                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
-            )
-            tables = await cur.fetchall()
+        fingerprint = self.app.db_fingerprint()
+        counts = self.app._table_counts.get(fingerprint) if fingerprint else None
+        if counts is None:
+            counts = await self._count_tables(db_path)
+            if fingerprint:
+                self.app._table_counts = {fingerprint: counts}
 
-            for (table_name,) in tables:
-                try:
-                    cnt_cur = await conn.execute(f"SELECT COUNT(*) FROM '{table_name}'")
-                    cnt_row = await cnt_cur.fetchone()
-                    count = cnt_row[0] if cnt_row is not None else 0
-                except Exception:
-                    count = 'err'
+        for table_name, count in counts:
+            self._data.add_row(table_name, count, key=table_name)
+
+        if any(table_name == 'TRANSACTIONSTABLE' for table_name, _ in counts):
+            await self._show_summary(db_path, fingerprint)
+
+    async def _count_tables(self, db_path: Path) -> list[tuple[str, int | str]]:
+        async with browse_db(db_path) as conn:
+            return await count_tables(conn)
 
-                self._data.add_row(table_name, count, key=table_name)
+    async def _show_summary(self, db_path: Path, fingerprint: str | None) -> None:
+        from cluecoins.summary import SummaryCache
+
+        source = str(db_path.resolve())
+        storage = LocalStorage()
+        async with storage.connect(), browse_db(db_path) as conn:
+            summary = SummaryCache(storage, self.app.log_write)
+            await summary.create_schema()
+            await summary.refresh(conn, source, fingerprint)
+            balances = await summary.account_balances(source)
+            currencies = await summary.currency_totals(source)
+            months = await summary.category_months(source)
+
+            async with conn.execute('SELECT accountsTableID, accountName FROM ACCOUNTSTABLE') as cur:
+                accounts = {id_: name async for id_, name in cur}
+            async with conn.execute('SELECT categoryTableID, childCategoryName FROM CHILDCATEGORYTABLE') as cur:
+                categories = {id_: name async for id_, name in cur}
+
+        for balance in balances:
+            self._balances.add_row(
+                accounts.get(balance.account_id, balance.account_id), balance.amount, balance.transactions
+            )
+        for total in currencies:
+            self._currencies.add_row(total.currency, total.amount, total.base_amount, total.transactions)
+        for month in months:
+            self._months.add_row(
+                month.month, categories.get(month.category_id, month.category_id), month.income, month.expense
+            )
 
     def compose_content(self) -> ComposeResult:
-        yield Static('Database table row counts')
-        yield self._data
+        yield Static('Database table row counts, account balances and currency totals')
+        yield Container(self._data, self._balances, self._currencies, classes='horizontal')
+        yield Static('Income and expense by month and category')
+        yield self._months
         yield Container(
             Button('Back', id='statistics-back'),
             id='statistics-footer',
         )
 
     async def on_data_table_row_selected(self, event: DataTable.RowSelected):
+        if event.data_table is not self._data:
+            return
         table_name = str(event.row_key.value)
         db_path = self.app._db_path
         if db_path:
@@ -313,21 +385,24 @@ class PaginatedTableScreen(BaseScreen):
         await self._reload()
 
     async def _reload(self) -> None:
+        from cluecoins.profiling import profile
+
         db_path = self.app._db_path
         if not db_path:
             return
         offset = self._page * self.PAGE_SIZE
-        async with connect(db_path) as conn:
-            self._total_rows = await self._count_rows(conn)
-            columns, rows = await self._fetch_page(conn, offset, self.PAGE_SIZE, self._sort_col, self._sort_asc)
-        self._data.clear()
-        if not self._columns_added:
-            for col in columns:
-                self._data.add_column(col, key=col)
-            self._columns_added = True
-        for row in rows:
-            self._data.add_row(*[str(v) if v is not None else '' for v in row])
-        self._update_page_info()
+        with profile('reload', type(self).__name__, self.app.log_write):
+            async with browse_db(db_path) as conn:
+                self._total_rows = await self._count_rows(conn)
+                columns, rows = await self._fetch_page(conn, offset, self.PAGE_SIZE, self._sort_col, self._sort_asc)
+            self._data.clear()
+            if not self._columns_added:
+                for col in columns:
+                    self._data.add_column(col, key=col)
+                self._columns_added = True
+            for row in rows:
+                self._data.add_row(*[str(v) if v is not None else '' for v in row])
+            self._update_page_info()
 
     def _update_page_info(self) -> None:
         total_pages = max(1, (self._total_rows + self.PAGE_SIZE - 1) // self.PAGE_SIZE)
@@ -382,15 +457,77 @@ class TransactionsScreen(PaginatedTableScreen):
     _default_sort_col = 'date'
     _default_sort_asc = False
 
+    def __init__(self) -> None:
+        super().__init__()
+        self._filter = TransactionFilter()
+        # NOTE: Keyset cursors of visited pages; page N+1 starts right after the last row of page N
+        self._cursors: dict[int, tuple] = {}
+        self._cursors_state: tuple = ()
+
     async def _fetch_page(self, conn: 'Connection', offset: int, limit: int, sort_col: str, sort_asc: bool) -> tuple:
-        return await fetch_transactions_page(conn, offset, limit, sort_col, sort_asc)
+        state = (sort_col, sort_asc, self._filter)
+        if state != self._cursors_state:
+            self._cursors, self._cursors_state = {}, state
+
+        after = self._cursors.get(self._page)
+        if after is not None:
+            offset = 0
+        columns, rows = await fetch_transactions_page(conn, offset, limit, sort_col, sort_asc, self._filter, after)
+        if rows:
+            self._cursors[self._page + 1] = transactions_page_cursor(rows[-1], sort_col)
+        return columns, rows
 
     async def _count_rows(self, conn: 'Connection') -> int:
-        return await count_transactions(conn)
+        return await count_transactions(conn, self._filter)
 
     def _title(self) -> str:
         return 'Transactions'
 
+    def compose_content(self) -> ComposeResult:
+        yield Input(placeholder='Search notes, items, labels and categories', id='transactions-search')
+        yield Input(placeholder=f'Filter: {FILTER_HELP}', id='transactions-filter')
+        yield from super().compose_content()
+
+    async def _search(self, text: str) -> list[int]:
+        from cluecoins.search import TransactionSearchIndex
+
+        db_path = self.app._db_path
+        if not db_path:
+            return []
+        source = str(db_path.resolve())
+        storage = LocalStorage()
+        async with storage.connect():
+            index = TransactionSearchIndex(storage, self.app.log_write)
+            await index.create_schema()
+            async with browse_db(db_path) as conn:
+                await index.refresh(conn, source, self.app.db_fingerprint())
+            return await index.search(source, text)
+
+    @on(Input.Submitted, '#transactions-search')
+    async def on_search_submitted(self, event: Input.Submitted) -> None:
+        text = event.value.strip()
+        self._filter = self._filter.with_ids(await self._search(text) if text else None)
+        self._page = 0
+        await self._reload()
+
+    @on(Input.Submitted, '#transactions-filter')
+    async def on_filter_submitted(self, event: Input.Submitted) -> None:
+        try:
+            filter_ = TransactionFilter.parse(event.value)
+        except ValueError as e:
+            self.app.log_write(f'filter: {e}')
+            return
+
+        self._filter = filter_.with_ids(self._filter.ids)
+        self._page = 0
+        await self._reload()
+
+        db_path = self.app._db_path
+        if db_path and not filter_.is_empty():
+            async with browse_db(db_path) as conn:
+                plan = await explain_transactions_page(conn, self._sort_col, self._sort_asc, self._filter)
+            self.app.log_write(f'query plan: {"; ".join(plan)}')
+
     def _back_screen(self) -> Screen:
         return MainScreen()
 
@@ -443,6 +580,7 @@ class ItemsScreen(PaginatedTableScreen):
             Static('', id='page-info'),
             Button('Next ▶', id='page-next'),
             Button('Edit', id='items-edit', disabled=True),
+            Button('Duplicates', id='items-duplicates'),
             id='pagination-footer',
         )
 
@@ -457,6 +595,10 @@ class ItemsScreen(PaginatedTableScreen):
         if self._selected_item_id is not None:
             self.app.switch_screen(RenameItemScreen(self._selected_item_id, self._selected_item_name))
 
+    @on(Button.Pressed, '#items-duplicates')
+    async def on_duplicates_pressed(self, event: Button.Pressed) -> None:
+        self.app.switch_screen(DuplicateItemsScreen())
+
 
 class RenameItemScreen(BaseScreen):
     def __init__(self, item_id: int, item_name: str) -> None:
@@ -465,8 +607,6 @@ class RenameItemScreen(BaseScreen):
         self._item_name = item_name
 
     def compose_content(self) -> ComposeResult:
-        from textual.widgets import Input
-
         yield Static(f'Rename item: {self._item_name}')
         yield Input(value=self._item_name, placeholder='Item name', id='rename-input')
         yield Container(
@@ -477,14 +617,22 @@ class RenameItemScreen(BaseScreen):
 
     @on(Button.Pressed, '#rename-save')
     async def on_save_pressed(self, event: Button.Pressed) -> None:
-        from textual.widgets import Input
-
         new_name = self.query_one('#rename-input', Input).value.strip()
         if not new_name:
             return
+        from cluecoins.schema import SchemaMismatchError
+        from cluecoins.schema import ensure_schema
+
         db_path = self.app._db_path
         if db_path:
-            async with connect(db_path) as conn:
+            async with connect_db(db_path) as conn:
+                try:
+                    await ensure_schema(conn)
+                except SchemaMismatchError as e:
+                    self.app.log_write(str(e))
+                    return
+                if not await self.app.take_snapshot('rename'):
+                    return
                 await rename_item(conn, self._item_id, new_name)
                 await conn.commit()
         self.app.switch_screen(ItemsScreen())
@@ -494,6 +642,519 @@ class RenameItemScreen(BaseScreen):
         self.app.switch_screen(ItemsScreen())
 
 
+class DuplicateItemsScreen(BaseScreen):
+    """Find items with the same name up to case and whitespace (or similar names) and merge them at once."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._data: DataTable = DataTable()
+        self._groups: list[ItemGroup] = []
+
+    async def on_mount(self) -> None:  # type: ignore[override]
+        super().on_mount()
+        self._data.add_column('keep', key='keep')
+        self._data.add_column('merge', key='merge')
+        self._data.add_column('transactions', key='transactions')
+        await self._refresh_groups()
+
+    async def _refresh_groups(self) -> None:
+        from cluecoins.items import find_duplicate_items
+
+        self._data.clear()
+        db_path = self.app._db_path
+        if not db_path:
+            return
+        async with browse_db(db_path) as conn:
+            self._groups = await find_duplicate_items(conn, self.query_one('#duplicates-fuzzy', Checkbox).value)
+        for group in self._groups:
+            self._data.add_row(
+                group.name,
+                ', '.join(f'{item.name!r}' for item in group.losers),
+                sum(item.transactions for item in group.items),
+            )
+        self.query_one('#duplicates-merge', Button).disabled = not self._groups
+
+    def compose_content(self) -> ComposeResult:
+        yield Static('Items that differ only in case and whitespace; the most used one of each group is kept')
+        yield self._data
+        yield Container(
+            Button('Back', id='duplicates-back'),
+            Checkbox('Similar names', id='duplicates-fuzzy'),
+            Button('Merge all', id='duplicates-merge', disabled=True),
+            classes='button-group',
+        )
+
+    @on(Checkbox.Changed, '#duplicates-fuzzy')
+    async def on_fuzzy_changed(self, event: Checkbox.Changed) -> None:
+        await self._refresh_groups()
+
+    @on(Button.Pressed, '#duplicates-merge')
+    async def on_merge_pressed(self, event: Button.Pressed) -> None:
+        from cluecoins.items import merge_items
+        from cluecoins.schema import SchemaMismatchError
+
+        db_path = self.app._db_path
+        if not db_path or not self._groups:
+            return
+        if not await self.app.take_snapshot('merge'):
+            return
+        try:
+            async with connect_db(db_path) as conn:
+                result = await merge_items(conn, self._groups)
+        except SchemaMismatchError as e:
+            self.app.log_write(str(e))
+            return
+        self.app.log_write(f'merged {result.items} items, {result.transactions} transactions updated')
+        await self._refresh_groups()
+
+    @on(Button.Pressed, '#duplicates-back')
+    async def on_back_pressed(self, event: Button.Pressed) -> None:
+        self.app.switch_screen(ItemsScreen())
+
+
+class PerformanceIndexesScreen(BaseScreen):
+    """Propose, create and drop performance indexes on a working copy of the database."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._data: DataTable = DataTable()
+
+    async def on_mount(self) -> None:  # type: ignore[override]
+        super().on_mount()
+        self._data.add_column('query', key='query')
+        self._data.add_column('plan', key='plan')
+        self._data.add_column('proposed index', key='index')
+        await self._refresh_proposals()
+
+    async def _refresh_proposals(self) -> None:
+        from cluecoins.indexes import propose_indexes
+
+        self._data.clear()
+        db_path = self.app._db_path
+        if not db_path:
+            return
+        async with browse_db(db_path) as conn:
+            proposals = await propose_indexes(conn)
+        for proposal in proposals:
+            self._data.add_row(proposal.query.name, '; '.join(proposal.plan), proposal.query.index)
+        self.query_one('#indexes-create', Button).disabled = not proposals
+
+    def compose_content(self) -> ComposeResult:
+        yield Static('Queries doing full scans or sorts, and indexes that would help them')
+        yield self._data
+        yield Container(
+            Button('Back', id='indexes-back'),
+            Button('Create on working copy', id='indexes-create'),
+            Button('Drop indexes', id='indexes-drop'),
+            classes='button-group',
+        )
+
+    @on(Button.Pressed, '#indexes-create')
+    async def on_create_pressed(self, event: Button.Pressed) -> None:
+        from cluecoins.indexes import apply_with_timings
+        from cluecoins.indexes import create_working_copy
+        from cluecoins.indexes import is_working_copy
+        from cluecoins.indexes import propose_indexes
+
+        db_path = self.app._db_path
+        if not db_path:
+            return
+        if not is_working_copy(db_path):
+            db_path = await create_working_copy(db_path, self.app.log_write)
+            self.app.database_connect(db_path)
+            self.app.log_write(f'working copy created; drop the indexes before pushing `{db_path}` to the phone')
+
+        async with connect_db(db_path) as conn:
+            timings = await apply_with_timings(conn, db_path, await propose_indexes(conn))
+        for timing in timings:
+            self.app.log_write(
+                f'{timing.query.name}: {timing.before * 1000:.2f} ms -> {timing.after * 1000:.2f} ms'
+                f' ({"; ".join(timing.plan)})'
+            )
+        await self._refresh_proposals()
+
+    @on(Button.Pressed, '#indexes-drop')
+    async def on_drop_pressed(self, event: Button.Pressed) -> None:
+        from cluecoins.indexes import strip_indexes
+
+        db_path = self.app._db_path
+        if not db_path:
+            return
+        async with connect_db(db_path) as conn:
+            dropped = await strip_indexes(conn)
+        self.app.log_write(f'dropped indexes: {", ".join(dropped) or "none"}')
+        await self._refresh_proposals()
+
+    @on(Button.Pressed, '#indexes-back')
+    async def on_back_pressed(self, event: Button.Pressed) -> None:
+        self.app.switch_screen(MainScreen())
+
+
+class CleanupScreen(BaseScreen):
+    """Preview and delete empty transactions, orphan labels and unused items."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._rules: DataTable = DataTable(cursor_type='row')
+        self._preview: DataTable = DataTable()
+
+    async def on_mount(self) -> None:  # type: ignore[override]
+        super().on_mount()
+        self._rules.add_column('rule', key='rule')
+        self._rules.add_column('candidates', key='candidates')
+        await self._refresh_counts()
+
+    async def _refresh_counts(self) -> None:
+        from cluecoins.cleanup import CLEANUP_RULES
+        from cluecoins.cleanup import count_candidates
+
+        self._rules.clear()
+        self._preview.clear(columns=True)
+        db_path = self.app._db_path
+        if not db_path:
+            return
+        total = 0
+        async with browse_db(db_path) as conn:
+            for rule in CLEANUP_RULES.values():
+                count = await count_candidates(conn, rule)
+                total += count
+                self._rules.add_row(rule.description, count, key=rule.name)
+        self.query_one('#cleanup-delete', Button).disabled = not total
+
+    async def on_data_table_row_selected(self, event: DataTable.RowSelected) -> None:
+        from cluecoins.cleanup import CLEANUP_RULES
+        from cluecoins.cleanup import iter_candidates
+
+        if event.data_table is not self._rules:
+            return
+        rule = CLEANUP_RULES[str(event.row_key.value)]
+        self._preview.clear(columns=True)
+        self._preview.add_columns(*rule.columns)
+        db_path = self.app._db_path
+        if not db_path:
+            return
+        # NOTE: Only the first chunk; there may be millions of candidates
+        async with browse_db(db_path) as conn:
+            async for rows in iter_candidates(conn, rule):
+                self._preview.add_rows(rows)
+                break
+
+    def compose_content(self) -> ComposeResult:
+        yield Static('Select a rule to preview its candidates')
+        yield self._rules
+        yield self._preview
+        yield Container(
+            Button('Back', id='cleanup-back'),
+            Button('Delete all', id='cleanup-delete', disabled=True),
+            classes='button-group',
+        )
+
+    @on(Button.Pressed, '#cleanup-delete')
+    async def on_delete_pressed(self, event: Button.Pressed) -> None:
+        from cluecoins.cleanup import cleanup
+        from cluecoins.schema import SchemaMismatchError
+
+        db_path = self.app._db_path
+        if not db_path:
+            return
+        if not await self.app.take_snapshot('cleanup'):
+            return
+        try:
+            async with connect_db(db_path) as conn:
+                deleted = await cleanup(conn)
+        except SchemaMismatchError as e:
+            self.app.log_write(str(e))
+            return
+        self.app.log_write('deleted: ' + ', '.join(f'{name} {count}' for name, count in deleted.items()))
+        await self._refresh_counts()
+
+    @on(Button.Pressed, '#cleanup-back')
+    async def on_back_pressed(self, event: Button.Pressed) -> None:
+        self.app.switch_screen(MainScreen())
+
+
+class BackupsScreen(BaseScreen):
+    """Take compressed snapshots of the database and restore them."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._data: DataTable = DataTable(cursor_type='row')
+        self._snapshots: list[Snapshot] = []
+
+    async def on_mount(self) -> None:  # type: ignore[override]
+        super().on_mount()
+        self._data.add_column('created', key='created')
+        self._data.add_column('reason', key='reason')
+        self._data.add_column('size', key='size')
+        self._refresh_snapshots()
+
+    def _refresh_snapshots(self) -> None:
+        from cluecoins.backup import list_snapshots
+        from cluecoins.backup import source_name
+
+        self._data.clear()
+        db_path = self.app._db_path
+        self._snapshots = list_snapshots(source_name(db_path)) if db_path else []
+        for snapshot in self._snapshots:
+            self._data.add_row(
+                snapshot.created.strftime('%Y-%m-%d %H:%M:%S'),
+                snapshot.reason,
+                f'{snapshot.size / 1024:.0f} KiB',
+                key=str(snapshot.path),
+            )
+        self.query_one('#backups-restore', Button).disabled = not self._snapshots
+
+    def compose_content(self) -> ComposeResult:
+        yield Static('Snapshots of the database, newest first; select one to restore')
+        yield self._data
+        yield Container(
+            Button('Back', id='backups-back'),
+            Button('Snapshot now', id='backups-create'),
+            Button('Restore selected', id='backups-restore', disabled=True),
+            classes='button-group',
+        )
+
+    @on(Button.Pressed, '#backups-create')
+    async def on_create_pressed(self, event: Button.Pressed) -> None:
+        await self.app.take_snapshot('manual')
+        self._refresh_snapshots()
+
+    @on(Button.Pressed, '#backups-restore')
+    async def on_restore_pressed(self, event: Button.Pressed) -> None:
+        from cluecoins.backup import restore_snapshot
+
+        db_path = self.app._db_path
+        if not db_path or not self._snapshots:
+            return
+        snapshot = self._snapshots[self._data.cursor_row]
+        try:
+            previous = await restore_snapshot(snapshot, db_path)
+        except Exception as e:
+            self.app.log_write(f'restore failed: {e}')
+            return
+        if previous:
+            self.app.log_write(f'previous contents saved to `{previous.path}`')
+        self.app.log_write(f'restored `{snapshot.path.name}`')
+        self.app._table_counts = {}
+        self.app.db_fingerprint()
+        self._refresh_snapshots()
+
+    @on(Button.Pressed, '#backups-back')
+    async def on_back_pressed(self, event: Button.Pressed) -> None:
+        self.app.switch_screen(MainScreen())
+
+
+class CategoryReportScreen(BaseScreen):
+    """Income and expense over the category tree; select a category to see it by month."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._tree: Tree[CategoryNode] = Tree('Categories', id='categories-tree')
+        self._months: DataTable = DataTable()
+        self._report: CategoryReport | None = None
+        self._range: tuple[str | None, str | None] = (None, None)
+
+    async def on_mount(self) -> None:  # type: ignore[override]
+        from cluecoins.report import load_category_report
+
+        super().on_mount()
+        self._months.add_column('month', key='month')
+        self._months.add_column('amount', key='amount')
+        db_path = self.app._db_path
+        if not db_path:
+            return
+        self._report = await load_category_report(db_path)
+        years = sorted({month[:4] for month in self._report.months}, reverse=True)
+        self.query_one('#categories-range', Select).set_options([('All time', ''), *((year, year) for year in years)])
+        self._fill_tree()
+
+    def _fill_tree(self) -> None:
+        self._tree.clear()
+        if self._report is None:
+            return
+        self._tree.root.expand()
+        branches = {0: self._tree.root}
+        for depth, node in self._report.walk():
+            label = f'{node.name}  {node.total(*self._range):,.2f}'
+            if node.children:
+                branches[depth + 1] = branches[depth].add(label, data=node, expand=depth == 0)
+            else:
+                branches[depth].add_leaf(label, data=node)
+
+    def compose_content(self) -> ComposeResult:
+        yield Select([('All time', '')], value='', allow_blank=False, id='categories-range')
+        yield Container(self._tree, self._months, classes='horizontal')
+        yield Container(Button('Back', id='categories-back'), classes='button-group')
+
+    @on(Select.Changed, '#categories-range')
+    def on_range_changed(self, event: Select.Changed) -> None:
+        year = str(event.value)
+        self._range = (f'{year}-01', f'{year}-12') if year else (None, None)
+        self._fill_tree()
+        self._months.clear()
+
+    @on(Tree.NodeHighlighted, '#categories-tree')
+    def on_node_highlighted(self, event: Tree.NodeHighlighted) -> None:
+        self._months.clear()
+        node = event.node.data
+        if node is None:
+            return
+        for month, amount in sorted(node.between(*self._range).items(), reverse=True):
+            self._months.add_row(month, amount)
+
+    @on(Button.Pressed, '#categories-back')
+    async def on_back_pressed(self, event: Button.Pressed) -> None:
+        self.app.switch_screen(MainScreen())
+
+
+class NetWorthScreen(BaseScreen):
+    """Net worth over time in the base currency, revalued with the cached quotes."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._data: DataTable = DataTable()
+        self._result: NetWorth | None = None
+
+    async def on_mount(self) -> None:  # type: ignore[override]
+        super().on_mount()
+        self._data.add_column('date', key='date')
+        self._data.add_column('net worth', key='amount')
+        await self._refresh_series('month')
+
+    async def _refresh_series(self, bucket: str) -> None:
+        from cluecoins.networth import load_net_worth
+
+        db_path = self.app._db_path
+        if not db_path:
+            return
+        self._result = result = await load_net_worth(db_path, bucket)
+        self._data.clear()
+        for point in reversed(result.points):
+            self._data.add_row(point.date.isoformat(), point.amount)
+
+        # NOTE: Unlike the Bluecoins widget, the Y axis spans from the minimum to the maximum, not from zero
+        amounts = [float(point.amount) for point in result.points]
+        self.query_one('#networth-chart', Sparkline).data = amounts
+        summary = f'{result.base_currency}, {len(amounts)} points'
+        if amounts:
+            summary += f', min {min(amounts):,.2f}, max {max(amounts):,.2f}, last {amounts[-1]:,.2f}'
+        if result.estimated:
+            summary += f'; no cached quotes for {", ".join(sorted(result.estimated))}, transaction rates used'
+        self.query_one('#networth-summary', Static).update(summary)
+        self.query_one('#networth-export', Button).disabled = not amounts
+
+    def compose_content(self) -> ComposeResult:
+        from cluecoins.ledger import BUCKETS
+
+        yield Select(((bucket, bucket) for bucket in BUCKETS), value='month', allow_blank=False, id='networth-bucket')
+        yield Sparkline([], id='networth-chart')
+        yield Static('', id='networth-summary')
+        yield self._data
+        yield Container(
+            Button('Back', id='networth-back'),
+            Button('Export CSV', id='networth-export', disabled=True),
+            classes='button-group',
+        )
+
+    @on(Select.Changed, '#networth-bucket')
+    async def on_bucket_changed(self, event: Select.Changed) -> None:
+        await self._refresh_series(str(event.value))
+
+    @on(Button.Pressed, '#networth-export')
+    async def on_export_pressed(self, event: Button.Pressed) -> None:
+        from cluecoins.networth import write_net_worth
+
+        db_path = self.app._db_path
+        if not db_path or self._result is None:
+            return
+        output = db_path.with_name(f'{db_path.stem}.networth.csv')
+        write_net_worth(self._result, output)
+        self.app.log_write(f'net worth exported to `{output}`')
+
+    @on(Button.Pressed, '#networth-back')
+    async def on_back_pressed(self, event: Button.Pressed) -> None:
+        self.app.switch_screen(MainScreen())
+
+
+class QueryStatsScreen(BaseScreen):
+    """Statements traced since the app started (see `cluecoins.tracing`), by total time; highlight one to see its plan."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._data: DataTable = DataTable(cursor_type='row')
+        self._stats: list[QueryStats] = []
+
+    def on_mount(self) -> None:
+        super().on_mount()
+        for column in ('screen', 'calls', 'total ms', 'max ms', 'rows', 'scan', 'statement'):
+            self._data.add_column(column, key=column)
+        self._refresh_stats()
+
+    def _refresh_stats(self) -> None:
+        from cluecoins.tracing import SLOW_QUERY_LOG
+        from cluecoins.tracing import get_tracer
+
+        tracer = get_tracer()
+        self._data.clear()
+        if tracer is None:
+            self._stats = []
+            summary = 'SQL tracing is off; start the app with CLUECOINS_TRACE_SQL=1 to enable it'
+        else:
+            self._stats = tracer.stats()
+            summary = (
+                f'{len(self._stats)} statements, {sum(s.calls for s in self._stats)} calls; '
+                f'slower than {tracer.slow_ms:.0f} ms are logged to `{tracer.slow_log or SLOW_QUERY_LOG}`'
+            )
+        for stats in self._stats:
+            self._data.add_row(
+                stats.scope or '-',
+                stats.calls,
+                f'{stats.total_ms:.1f}',
+                f'{stats.max_ms:.1f}',
+                stats.rows,
+                'yes' if stats.full_scan else '',
+                stats.statement[:200],
+            )
+        self.query_one('#query-stats-summary', Static).update(summary)
+        self.query_one('#query-plan', Static).update('')
+
+    def compose_content(self) -> ComposeResult:
+        yield Static('', id='query-stats-summary')
+        yield self._data
+        yield Static('', id='query-plan')
+        yield Container(
+            Button('Back', id='query-stats-back'),
+            Button('Refresh', id='query-stats-refresh'),
+            Button('Reset', id='query-stats-reset'),
+            classes='button-group',
+        )
+
+    @on(DataTable.RowHighlighted)
+    def on_row_highlighted(self, event: DataTable.RowHighlighted) -> None:
+        if not 0 <= event.cursor_row < len(self._stats):
+            return
+        stats = self._stats[event.cursor_row]
+        plan = '\n'.join(stats.plan) or 'no plan'
+        self.query_one('#query-plan', Static).update(f'{stats.statement}\n{plan}')
+
+    @on(Button.Pressed, '#query-stats-refresh')
+    def on_refresh_pressed(self, event: Button.Pressed) -> None:
+        self._refresh_stats()
+
+    @on(Button.Pressed, '#query-stats-reset')
+    def on_reset_pressed(self, event: Button.Pressed) -> None:
+        from cluecoins.tracing import get_tracer
+
+        tracer = get_tracer()
+        if tracer is not None:
+            tracer.reset()
+        self._refresh_stats()
+
+    @on(Button.Pressed, '#query-stats-back')
+    async def on_back_pressed(self, event: Button.Pressed) -> None:
+        self.app.switch_screen(MainScreen())
+
+
 class OpenFileScreen(BaseScreen):
     def __init__(self):
         super().__init__()
@@ -539,37 +1200,54 @@ class CluecoinsMenuScreen(MenuScreen):
 
     _DB_REQUIRED_IDS: ClassVar[tuple[str, ...]] = (
         '#statistics_menu_item',
+        '#net_worth_menu_item',
+        '#categories_menu_item',
         '#fetch_quotes_menu_item',
         '#disconnect_menu_item',
         '#transactions_menu_item',
         '#accounts_menu_item',
         '#labels_menu_item',
+        '#performance_indexes_menu_item',
+        '#cleanup_menu_item',
+        '#backups_menu_item',
+        '#push_device_menu_item',
     )
+    _DEVICE_REQUIRED_IDS: ClassVar[tuple[str, ...]] = ('#push_device_menu_item',)
     _BUSY_LOCKED_IDS: ClassVar[tuple[str, ...]] = (
         '#open_file_menu_item',
+        '#open_device_menu_item',
+        '#push_device_menu_item',
         '#statistics_menu_item',
+        '#net_worth_menu_item',
+        '#categories_menu_item',
         '#fetch_quotes_menu_item',
         '#disconnect_menu_item',
         '#cached_quotes_menu_item',
         '#transactions_menu_item',
         '#accounts_menu_item',
         '#labels_menu_item',
+        '#performance_indexes_menu_item',
+        '#cleanup_menu_item',
+        '#backups_menu_item',
     )
 
+    def _is_unavailable(self, item_id: str) -> bool:
+        if item_id in self._DB_REQUIRED_IDS and not self.app._db_path:
+            return True
+        return item_id in self._DEVICE_REQUIRED_IDS and not self.app._sync
+
     def _apply_db_state(self) -> None:
-        has_db = self.app._db_path
         for item_id in self._DB_REQUIRED_IDS:
-            self.query_one(item_id, MenuItem).disabled = not has_db
+            self.query_one(item_id, MenuItem).disabled = self._is_unavailable(item_id)
 
     def _apply_busy_state(self) -> None:
         is_busy = self.app._is_busy
-        has_db = self.app._db_path
         for item_id in self._BUSY_LOCKED_IDS:
             item = self.query_one(item_id, MenuItem)
             if is_busy:
                 item.disabled = True
             else:
-                item.disabled = item_id in self._DB_REQUIRED_IDS and not has_db
+                item.disabled = self._is_unavailable(item_id)
 
     async def on_mount(self) -> None:
         self._apply_db_state()
@@ -583,7 +1261,9 @@ class CluecoinsMenuScreen(MenuScreen):
         yield from super().compose()
         yield Menu(
             MenuItem('Open File', menu_action='app.open_file', id='open_file_menu_item'),
-            MenuItem('Open Device', disabled=True),
+            MenuItem('Open Device', menu_action='app.open_device', id='open_device_menu_item'),
+            MenuItem('Push to Device', menu_action='app.push_device', id='push_device_menu_item'),
+            MenuItem('Backups', menu_action='app.backups', id='backups_menu_item'),
             MenuItem('Disconnect', id='disconnect_menu_item'),
             MenuItem('Exit', menu_action='app.exit'),
             name='File',
@@ -598,6 +1278,8 @@ class CluecoinsMenuScreen(MenuScreen):
         )
         yield Menu(
             MenuItem('Statistics', menu_action='app.statistics', id='statistics_menu_item'),
+            MenuItem('Net Worth', menu_action='app.net_worth', id='net_worth_menu_item'),
+            MenuItem('Categories', menu_action='app.categories', id='categories_menu_item'),
             MenuItem('Cached Quotes', menu_action='app.cached_quotes', id='cached_quotes_menu_item'),
             name='View',
             id='view_menu',
@@ -605,6 +1287,13 @@ class CluecoinsMenuScreen(MenuScreen):
         yield Menu(
             MenuItem('Fetch Quotes', menu_action='app.fetch_quotes', id='fetch_quotes_menu_item'),
             MenuItem('Change Currency', disabled=True),
+            MenuItem(
+                'Performance Indexes',
+                menu_action='app.performance_indexes',
+                id='performance_indexes_menu_item',
+            ),
+            MenuItem('Cleanup', menu_action='app.cleanup', id='cleanup_menu_item'),
+            MenuItem('Query Stats', menu_action='app.query_stats', id='query_stats_menu_item'),
             name='Tools',
             id='tools_menu',
         )
@@ -630,9 +1319,12 @@ class CluecoinsApp(App):
         super().__init__()
         self._db_path: Path | None = None
         self._db_conn: Connection | None = None
+        self._db_header: SqliteHeader | None = None
+        self._table_counts: dict[str, list[tuple[str, int | str]]] = {}
         self._status_text: str = 'not connected'
         self._log_history: list = []
         self._is_busy: bool = False
+        self._sync: SyncManager | None = None
 
     def log_write(self, message) -> None:
         self._log_history.append(message)
@@ -646,19 +1338,38 @@ class CluecoinsApp(App):
             self.screen._apply_db_state()
             self.screen._apply_busy_state()
 
+    def db_fingerprint(self) -> str | None:
+        """Re-read the database header; the fingerprint changes whenever the file was written to.
+
+        `None` if it can't be trusted: in WAL mode commits don't touch the main file header.
+        """
+        if not self._db_path:
+            return None
+        try:
+            self._db_header = read_header(self._db_path)
+        except (OSError, ValueError):
+            self._db_header = None
+        if self._db_header is None or self._db_header.is_wal:
+            return None
+        return self._db_header.fingerprint
+
     def database_connect(self, db_path: Path) -> None:
         self._db_path = db_path
+        self._table_counts = {}
         self.refresh_menu_state()
 
-        res = subprocess.run(
-            ('file', str(db_path)),
-            capture_output=True,
-            text=True,
-            check=True,
-        )
         self.log_write(f'connected to `{db_path}`')
-        self.log_write(res.stdout.split(':')[1].strip())
+        try:
+            self._db_header = read_header(db_path)
+        except ValueError as e:
+            self._db_header = None
+            self.log_write(str(e))
+        else:
+            self.log_write(self._db_header.describe() if self._db_header else 'empty database')
+
         self._status_text = f'connected to `{db_path.name}`'
+        if self._db_header:
+            self._status_text += f' · {self._db_header.summary()}'
         try:
             self.screen.query_one('#status_bar', Static).update(self._status_text)
         except NoMatches:
@@ -670,6 +1381,22 @@ class CluecoinsApp(App):
         except NoMatches:
             pass
 
+    async def take_snapshot(self, reason: str) -> bool:
+        """Snapshot the database before writing to it; `False` if that failed and nothing must be written."""
+        from sqlite3 import Error
+
+        from cluecoins.backup import create_snapshot
+
+        if not self._db_path:
+            return False
+        try:
+            snapshot = await create_snapshot(self._db_path, reason)
+        except (OSError, Error) as e:
+            self.log_write(f'snapshot failed, database left unchanged: {e}')
+            return False
+        self.log_write(f'snapshot saved to `{snapshot.path}`')
+        return True
+
     def on_mount(self) -> None:
         self.push_screen(MainScreen())
 
@@ -685,9 +1412,72 @@ class CluecoinsApp(App):
     def action_statistics(self) -> None:
         self.switch_screen(StatisticsScreen())
 
+    def action_net_worth(self) -> None:
+        self.switch_screen(NetWorthScreen())
+
+    def action_categories(self) -> None:
+        self.switch_screen(CategoryReportScreen())
+
+    def action_query_stats(self) -> None:
+        self.switch_screen(QueryStatsScreen())
+
     def action_fetch_quotes(self) -> None:
         self.switch_screen(FetchQuotesScreen())
 
+    def action_performance_indexes(self) -> None:
+        self.switch_screen(PerformanceIndexesScreen())
+
+    def action_cleanup(self) -> None:
+        self.switch_screen(CleanupScreen())
+
+    async def action_open_device(self) -> None:
+        """Pull the database from the connected device and open it."""
+        import asyncio
+
+        from cluecoins import adb
+        from cluecoins.sync_manager import SyncManager
+
+        self.log_write('pulling the database from the device...')
+        self._is_busy = True
+        self.refresh_menu_state()
+        try:
+            sync = SyncManager(await asyncio.to_thread(adb.connect))
+            path = await sync.pull()
+        except Exception as e:
+            self.log_write(f'pull failed: {e}')
+            return
+        finally:
+            self._is_busy = False
+            self.refresh_menu_state()
+
+        self._sync = sync
+        self.log_write(f'pulled `{path.name}` from `{sync.device.serial}`, sha256 {sync.remote_checksum}')
+        self.database_connect(path)
+
+    async def action_push_device(self) -> None:
+        """Push the open database back to the device it was pulled from."""
+        if not self._sync or not self._db_path:
+            return
+        self.log_write('pushing the database to the device...')
+        self._is_busy = True
+        self.refresh_menu_state()
+        try:
+            result = await self._sync.push(self._db_path)
+        except Exception as e:
+            self.log_write(f'push failed: {e}')
+            return
+        finally:
+            self._is_busy = False
+            self.refresh_menu_state()
+
+        if result.skipped:
+            self.log_write('the device already has this database, nothing pushed')
+        else:
+            self.log_write(f'pushed {result.size} bytes, sha256 {result.checksum}; Bluecoins restarted')
+
+    def action_backups(self) -> None:
+        self.switch_screen(BackupsScreen())
+
     def action_transactions(self) -> None:
         self.switch_screen(TransactionsScreen())
 
@@ -8,6 +8,20 @@ import pytest
 from cluecoins.storage import LocalStorage
 
 
+@pytest.fixture(autouse=True)
+def xdg_dirs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Keep local storage and working copies created by the app away from the real XDG directories"""
+    monkeypatch.setattr('cluecoins.storage.DEFAULT_DB_PATH', tmp_path / 'xdg' / 'db.sqlite3')
+    monkeypatch.setattr('cluecoins.storage.DEFAULT_CACHE_PATH', tmp_path / 'xdg' / 'cache.sqlite3')
+    monkeypatch.setattr('cluecoins.indexes.WORKING_COPY_DIR', tmp_path / 'xdg' / 'working')
+    monkeypatch.setattr('cluecoins.backup.BACKUP_DIR', tmp_path / 'xdg' / 'backups')
+    monkeypatch.setattr('cluecoins.pagestore.PAGE_STORE_PATH', tmp_path / 'xdg' / 'pages.sqlite3')
+    monkeypatch.setattr('cluecoins.sync_manager.DEVICE_DIR', tmp_path / 'xdg' / 'device')
+    monkeypatch.setattr('cluecoins.ledger.LEDGER_CACHE_DIR', tmp_path / 'xdg' / 'ledger')
+    monkeypatch.setattr('cluecoins.tracing.SLOW_QUERY_LOG', tmp_path / 'xdg' / 'slow-queries.log')
+    monkeypatch.setattr('cluecoins.profiling.PROFILE_DIR', tmp_path / 'xdg' / 'profiles')
+
+
 @pytest.fixture
 def fydb_file(tmp_path: Path) -> Path:
     path = tmp_path / 'test.fydb'
@@ -26,6 +40,18 @@ def fydb_with_tables(tmp_path: Path) -> Path:
     return path
 
 
+@pytest.fixture
+def bluecoins_db(tmp_path: Path) -> Path:
+    """Full Bluecoins database with the sample data from `test_data.sql`"""
+    path = tmp_path / 'bluecoins.fydb'
+    conn = sqlite3.connect(path)
+    conn.executescript((Path(__file__).parent / 'test_data.sql').read_text())
+    # NOTE: Not a part of the dump; the value Bluecoins 12.9.5 files report, see `docs/database.md`
+    conn.execute('PRAGMA user_version = 42')
+    conn.close()
+    return path
+
+
 @pytest.fixture
 async def local_storage(tmp_path: Path) -> AsyncGenerator[LocalStorage, None]:
     db_path = tmp_path / 'db.sqlite3'
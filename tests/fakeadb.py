@@ -0,0 +1,96 @@
+"""Stand-in for `adbutils.AdbDevice` backed by a local directory, for testing device sync without a phone.
+
+Device paths are mapped into `root`; `shell` understands the handful of commands `cluecoins.adb` issues.
+"""
+
+import hashlib
+import shlex
+import shutil
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from adbutils import AdbError
+
+from cluecoins.adb import APP_ID
+from cluecoins.adb import DEVICE_DB_PATH
+from cluecoins.adb import STAGING_DIR
+
+
+class FakeSync:
+    def __init__(self, device: 'FakeDevice') -> None:
+        self._device = device
+
+    def iter_content(self, path: str) -> Iterator[bytes]:
+        local = self._device.local(path)
+        if not local.is_file():
+            raise AdbError('No such file or directory', path)
+        with local.open('rb') as f:
+            while chunk := f.read(self._device.chunk_size):
+                yield self._device.corrupt(chunk)
+
+    def push(self, src: Any, dst: str, mode: int = 0o755, check: bool = False) -> int:
+        local = self._device.local(dst)
+        local.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(src, local)
+        return local.stat().st_size
+
+
+class FakeDevice:
+    serial = 'fake'
+    chunk_size = 65536
+
+    def __init__(self, root: Path, database: Path | None = None) -> None:
+        self.root = root
+        self.running = True
+        self.commands: list[str] = []
+        self.corrupt_transfers = False
+        self.local(STAGING_DIR).mkdir(parents=True, exist_ok=True)
+        if database:
+            self.local(DEVICE_DB_PATH).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(database, self.local(DEVICE_DB_PATH))
+
+    def local(self, path: str) -> Path:
+        return self.root / path.lstrip('/')
+
+    def corrupt(self, chunk: bytes) -> bytes:
+        return chunk[:-1] + b'\x00' if self.corrupt_transfers else chunk
+
+    @property
+    def sync(self) -> FakeSync:
+        return FakeSync(self)
+
+    def app_stop(self, package_name: str) -> None:
+        assert package_name == APP_ID
+        self.running = False
+
+    def app_start(self, package_name: str) -> None:
+        assert package_name == APP_ID
+        self.running = True
+
+    def shell(self, cmdargs: str) -> str:
+        self.commands.append(cmdargs)
+        args = shlex.split(cmdargs)
+        assert args[:3] == ['su', '0', '-c'], cmdargs
+        return ''.join(self._run(shlex.split(command)) for command in args[3].split('&&'))
+
+    def _run(self, args: list[str]) -> str:
+        if args[-1] == '2>/dev/null':
+            args = args[:-1]
+        match args:
+            case ['cp', src, dst]:
+                shutil.copyfile(self.local(src), self.local(dst))
+            case ['chmod' | 'chown', _, _]:
+                pass
+            case ['rm', '-f', *paths]:
+                for path in paths:
+                    self.local(path).unlink(missing_ok=True)
+            case ['sha256sum', path]:
+                if not self.local(path).is_file():
+                    return ''
+                return f'{hashlib.sha256(self.local(path).read_bytes()).hexdigest()}  {path}\n'
+            case ['stat', '-c', '%u:%g', _]:
+                return '10123:10123\n'
+            case _:
+                raise AssertionError(f'unexpected command: {args}')
+        return ''
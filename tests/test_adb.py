@@ -0,0 +1,132 @@
+import asyncio
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from cluecoins.adb import DEVICE_DB_PATH
+from cluecoins.adb import Device
+from cluecoins.adb import TransferError
+from cluecoins.database import connect_db
+from cluecoins.indexes import create_indexes
+from cluecoins.indexes import create_working_copy
+from cluecoins.indexes import existing_indexes
+from cluecoins.sync_manager import SyncManager
+from tests.fakeadb import FakeDevice
+
+
+@pytest.fixture
+def fake_device(tmp_path: Path, bluecoins_db: Path) -> FakeDevice:
+    return FakeDevice(tmp_path / 'device', bluecoins_db)
+
+
+def _rename_item(path: Path) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE ITEMTABLE SET itemName = 'Renamed' WHERE itemTableID = 5")
+    conn.commit()
+    conn.close()
+
+
+def _item_name(path: Path) -> str:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT itemName FROM ITEMTABLE WHERE itemTableID = 5').fetchone()[0]
+    finally:
+        conn.close()
+
+
+async def test_pull_and_push(fake_device: FakeDevice, tmp_path: Path) -> None:
+    manager = SyncManager(Device(fake_device), tmp_path / 'local')
+
+    path = await manager.pull()
+    assert path.read_bytes() == fake_device.local(DEVICE_DB_PATH).read_bytes()
+    assert not fake_device.running
+    assert not fake_device.local('/data/local/tmp/cluecoins-pull.fydb').exists()
+
+    result = await manager.push()
+    assert result.skipped
+
+    _rename_item(path)
+    result = await manager.push()
+    assert not result.skipped
+    assert fake_device.running
+    assert _item_name(fake_device.local(DEVICE_DB_PATH)) == 'Renamed'
+    assert fake_device.local(DEVICE_DB_PATH + '.cluecoins.bak').is_file()
+
+
+async def test_push_conflict(fake_device: FakeDevice, tmp_path: Path) -> None:
+    manager = SyncManager(Device(fake_device), tmp_path / 'local')
+    path = await manager.pull()
+
+    _rename_item(fake_device.local(DEVICE_DB_PATH))
+    with pytest.raises(TransferError, match='changed since it was pulled'):
+        await manager.push()
+
+    await manager.push(path, force=True)
+    assert _item_name(fake_device.local(DEVICE_DB_PATH)) != 'Renamed'
+
+
+def _rename_item_in_wal(fake_device: FakeDevice) -> None:
+    """Leave the rename in the `-wal` of the device database, as a killed app would."""
+    path = fake_device.local(DEVICE_DB_PATH)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA wal_autocheckpoint = 0')
+    conn.execute("UPDATE ITEMTABLE SET itemName = 'Renamed' WHERE itemTableID = 5")
+    conn.commit()
+    files = {p: p.read_bytes() for p in (path, path.with_name(f'{path.name}-wal'))}
+    # NOTE: Closing checkpoints the WAL; put back the files as they were before
+    conn.close()
+    for p, data in files.items():
+        p.write_bytes(data)
+
+
+async def test_pull_wal(fake_device: FakeDevice, tmp_path: Path) -> None:
+    _rename_item_in_wal(fake_device)
+    manager = SyncManager(Device(fake_device), tmp_path / 'local')
+
+    path = await manager.pull()
+    assert _item_name(path) == 'Renamed'
+    assert list(path.parent.iterdir()) == [path]
+    assert not fake_device.local('/data/local/tmp/cluecoins-pull.fydb-wal').exists()
+
+    _rename_item(path)
+    result = await manager.push()
+    assert not result.skipped
+    assert not fake_device.local(DEVICE_DB_PATH + '-wal').exists()
+    assert _item_name(fake_device.local(DEVICE_DB_PATH)) == 'Renamed'
+
+
+async def test_push_unpulled_wal(fake_device: FakeDevice, tmp_path: Path) -> None:
+    manager = SyncManager(Device(fake_device), tmp_path / 'local')
+    path = await manager.pull()
+    _rename_item_in_wal(fake_device)
+
+    with pytest.raises(TransferError, match='changed since it was pulled'):
+        await manager.push()
+    with pytest.raises(TransferError, match='has changes the pushed database does not include'):
+        await asyncio.to_thread(Device(fake_device).push, path)
+    assert fake_device.local(DEVICE_DB_PATH + '-wal').is_file()
+
+
+async def test_corrupted_pull(fake_device: FakeDevice, tmp_path: Path) -> None:
+    fake_device.corrupt_transfers = True
+    manager = SyncManager(Device(fake_device), tmp_path / 'local')
+
+    with pytest.raises(TransferError, match='checksum mismatch'):
+        await manager.pull()
+    assert list((tmp_path / 'local').iterdir()) == []
+
+
+async def test_push_strips_indexes(fake_device: FakeDevice, bluecoins_db: Path, tmp_path: Path) -> None:
+    copy = await create_working_copy(bluecoins_db)
+    async with connect_db(copy) as conn:
+        await create_indexes(conn, copy, ['cluecoins_transactions_date'])
+
+    await SyncManager(Device(fake_device)).push(copy)
+
+    device_db = sqlite3.connect(fake_device.local(DEVICE_DB_PATH))
+    assert device_db.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE 'cluecoins_%'").fetchone()[0] == 0
+    device_db.close()
+    async with connect_db(copy) as conn:
+        assert await existing_indexes(conn) == {'cluecoins_transactions_date'}
@@ -0,0 +1,87 @@
+import sqlite3
+from pathlib import Path
+
+import aiosqlite
+import pytest
+
+from cluecoins.archive import archive_account
+from cluecoins.archive import archived_accounts
+from cluecoins.archive import find_account
+from cluecoins.archive import unarchive_account
+
+
+def _dump(path: Path) -> dict[str, list[tuple]]:
+    conn = sqlite3.connect(path)
+    dump = {
+        table: conn.execute(f'SELECT * FROM {table} ORDER BY 1').fetchall()
+        for table in ('ACCOUNTSTABLE', 'TRANSACTIONSTABLE', 'LABELSTABLE')
+    }
+    conn.close()
+    return dump
+
+
+async def test_archive_and_unarchive(bluecoins_db: Path) -> None:
+    before = _dump(bluecoins_db)
+
+    async with aiosqlite.connect(bluecoins_db) as conn:
+        account_id = await find_account(conn, 'Checking')
+        assert account_id == 1
+        assert await archived_accounts(conn) == []
+
+        result = await archive_account(conn, account_id)
+        assert (result.transactions, result.labels) == (823, 336)
+        assert await find_account(conn, 'Checking') is None
+        assert await find_account(conn, 'Checking', archived=True) == 1
+        assert await archived_accounts(conn) == [(1, 'Checking')]
+
+        async with conn.execute('SELECT COUNT(*) FROM TRANSACTIONSTABLE WHERE accountID = 1') as cur:
+            assert await cur.fetchone() == (0,)
+        async with conn.execute('SELECT COUNT(*) FROM CLUE_TRANSACTIONSTABLE') as cur:
+            assert await cur.fetchone() == (823,)
+
+        with pytest.raises(Exception, match='does not exist'):
+            await archive_account(conn, account_id)
+
+        result = await unarchive_account(conn, account_id)
+        assert (result.transactions, result.labels) == (823, 336)
+        assert await archived_accounts(conn) == []
+
+    assert _dump(bluecoins_db) == before
+
+
+async def test_unarchive_taken_id(bluecoins_db: Path) -> None:
+    async with aiosqlite.connect(bluecoins_db) as conn:
+        await archive_account(conn, 2)
+        await conn.execute("INSERT INTO ACCOUNTSTABLE (accountsTableID, accountName) VALUES (2, 'New')")
+        await conn.commit()
+
+        with pytest.raises(Exception, match='taken by `New`'):
+            await unarchive_account(conn, 2)
+        with pytest.raises(Exception, match='not archived'):
+            await unarchive_account(conn, 3)
+        assert await archived_accounts(conn) == [(2, 'Savings')]
+
+
+async def test_archive_large_account(bluecoins_db: Path) -> None:
+    conn = sqlite3.connect(bluecoins_db)
+    conn.execute(
+        """INSERT INTO TRANSACTIONSTABLE (itemID, amount, transactionCurrency, conversionRateNew, date,
+            transactionTypeID, categoryID, accountID, notes, status, accountReference, accountPairID,
+            uidPairID, deletedTransaction)
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 50000)
+        SELECT 1, i * 1000000, 'USD', 1, '2020-01-01 00:00:00', 3, 1, 3, '', 0, 1, 3, i, 6 FROM n"""
+    )
+    conn.commit()
+    conn.close()
+
+    async with aiosqlite.connect(bluecoins_db) as aconn:
+        small: list[str] = []
+        await aconn.set_trace_callback(small.append)
+        await archive_account(aconn, 2)
+        large: list[str] = []
+        await aconn.set_trace_callback(large.append)
+        result = await archive_account(aconn, 3)
+
+    assert result.transactions == 50526
+    # NOTE: Rows are moved set-wise, so the number of statements doesn't depend on the size of the account
+    assert len(large) == len(small)
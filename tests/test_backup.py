@@ -0,0 +1,102 @@
+import gzip
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from cluecoins import backup
+from cluecoins.backup import Snapshot
+from cluecoins.backup import available_compressions
+from cluecoins.backup import create_snapshot
+from cluecoins.backup import list_snapshots
+from cluecoins.backup import restore_snapshot
+from cluecoins.backup import source_name
+
+
+def _count(path: Path) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM TRANSACTIONSTABLE').fetchone()[0]
+    finally:
+        conn.close()
+
+
+async def test_create_snapshot(bluecoins_db: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(backup, 'BACKUP_PAGES', 16)
+    steps: list[tuple[int, int]] = []
+
+    snapshot = await create_snapshot(bluecoins_db, compression='gzip', progress=lambda *a: steps.append(a))
+
+    assert snapshot.name == source_name(bluecoins_db)
+    assert snapshot.name.startswith('bluecoins-')
+    assert snapshot.path.suffixes == ['.fydb', '.gz']
+    assert snapshot.size < bluecoins_db.stat().st_size
+    assert Snapshot.from_path(snapshot.path) == snapshot
+    assert list(snapshot.path.parent.iterdir()) == [snapshot.path]
+
+    # NOTE: Copied in steps, not at once
+    assert len(steps) > 1
+    assert steps[-1][0] == steps[-1][1]
+
+    restored = tmp_path / 'restored.fydb'
+    with gzip.open(snapshot.path) as f:
+        restored.write_bytes(f.read())
+    assert _count(restored) == _count(bluecoins_db) == 2825
+
+
+async def test_retention(bluecoins_db: Path) -> None:
+    for _ in range(4):
+        await create_snapshot(bluecoins_db, 'convert', 'gzip', keep=2)
+
+    snapshots = list_snapshots(source_name(bluecoins_db))
+    assert len(snapshots) == 2
+    assert snapshots[0].created > snapshots[1].created
+    assert list_snapshots('other') == []
+
+
+async def test_same_file_name(bluecoins_db: Path, tmp_path: Path) -> None:
+    """Databases with the same file name in different directories keep their own snapshots."""
+    other = tmp_path / 'other #1?' / bluecoins_db.name
+    other.parent.mkdir()
+    other.write_bytes(bluecoins_db.read_bytes())
+
+    await create_snapshot(bluecoins_db, compression='gzip', keep=1)
+    await create_snapshot(other, compression='gzip', keep=1)
+
+    assert source_name(other) != source_name(bluecoins_db)
+    assert len(list_snapshots(source_name(bluecoins_db))) == 1
+    assert len(list_snapshots(source_name(other))) == 1
+
+
+async def test_restore_snapshot(bluecoins_db: Path) -> None:
+    snapshot = await create_snapshot(bluecoins_db, compression='gzip')
+
+    conn = sqlite3.connect(bluecoins_db)
+    conn.execute('DELETE FROM TRANSACTIONSTABLE')
+    conn.commit()
+    conn.close()
+
+    previous = await restore_snapshot(snapshot, bluecoins_db)
+
+    assert _count(bluecoins_db) == 2825
+    assert previous is not None
+    assert previous.reason == 'restore'
+    assert len(list_snapshots(source_name(bluecoins_db))) == 2
+
+
+async def test_restore_corrupted(bluecoins_db: Path) -> None:
+    snapshot = await create_snapshot(bluecoins_db, compression='gzip')
+    with gzip.open(snapshot.path, 'wb') as f:
+        f.write(b'SQLite format 3\x00' + b'\xff' * 4096)
+
+    with pytest.raises(sqlite3.DatabaseError):
+        await restore_snapshot(snapshot, bluecoins_db)
+    assert _count(bluecoins_db) == 2825
+
+
+@pytest.mark.skipif('zstd' not in available_compressions(), reason='zstd is not available')
+async def test_zstd(bluecoins_db: Path) -> None:
+    snapshot = await create_snapshot(bluecoins_db, compression='zstd')
+    assert snapshot.path.suffix == '.zst'
+    await restore_snapshot(snapshot, bluecoins_db)
+    assert _count(bluecoins_db) == 2825
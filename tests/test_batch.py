@@ -0,0 +1,270 @@
+import csv
+import json
+import logging
+import shutil
+import sqlite3
+import subprocess
+import sys
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+import cluecoins.storage
+from cluecoins.backup import list_snapshots
+from cluecoins.backup import source_name
+from cluecoins.batch import EXIT_FAILED
+from cluecoins.batch import EXIT_OK
+from cluecoins.batch import EXIT_USAGE
+from cluecoins.batch import main
+from cluecoins.quotes import CurrencyBeaconQuoteProvider
+
+
+def _run(capsys: pytest.CaptureFixture[str], *argv: str) -> tuple[int, dict]:
+    code = main(['--json', *argv])
+    return code, json.loads(capsys.readouterr().out)
+
+
+def test_stats(bluecoins_db: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    code, document = _run(capsys, 'stats', str(bluecoins_db))
+
+    assert code == EXIT_OK
+    assert document['ok'] is True
+    data = document['results'][0]['data']
+    assert data['tables']['TRANSACTIONSTABLE'] == 2825
+    assert data['page_size'] > 0
+
+
+def test_verify(bluecoins_db: Path, fydb_with_tables: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    code, document = _run(capsys, '--jobs', '2', 'verify', str(bluecoins_db), str(fydb_with_tables))
+
+    assert code == EXIT_FAILED
+    good, bad = document['results']
+    assert good['ok'] is True
+    assert bad['ok'] is False
+    assert 'missing table `TRANSACTIONSTABLE`' in bad['error']
+
+
+def test_missing_file(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    code, document = _run(capsys, 'stats', str(tmp_path / 'missing.fydb'))
+
+    assert code == EXIT_FAILED
+    assert document['results'][0]['error'] == 'no such file'
+
+
+def test_usage_error(capsys: pytest.CaptureFixture[str]) -> None:
+    assert main(['frobnicate']) == EXIT_USAGE
+
+
+@pytest.mark.parametrize('format_', ['csv', 'jsonl'])
+def test_export(bluecoins_db: Path, tmp_path: Path, capsys: pytest.CaptureFixture[str], format_: str) -> None:
+    output = tmp_path / 'out'
+    code, document = _run(capsys, 'export', '--format', format_, '--output', str(output), str(bluecoins_db))
+
+    assert code == EXIT_OK
+    data = document['results'][0]['data']
+    assert data['rows'] == 2825
+    lines = (output / f'bluecoins.{format_}').read_text().splitlines()
+    if format_ == 'csv':
+        assert lines[0].startswith('transactionsTableID,date,amount')
+        assert len(lines) == 2826
+    else:
+        assert len(lines) == 2825
+        dates = [json.loads(line)['date'] for line in lines]
+        assert dates == sorted(dates)
+
+
+def test_convert(bluecoins_db: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]) -> None:
+    async def get_rate(self, date_: date, base_currency: str, quote_currency: str) -> Decimal:
+        return Decimal('2')
+
+    monkeypatch.setattr(CurrencyBeaconQuoteProvider, 'get_rate', get_rate)
+    code, document = _run(capsys, 'convert', '--base', 'EUR', str(bluecoins_db))
+
+    assert code == EXIT_OK
+    assert document['results'][0]['data'] == {'transactions': 2479, 'accounts': 10}
+    conn = sqlite3.connect(bluecoins_db)
+    assert conn.execute('SELECT defaultSettings FROM SETTINGSTABLE WHERE settingsTableID = 1').fetchone() == ('EUR',)
+    conn.close()
+
+
+def test_no_textual() -> None:
+    code = 'import sys, cluecoins.batch; sys.exit("textual" in sys.modules)'
+    assert subprocess.run([sys.executable, '-c', code], check=False).returncode == 0
+
+
+def _cache_quotes(db_path: Path, base_currency: str, quote_currency: str, rate: str) -> None:
+    """Put a quote for every day `convert` needs into the default quote cache, so nothing is fetched"""
+    days = {
+        row[0] for row in sqlite3.connect(db_path).execute('SELECT DISTINCT substr(date, 1, 10) FROM TRANSACTIONSTABLE')
+    }
+    days.add(date.today().isoformat())
+    cache_path = cluecoins.storage.DEFAULT_CACHE_PATH
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(cache_path)
+    conn.execute(
+        'CREATE TABLE quotes (date date, base_currency text, quote_currency text, rate text, PRIMARY KEY (date, base_currency, quote_currency))'
+    )
+    conn.executemany('INSERT INTO quotes VALUES (?, ?, ?, ?)', [(d, base_currency, quote_currency, rate) for d in days])
+    conn.commit()
+    conn.close()
+
+
+def test_convert_many(
+    bluecoins_db: Path, tmp_path: Path, capsys: pytest.CaptureFixture[str], caplog: pytest.LogCaptureFixture
+) -> None:
+    caplog.set_level(logging.INFO, 'cluecoins.batch')
+    _cache_quotes(bluecoins_db, 'EUR', 'USD', '1.25')
+    copy = tmp_path / 'copy.fydb'
+    shutil.copy(bluecoins_db, copy)
+
+    code, document = _run(capsys, '--jobs', '2', 'convert', '--base', 'EUR', str(bluecoins_db), str(copy))
+
+    assert code == EXIT_OK
+    assert document['totals'] == {'files': 2, 'failed': 0, 'transactions': 2 * 2479, 'accounts': 2 * 10}
+    conn = sqlite3.connect(copy)
+    assert conn.execute(
+        'SELECT DISTINCT conversionRateNew FROM TRANSACTIONSTABLE WHERE transactionTypeID = 3'
+    ).fetchall() == [(1.25,)]
+    conn.close()
+    # NOTE: Logged in the worker processes and passed on by the parent
+    assert any(m.startswith('copy.fydb: transaction `') for m in caplog.messages)
+    assert 'copy.fydb: Done!' in caplog.messages
+
+
+def test_cleanup_preview(bluecoins_db: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    code, document = _run(capsys, 'cleanup', '--rule', 'empty_transactions', str(bluecoins_db))
+
+    assert code == EXIT_OK
+    assert document['results'][0]['data'] == {'empty_transactions': 7}
+    conn = sqlite3.connect(bluecoins_db)
+    assert conn.execute('SELECT COUNT(*) FROM TRANSACTIONSTABLE').fetchone() == (2825,)
+    conn.close()
+
+
+def test_read_only_commands(
+    bluecoins_db: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    def connect_db(*args: object) -> None:
+        raise AssertionError('opened read-write')
+
+    monkeypatch.setattr('cluecoins.batch.connect_db', connect_db)
+    for command in ('verify', 'cleanup'):
+        code, document = _run(capsys, command, str(bluecoins_db))
+        assert code == EXIT_OK, document
+
+
+def test_archive_and_unarchive(bluecoins_db: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    code, document = _run(capsys, 'archive', '--account', 'Wallet', str(bluecoins_db))
+    assert code == EXIT_OK
+    assert document['results'][0]['data'] == {'account_id': 3, 'transactions': 526, 'labels': 318}
+    assert len(list_snapshots(source_name(bluecoins_db))) == 1
+
+    code, document = _run(capsys, 'archive', '--account', 'Wallet', str(bluecoins_db))
+    assert code == EXIT_FAILED
+    assert document['results'][0]['error'] == 'Account Wallet does not exist'
+
+    code, document = _run(capsys, 'unarchive', '--account', 'Wallet', '--no-backup', str(bluecoins_db))
+    assert code == EXIT_OK
+    assert document['results'][0]['data']['transactions'] == 526
+    conn = sqlite3.connect(bluecoins_db)
+    assert conn.execute('SELECT COUNT(*) FROM TRANSACTIONSTABLE').fetchone() == (2825,)
+    conn.close()
+
+
+def test_networth(bluecoins_db: Path, tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    code, document = _run(capsys, 'networth', '--bucket', 'year', '--output', str(tmp_path), str(bluecoins_db))
+    assert code == EXIT_OK
+    data = document['results'][0]['data']
+    assert data['base_currency'] == 'USD'
+    assert (data['first'], data['last']) == ('2020-12-31', '2049-08-06')
+    assert data['net_worth'] == '204872'
+
+    with Path(data['output']).open() as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['date', 'net_worth_USD']
+    assert len(rows) == data['points'] + 1 == 31
+
+
+def test_backup_and_restore(bluecoins_db: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    code, document = _run(capsys, 'backup', '--compression', 'gzip', str(bluecoins_db))
+    assert code == EXIT_OK
+    snapshot = document['results'][0]['data']['snapshot']
+    assert snapshot.endswith('-manual.fydb.gz')
+
+    code, document = _run(capsys, 'cleanup', '--apply', str(bluecoins_db))
+    assert code == EXIT_OK
+    assert document['results'][0]['data']['empty_transactions'] == 7
+
+    code, document = _run(capsys, 'restore', '--snapshot', snapshot, str(bluecoins_db))
+    assert code == EXIT_OK
+    assert document['results'][0]['data']['previous'].endswith('-restore.fydb.gz')
+
+    code, document = _run(capsys, 'cleanup', str(bluecoins_db))
+    assert document['results'][0]['data']['empty_transactions'] == 7
+
+
+def test_restore_latest(bluecoins_db: Path, tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    """Without `--snapshot` the newest snapshot of the same database is restored, not of another one."""
+    other = tmp_path / 'other' / bluecoins_db.name
+    other.parent.mkdir()
+    other.write_bytes(bluecoins_db.read_bytes())
+
+    _, document = _run(capsys, 'backup', '--compression', 'gzip', str(bluecoins_db))
+    snapshot = document['results'][0]['data']['snapshot']
+    _run(capsys, 'backup', '--compression', 'gzip', '--keep', '1', str(other))
+
+    code, document = _run(capsys, 'restore', str(bluecoins_db))
+    assert code == EXIT_OK
+    assert document['results'][0]['data']['snapshot'] == snapshot
+    assert len(list_snapshots(source_name(bluecoins_db))) == 2
+
+
+def test_dedup_backup(bluecoins_db: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    code, document = _run(capsys, 'backup', '--dedup', '--keep', '1', str(bluecoins_db))
+    assert code == EXIT_OK
+    first = document['results'][0]['data']
+    assert 0 < first['new_pages'] <= first['pages']
+
+    _run(capsys, 'cleanup', '--apply', '--no-backup', str(bluecoins_db))
+    code, document = _run(capsys, 'backup', '--dedup', '--keep', '1', str(bluecoins_db))
+    second = document['results'][0]['data']
+    assert 0 < second['new_pages'] < first['pages']
+    assert second['freed_pages'] > 0
+
+    code, document = _run(capsys, 'restore', '--stored', str(first['stored']), str(bluecoins_db))
+    assert code == EXIT_FAILED
+    assert 'does not exist' in document['results'][0]['error']
+
+    code, document = _run(capsys, 'restore', '--stored', str(second['stored']), str(bluecoins_db))
+    assert code == EXIT_OK
+
+
+def test_diff(bluecoins_db: Path, tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    code, document = _run(capsys, 'diff', str(bluecoins_db))
+    assert code == EXIT_FAILED
+
+    _run(capsys, 'cleanup', '--apply', '--rule', 'empty_transactions', str(bluecoins_db))
+    code, document = _run(capsys, 'diff', '--limit', '2', '--output', str(tmp_path), str(bluecoins_db))
+    assert code == EXIT_OK
+    data = document['results'][0]['data']
+    assert data['deleted'] == 7
+    assert data['inserted'] == data['updated'] == 0
+    assert list(data['tables']) == ['TRANSACTIONSTABLE']
+    assert len(data['changes']) == 2
+    assert len((tmp_path / 'bluecoins.diff.jsonl').read_text().splitlines()) == 7
+
+
+def test_schema_mismatch(bluecoins_db: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    conn = sqlite3.connect(bluecoins_db)
+    conn.execute('PRAGMA user_version = 41')
+    conn.close()
+
+    code, document = _run(capsys, 'verify', str(bluecoins_db))
+    assert code == EXIT_FAILED
+    assert document['results'][0]['data']['schema']['user_version'] == [41, 42]
+
+    code, document = _run(capsys, 'cleanup', '--apply', str(bluecoins_db))
+    assert code == EXIT_FAILED
+    assert document['results'][0]['error'].startswith('unsupported database schema')
@@ -0,0 +1,37 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPT = Path(__file__).parent.parent / 'benchmarks' / 'bench.py'
+
+
+def test_bench(tmp_path: Path) -> None:
+    def run(*args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [sys.executable, str(SCRIPT), '--sizes', '1500', '--repeat', '1', '--data-dir', str(tmp_path), *args],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+
+    baseline = tmp_path / 'baseline.json'
+    result = run('--json', '--baseline', str(baseline), '--save-baseline')
+    assert result.returncode == 0, result.stderr
+    results = {r['name']: r for r in json.loads(result.stdout)['results']}
+
+    assert results['1500/iter_transactions']['rate'] > 0
+    assert '1500/transactions_page/amount/last_keyset' in results
+    assert '1500/convert/cold' in results
+    assert '1500/networth/day' in results
+    assert '1500/ui/transactions_next_page' in results
+    assert results.keys() == {r['name'] for r in json.loads(baseline.read_text())['results']}
+
+    # NOTE: Every benchmark 1000 times faster in the baseline is a regression
+    document = json.loads(baseline.read_text())
+    for r in document['results']:
+        r['ms'] /= 1000
+    baseline.write_text(json.dumps(document))
+    result = run('--baseline', str(baseline))
+    assert result.returncode == 1
+    assert 'REGRESSION' in result.stdout
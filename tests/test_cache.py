@@ -48,9 +48,7 @@ async def test_get_rate_cached(local_storage: LocalStorage, provider: CurrencyBe
 
 async def test_get_rate_fetches_when_missing(provider: CurrencyBeaconQuoteProvider) -> None:
     d = date(2024, 1, 15)
-    with patch(
-        'cluecoins.quotes.aiohttp.ClientSession', return_value=_mock_session(_make_timeseries_response(d, 'EUR', 0.92))
-    ):
+    with patch('aiohttp.ClientSession', return_value=_mock_session(_make_timeseries_response(d, 'EUR', 0.92))):
         rate = await provider.get_rate(d, 'USD', 'EUR')
 
     assert rate == Decimal('0.92')
@@ -59,7 +57,7 @@ async def test_get_rate_fetches_when_missing(provider: CurrencyBeaconQuoteProvid
 async def test_get_rate_unknown_currency_returns_none(provider: CurrencyBeaconQuoteProvider) -> None:
     d = date(2024, 1, 15)
     response_data: dict = {'response': {d.strftime('%Y-%m-%d'): {}}}
-    with patch('cluecoins.quotes.aiohttp.ClientSession', return_value=_mock_session(response_data)):
+    with patch('aiohttp.ClientSession', return_value=_mock_session(response_data)):
         rate = await provider.get_rate(d, 'USD', 'ZZZ')
 
     assert rate is None
@@ -71,7 +69,7 @@ async def test_fetch_quotes_skips_none_rates(
     d = date(2024, 1, 15)
     response_data = {'response': {d.strftime('%Y-%m-%d'): {'EUR': None, 'GBP': 0.79}}}
     provider._quote_currencies = {'EUR', 'GBP'}
-    with patch('cluecoins.quotes.aiohttp.ClientSession', return_value=_mock_session(response_data)):
+    with patch('aiohttp.ClientSession', return_value=_mock_session(response_data)):
         await provider._fetch_quotes(d, 'USD')
 
     assert await local_storage.get_quote(d, 'USD', 'EUR') is None
@@ -86,9 +84,7 @@ async def test_fetch_quotes_duplicate_ignored(
     await local_storage.commit()
 
     provider._quote_currencies = {'EUR'}
-    with patch(
-        'cluecoins.quotes.aiohttp.ClientSession', return_value=_mock_session(_make_timeseries_response(d, 'EUR', 0.92))
-    ):
+    with patch('aiohttp.ClientSession', return_value=_mock_session(_make_timeseries_response(d, 'EUR', 0.92))):
         await provider._fetch_quotes(d, 'USD')
 
     # Original value preserved (IntegrityError on duplicate silently ignored)
@@ -0,0 +1,53 @@
+import sqlite3
+from pathlib import Path
+
+import aiosqlite
+
+from cluecoins.cleanup import CLEANUP_RULES
+from cluecoins.cleanup import cleanup
+from cluecoins.cleanup import count_candidates
+from cluecoins.cleanup import iter_candidates
+
+
+def _prepare(path: Path) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO LABELSTABLE (labelName, transactionIDLabels) VALUES ('Lost', 123456789)")
+    conn.execute("INSERT INTO ITEMTABLE (itemTableID, itemName, itemAutoFillVisibility) VALUES (9001, 'Nobody', 0)")
+    conn.commit()
+    conn.close()
+
+
+async def _counts(conn: aiosqlite.Connection) -> dict[str, int]:
+    return {name: await count_candidates(conn, rule) for name, rule in CLEANUP_RULES.items()}
+
+
+async def test_preview(bluecoins_db: Path) -> None:
+    _prepare(bluecoins_db)
+
+    async with aiosqlite.connect(bluecoins_db) as conn:
+        assert await _counts(conn) == {'empty_transactions': 7, 'orphan_labels': 1, 'unused_items': 1}
+
+        chunks = [rows async for rows in iter_candidates(conn, CLEANUP_RULES['empty_transactions'], chunk_size=3)]
+        assert [len(rows) for rows in chunks] == [3, 3, 1]
+        assert [row async for row in iter_candidates(conn, CLEANUP_RULES['unused_items'])] == [[(9001, 'Nobody')]]
+
+
+async def test_cleanup(bluecoins_db: Path) -> None:
+    _prepare(bluecoins_db)
+    conn = sqlite3.connect(bluecoins_db)
+    definitions = conn.execute('SELECT COUNT(*) FROM LABELSTABLE WHERE transactionIDLabels IS NULL').fetchone()[0]
+    conn.close()
+
+    async with aiosqlite.connect(bluecoins_db) as aconn:
+        deleted = await cleanup(aconn)
+        assert deleted['empty_transactions'] == 7
+        assert deleted['orphan_labels'] >= 1
+        assert deleted['unused_items'] >= 1
+        assert await _counts(aconn) == {'empty_transactions': 0, 'orphan_labels': 0, 'unused_items': 0}
+
+    conn = sqlite3.connect(bluecoins_db)
+    assert (
+        conn.execute('SELECT COUNT(*) FROM LABELSTABLE WHERE transactionIDLabels IS NULL').fetchone()[0] == definitions
+    )
+    assert conn.execute('SELECT COUNT(*) FROM ITEMTABLE WHERE itemTableID < 5').fetchone()[0] == 5
+    conn.close()
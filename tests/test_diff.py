@@ -0,0 +1,90 @@
+import shutil
+import sqlite3
+from pathlib import Path
+
+from cluecoins.diff import DatabaseDiff
+
+
+def _modify(path: Path) -> None:
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        UPDATE ITEMTABLE SET itemName = 'Renamed' WHERE itemTableID = 5;
+        DELETE FROM TRANSACTIONSTABLE WHERE transactionsTableID = (SELECT MIN(transactionsTableID) FROM TRANSACTIONSTABLE WHERE transactionTypeID = 3);
+        INSERT INTO LABELSTABLE (labelName, transactionIDLabels) VALUES ('new label', NULL);
+        INSERT INTO android_metadata VALUES ('de_DE');
+        """
+    )
+    conn.close()
+
+
+def test_diff(bluecoins_db: Path, tmp_path: Path) -> None:
+    new = tmp_path / 'new.fydb'
+    shutil.copy(bluecoins_db, new)
+    _modify(new)
+
+    with DatabaseDiff(bluecoins_db, new, chunk_rows=64) as diff:
+        changes = list(diff.changes())
+
+    kinds = {(c.table, c.kind) for c in changes}
+    assert kinds == {
+        ('ITEMTABLE', 'update'),
+        ('TRANSACTIONSTABLE', 'delete'),
+        ('LABELSTABLE', 'insert'),
+        ('android_metadata', 'insert'),
+    }
+    update = next(c for c in changes if c.kind == 'update')
+    assert update.key == (5,)
+    assert update.columns == ['itemName']
+    assert update.to_dict()['new'] == {'itemName': 'Renamed'}
+
+    transactions = diff.tables['TRANSACTIONSTABLE']
+    assert transactions.deleted == 1
+    assert transactions.partitions > 10
+    assert transactions.skipped == transactions.partitions - 1
+    assert not diff.tables['ACCOUNTSTABLE'].changed
+
+
+def test_diff_identical(bluecoins_db: Path) -> None:
+    with DatabaseDiff(bluecoins_db, bluecoins_db) as diff:
+        assert list(diff.changes()) == []
+    assert all(t.skipped == t.partitions for t in diff.tables.values())
+
+
+def test_diff_text_key(tmp_path: Path) -> None:
+    old, new = tmp_path / 'old.db', tmp_path / 'new.db'
+    for path, rows in ((old, [('a', 1), ('b', 2), ('c', 3)]), (new, [('a', 1), ('b', 20), ('d', 4)])):
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE T (k TEXT PRIMARY KEY, v) WITHOUT ROWID')
+        conn.executemany('INSERT INTO T VALUES (?, ?)', rows)
+        if path == new:
+            conn.execute('CREATE TABLE ONLY_NEW (id INTEGER PRIMARY KEY)')
+        conn.commit()
+        conn.close()
+
+    with DatabaseDiff(old, new, chunk_rows=1) as diff:
+        changes = {(c.kind, c.key) for c in diff.changes()}
+    assert changes == {('update', ('b',)), ('delete', ('c',)), ('insert', ('d',))}
+    assert diff.tables['ONLY_NEW'].partitions == 0
+
+
+def test_diff_wide_table(tmp_path: Path) -> None:
+    """Rows wider than the argument limit of SQL functions, in files with URI characters in their names."""
+    old, new = tmp_path / 'old %1.db', tmp_path / 'new #2?.db'
+    columns = [f'c{i}' for i in range(150)]
+    conn = sqlite3.connect(old)
+    conn.execute(f'CREATE TABLE wide (id INTEGER PRIMARY KEY, {", ".join(columns)})')
+    conn.executemany('INSERT INTO wide (id, c149) VALUES (?, ?)', [(i, 0.1) for i in range(10)])
+    conn.commit()
+    conn.close()
+    shutil.copy(old, new)
+    conn = sqlite3.connect(new)
+    conn.execute('UPDATE wide SET c149 = 0.1 + 1e-16 * 2 WHERE id = 3')
+    conn.execute("UPDATE wide SET c0 = '' WHERE id = 5")
+    conn.commit()
+    conn.close()
+
+    with DatabaseDiff(old, new) as diff:
+        changes = list(diff.changes())
+
+    assert [(c.kind, c.key, c.columns) for c in changes] == [('update', (3,), ['c149']), ('update', (5,), ['c0'])]
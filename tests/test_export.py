@@ -0,0 +1,76 @@
+import csv
+import json
+import sys
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+import aiosqlite
+import pytest
+
+from cluecoins.export import EXPORT_COLUMNS
+from cluecoins.export import export_transactions
+from cluecoins.export import iter_export_rows
+from cluecoins.filters import TransactionFilter
+
+
+async def test_iter_export_rows(bluecoins_db: Path) -> None:
+    async with aiosqlite.connect(bluecoins_db) as conn:
+        chunks = [rows async for rows in iter_export_rows(conn, chunk_size=1000)]
+
+    assert [len(rows) for rows in chunks] == [1000, 1000, 825]
+    rows = [row for rows in chunks for row in rows]
+    assert all(len(row) == len(EXPORT_COLUMNS) for row in rows)
+    assert sum(row[2] for row in rows) == Decimal(204872)
+    assert [row[1] for row in rows] == sorted(row[1] for row in rows)
+
+    labeled = next(row for row in rows if row[0] == 21237)
+    assert labeled[2] == Decimal(-36)
+    assert labeled[-1] == 'Home Improvement'
+    assert labeled[EXPORT_COLUMNS.index('accountName')] is not None
+
+
+async def test_export_csv_with_filter(bluecoins_db: Path, tmp_path: Path) -> None:
+    output = tmp_path / 'out.csv'
+    filter_ = TransactionFilter(date_from=date(2020, 11, 16), date_to=date(2020, 11, 17))
+    async with aiosqlite.connect(bluecoins_db) as conn:
+        written = await export_transactions(conn, output, 'csv', filter_)
+
+    with output.open() as f:
+        rows = list(csv.DictReader(f))
+    assert written == len(rows) > 0
+    assert all(row['date'].startswith(('2020-11-16', '2020-11-17')) for row in rows)
+    assert next(row for row in rows if row['transactionsTableID'] == '21237')['amount'] == '-36'
+
+
+async def test_export_jsonl(bluecoins_db: Path, tmp_path: Path) -> None:
+    output = tmp_path / 'out.jsonl'
+    async with aiosqlite.connect(bluecoins_db) as conn:
+        assert await export_transactions(conn, output, 'jsonl', chunk_size=100) == 2825
+
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sum(Decimal(row['amount']) for row in rows) == Decimal(204872)
+    assert list(rows[0]) == list(EXPORT_COLUMNS)
+    assert isinstance(rows[0]['amount'], str)
+
+
+async def test_export_parquet(bluecoins_db: Path, tmp_path: Path) -> None:
+    pq = pytest.importorskip('pyarrow.parquet')
+
+    output = tmp_path / 'out.parquet'
+    async with aiosqlite.connect(bluecoins_db) as conn:
+        assert await export_transactions(conn, output, 'parquet', chunk_size=1000) == 2825
+
+    file = pq.ParquetFile(output)
+    assert file.metadata.num_rows == 2825
+    assert file.metadata.num_row_groups == 3
+    assert sum(file.read(columns=['amount']).column('amount').to_pylist()) == Decimal(204872)
+
+
+async def test_export_parquet_without_pyarrow(
+    bluecoins_db: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+    async with aiosqlite.connect(bluecoins_db) as conn:
+        with pytest.raises(Exception, match='requires the `pyarrow` package'):
+            await export_transactions(conn, tmp_path / 'out.parquet', 'parquet')
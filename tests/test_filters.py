@@ -0,0 +1,88 @@
+import sqlite3
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+import aiosqlite
+import pytest
+
+from cluecoins.database import _TRANSACTION_COLS
+from cluecoins.database import count_transactions
+from cluecoins.database import explain_transactions_page
+from cluecoins.database import fetch_transactions_page
+from cluecoins.database import transactions_page_cursor
+from cluecoins.filters import TransactionFilter
+
+
+def test_parse() -> None:
+    filter_ = TransactionFilter.parse(
+        'from:2021-01-01 to:2021-01-31 account:Checking category:3 currency:eur amount:-10.5..'
+    )
+    assert filter_ == TransactionFilter(
+        date_from=date(2021, 1, 1),
+        date_to=date(2021, 1, 31),
+        account='Checking',
+        category=3,
+        currency='EUR',
+        amount_min=Decimal('-10.5'),
+    )
+    assert TransactionFilter.parse('').is_empty()
+
+
+@pytest.mark.parametrize('text', ['foo', 'color:red', 'from:yesterday', 'amount:a..b', 'type:'])
+def test_parse_invalid(text: str) -> None:
+    with pytest.raises(ValueError):
+        TransactionFilter.parse(text)
+
+
+def test_compile() -> None:
+    where, params = TransactionFilter(date_from=date(2021, 1, 1), date_to=date(2021, 1, 31), label='Trip').compile()
+    assert where == (
+        'WHERE t.date >= ? AND t.date < ? AND '
+        't.transactionsTableID IN (SELECT transactionIDLabels FROM LABELSTABLE WHERE labelName = ?)'
+    )
+    assert params == ['2021-01-01', '2021-02-01', 'Trip']
+    assert TransactionFilter().compile() == ('', [])
+
+
+async def test_filter_matches_python_side(bluecoins_db: Path) -> None:
+    filter_ = TransactionFilter(date_from=date(2021, 1, 1), date_to=date(2021, 3, 31), account=1, amount_max=Decimal(0))
+
+    conn_ = sqlite3.connect(bluecoins_db)
+    expected = {
+        id_
+        for id_, date_, account_id, amount in conn_.execute(
+            'SELECT transactionsTableID, date, accountID, amount FROM TRANSACTIONSTABLE'
+        )
+        if '2021-01-01' <= date_[:10] <= '2021-03-31' and account_id == 1 and amount <= 0
+    }
+    conn_.close()
+    assert expected
+
+    async with aiosqlite.connect(bluecoins_db) as conn:
+        _, rows = await fetch_transactions_page(conn, limit=10000, filter_=filter_)
+        assert {row[0] for row in rows} == expected
+        assert await count_transactions(conn, filter_) == len(expected)
+
+        plan = await explain_transactions_page(conn, filter_=filter_)
+        assert any('USING INDEX transactionsTable1 (accountID=?)' in step for step in plan)
+
+
+@pytest.mark.parametrize('sort_asc', [True, False])
+@pytest.mark.parametrize('sort_col', _TRANSACTION_COLS)
+async def test_keyset_paging_matches_offset(bluecoins_db: Path, sort_col: str, sort_asc: bool) -> None:
+    limit = 250
+    async with aiosqlite.connect(bluecoins_db) as conn:
+        total = await count_transactions(conn)
+        _, expected = await fetch_transactions_page(conn, 0, total, sort_col, sort_asc)
+
+        pages: list = []
+        after = None
+        while True:
+            _, rows = await fetch_transactions_page(conn, 0, limit, sort_col, sort_asc, after=after)
+            pages.extend(rows)
+            if len(rows) < limit:
+                break
+            after = transactions_page_cursor(rows[-1], sort_col)
+
+    assert [row[0] for row in pages] == [row[0] for row in expected]
@@ -0,0 +1,52 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from cluecoins.header import read_header
+
+
+def test_read_header(bluecoins_db: Path) -> None:
+    conn = sqlite3.connect(bluecoins_db)
+    page_size, page_count, user_version, schema_version = (
+        conn.execute(f'PRAGMA {pragma}').fetchone()[0]
+        for pragma in ('page_size', 'page_count', 'user_version', 'schema_version')
+    )
+    conn.close()
+
+    header = read_header(bluecoins_db)
+    assert header is not None
+    assert header.page_size == page_size
+    assert header.page_count == page_count
+    assert header.user_version == user_version
+    assert header.schema_cookie == schema_version
+    assert header.encoding == 'UTF-8'
+    assert header.sqlite_version == sqlite3.sqlite_version
+    assert not header.is_wal
+
+
+def test_read_header_empty_file(fydb_file: Path) -> None:
+    assert read_header(fydb_file) is None
+
+
+def test_read_header_not_sqlite(tmp_path: Path) -> None:
+    path = tmp_path / 'garbage.fydb'
+    path.write_bytes(b'x' * 200)
+    with pytest.raises(ValueError):
+        read_header(path)
+
+
+def test_fingerprint_changes_on_write(fydb_with_tables: Path) -> None:
+    before = read_header(fydb_with_tables)
+    assert before is not None
+    assert read_header(fydb_with_tables) == before
+
+    conn = sqlite3.connect(fydb_with_tables)
+    conn.execute("UPDATE TESTTABLE SET name = 'bar'")
+    conn.commit()
+    conn.close()
+
+    after = read_header(fydb_with_tables)
+    assert after is not None
+    assert after.change_counter == before.change_counter + 1
+    assert after.fingerprint != before.fingerprint
@@ -0,0 +1,21 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPT = Path(__file__).parent.parent / 'benchmarks' / 'importtime.py'
+
+
+def test_import_time_budget() -> None:
+    result = subprocess.run(
+        [sys.executable, str(SCRIPT), '--json', '--repeat', '3'],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    results = {r['module']: r for r in json.loads(result.stdout)}
+
+    assert results['cluecoins.ui']['forbidden'] == []
+    assert results['cluecoins.cli']['forbidden'] == []
+    for r in results.values():
+        assert r['own_ms'] <= r['own_budget_ms'], r
@@ -0,0 +1,75 @@
+import sqlite3
+from pathlib import Path
+
+import aiosqlite
+import pytest
+
+from cluecoins.backup import list_snapshots
+from cluecoins.backup import restore_snapshot
+from cluecoins.backup import source_name
+from cluecoins.indexes import apply_with_timings
+from cluecoins.indexes import create_indexes
+from cluecoins.indexes import create_working_copy
+from cluecoins.indexes import existing_indexes
+from cluecoins.indexes import is_working_copy
+from cluecoins.indexes import propose_indexes
+from cluecoins.indexes import strip_indexes
+
+
+async def test_refuses_original_file(bluecoins_db: Path) -> None:
+    async with aiosqlite.connect(bluecoins_db) as conn:
+        with pytest.raises(Exception, match='not a working copy'):
+            await create_indexes(conn, bluecoins_db, ['cluecoins_transactions_date'])
+        assert not await existing_indexes(conn)
+
+
+async def test_working_copy_roundtrip(bluecoins_db: Path) -> None:
+    copy = await create_working_copy(bluecoins_db)
+    assert is_working_copy(copy)
+    assert not is_working_copy(bluecoins_db)
+
+    async with aiosqlite.connect(copy) as conn:
+        proposals = await propose_indexes(conn)
+        proposed = {p.query.index for p in proposals}
+        assert 'cluecoins_transactions_account_date' in proposed
+        assert 'cluecoins_transactions_date' in proposed
+
+        timings = await apply_with_timings(conn, copy, proposals)
+        assert {t.query.index for t in timings} == proposed
+        month = next(t for t in timings if t.query.name == 'one month of an account')
+        assert (
+            month.plan[0]
+            == 'SEARCH t USING INDEX cluecoins_transactions_account_date (accountID=? AND date>? AND date<?)'
+        )
+        assert not any('TEMP B-TREE' in step for step in month.plan)
+        assert await existing_indexes(conn) == proposed
+        assert not await propose_indexes(conn)
+
+        assert set(await strip_indexes(conn)) == proposed
+        assert not await existing_indexes(conn)
+
+    async with aiosqlite.connect(copy) as copy_conn, aiosqlite.connect(bluecoins_db) as orig_conn:
+        query = 'SELECT type, name, sql FROM sqlite_master ORDER BY name'
+        assert await (await copy_conn.execute(query)).fetchall() == await (await orig_conn.execute(query)).fetchall()
+
+
+async def test_working_copy_kept(bluecoins_db: Path, tmp_path: Path) -> None:
+    other = tmp_path / 'other' / bluecoins_db.name
+    other.parent.mkdir()
+    other.write_bytes(bluecoins_db.read_bytes())
+    copy = await create_working_copy(bluecoins_db)
+    assert await create_working_copy(other) != copy
+
+    async with aiosqlite.connect(copy) as conn:
+        await conn.execute("UPDATE ITEMTABLE SET itemName = 'Edited' WHERE itemTableID = 2")
+        await conn.commit()
+    messages: list[str] = []
+    assert await create_working_copy(bluecoins_db, messages.append) == copy
+
+    (snapshot,) = list_snapshots(source_name(copy))
+    assert messages == [f'previous working copy saved to `{snapshot.path}`']
+    restored = tmp_path / 'restored.fydb'
+    await restore_snapshot(snapshot, restored)
+    db = sqlite3.connect(restored)
+    assert db.execute('SELECT itemName FROM ITEMTABLE WHERE itemTableID = 2').fetchone() == ('Edited',)
+    db.close()
@@ -0,0 +1,71 @@
+import sqlite3
+from pathlib import Path
+
+import aiosqlite
+
+from cluecoins.items import Item
+from cluecoins.items import find_duplicate_items
+from cluecoins.items import group_duplicates
+from cluecoins.items import merge_items
+from cluecoins.items import normalize_item_name
+
+
+def test_normalize_item_name() -> None:
+    assert normalize_item_name('  Coffee\tShop ') == 'coffee shop'
+    assert normalize_item_name('STRASSE') == normalize_item_name('straße')
+
+
+def test_group_duplicates() -> None:
+    items = [
+        Item(2, 'Unnamed Expense', 10),
+        Item(10, 'unnamed  expense', 1),
+        Item(20, 'Coffee', 1),
+        Item(21, 'coffee ', 5),
+        Item(22, 'COFFEE', 0),
+        Item(30, 'Coffe', 1),
+        Item(40, 'Tea', 3),
+    ]
+
+    groups = group_duplicates(items)
+
+    assert [[i.id for i in g.items] for g in groups] == [[21, 20, 22], [2, 10]]
+    assert groups[0].name == 'coffee'
+
+    fuzzy = group_duplicates(items, fuzzy=True, threshold=0.8)
+    assert [[i.id for i in g.items] for g in fuzzy] == [[21, 20, 30, 22], [2, 10]]
+
+
+def test_group_duplicates_never_merges_system_items() -> None:
+    items = [Item(2, 'Transfer', 0), Item(1, 'Transfer', 0), Item(50, 'transfer', 100)]
+
+    (group,) = group_duplicates(items)
+
+    assert group.winner.id == 1
+    assert [i.id for i in group.losers] == [50]
+
+
+async def test_merge_items(bluecoins_db: Path) -> None:
+    conn = sqlite3.connect(bluecoins_db)
+    conn.executemany(
+        'INSERT INTO ITEMTABLE (itemTableID, itemName, itemAutoFillVisibility) VALUES (?, ?, 0)',
+        [(1001, 'amex '), (1002, 'AMEX')],
+    )
+    conn.execute(
+        'UPDATE TRANSACTIONSTABLE SET itemID = 1001 WHERE transactionsTableID IN (SELECT transactionsTableID FROM TRANSACTIONSTABLE LIMIT 3)'
+    )
+    conn.commit()
+    amex = conn.execute('SELECT COUNT(*) FROM TRANSACTIONSTABLE WHERE itemID IN (5, 1001, 1002)').fetchone()[0]
+    conn.close()
+
+    async with aiosqlite.connect(bluecoins_db) as aconn:
+        groups = [g for g in await find_duplicate_items(aconn) if g.name.casefold() == 'amex']
+        assert len(groups) == 1
+        result = await merge_items(aconn, groups)
+
+    assert result.items == len(groups[0].losers) == 2
+    assert result.transactions == sum(i.transactions for i in groups[0].losers)
+    conn = sqlite3.connect(bluecoins_db)
+    winner = groups[0].winner.id
+    assert conn.execute('SELECT COUNT(*) FROM ITEMTABLE WHERE itemTableID IN (5, 1001, 1002)').fetchone()[0] == 1
+    assert conn.execute('SELECT COUNT(*) FROM TRANSACTIONSTABLE WHERE itemID = ?', (winner,)).fetchone()[0] == amex
+    conn.close()
@@ -0,0 +1,105 @@
+import sqlite3
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+import cluecoins.ledger
+from cluecoins.ledger import combine
+from cluecoins.ledger import invert
+from cluecoins.ledger import load_ledger
+
+
+def _query(path: Path, sql: str) -> list[tuple]:
+    conn = sqlite3.connect(path)
+    rows = conn.execute(sql).fetchall()
+    conn.close()
+    return rows
+
+
+async def test_sums_match_sql(bluecoins_db: Path) -> None:
+    with await load_ledger(bluecoins_db) as ledger:
+        assert len(ledger) == 2825
+        assert ledger.total() == _query(bluecoins_db, 'SELECT SUM(amount) FROM TRANSACTIONSTABLE')[0][0]
+
+        by_account = dict(_query(bluecoins_db, 'SELECT accountID, SUM(amount) FROM TRANSACTIONSTABLE GROUP BY 1'))
+        assert ledger.sum_by('account') == by_account
+
+        by_month = dict(
+            _query(bluecoins_db, 'SELECT substr(date, 1, 7), SUM(amount) FROM TRANSACTIONSTABLE GROUP BY 1')
+        )
+        assert ledger.sum_by('month') == by_month
+        assert list(ledger.sum_by('month')) == sorted(by_month)
+        assert sum(ledger.sum_by('year').values()) == ledger.total()
+
+
+async def test_masks(bluecoins_db: Path) -> None:
+    expected = _query(
+        bluecoins_db,
+        """SELECT COUNT(*), SUM(amount) FROM TRANSACTIONSTABLE
+            WHERE transactionTypeID = 3 AND accountID IN (1, 2) AND date >= '2021-01-01' AND date < '2022-01-01'""",
+    )[0]
+
+    with await load_ledger(bluecoins_db) as ledger:
+        mask = ledger.mask(type_id=3, account={1, 2}, date_from=date(2021, 1, 1), date_to=date(2021, 12, 31))
+        assert sum(mask) == expected[0]
+        assert ledger.total(mask) == expected[1]
+        assert ledger.total(invert(mask)) == ledger.total() - expected[1]
+
+        usd = ledger.mask(currency='USD')
+        assert combine(mask, usd) == ledger.mask(
+            type_id=3, account=[1, 2], currency='USD', date_from=date(2021, 1, 1), date_to=date(2021, 12, 31)
+        )
+        assert sum(ledger.mask(currency='XXX')) == 0
+        assert ledger.sum_by('currency', usd) == {'USD': ledger.total(usd)}
+
+
+async def test_cache(bluecoins_db: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    with await load_ledger(bluecoins_db) as ledger:
+        assert not ledger.is_mapped
+        total = ledger.total()
+    (cache,) = cluecoins.ledger.LEDGER_CACHE_DIR.iterdir()
+
+    async def fail(*args: object) -> None:
+        raise AssertionError('the database was scanned')
+
+    with monkeypatch.context() as m:
+        m.setattr(cluecoins.ledger, 'read_ledger', fail)
+        with await load_ledger(bluecoins_db) as ledger:
+            assert ledger.is_mapped
+            assert ledger.total() == total
+            assert ledger.sum_by('account')[1] == ledger.total(ledger.mask(account=1))
+
+    conn = sqlite3.connect(bluecoins_db)
+    conn.execute('UPDATE TRANSACTIONSTABLE SET amount = amount + 1000000 WHERE transactionsTableID = 21237')
+    conn.commit()
+    conn.close()
+
+    with await load_ledger(bluecoins_db) as ledger:
+        assert not ledger.is_mapped
+        assert ledger.total() == total + 1000000
+    assert not cache.exists()
+    assert len(list(cluecoins.ledger.LEDGER_CACHE_DIR.iterdir())) == 1
+
+
+async def test_cache_same_file_name(bluecoins_db: Path, tmp_path: Path) -> None:
+    other = tmp_path / 'other [1]' / bluecoins_db.name
+    other.parent.mkdir()
+    other.write_bytes(bluecoins_db.read_bytes())
+    conn = sqlite3.connect(other)
+    conn.execute('UPDATE TRANSACTIONSTABLE SET amount = amount + 1000000 WHERE transactionsTableID = 21237')
+    conn.commit()
+    conn.close()
+
+    with await load_ledger(bluecoins_db) as ledger:
+        total = ledger.total()
+    with await load_ledger(other) as ledger:
+        assert ledger.total() == total + 1000000
+    assert len(list(cluecoins.ledger.LEDGER_CACHE_DIR.iterdir())) == 2
+
+    with await load_ledger(bluecoins_db) as ledger:
+        assert ledger.is_mapped
+        assert ledger.total() == total
+    with await load_ledger(other) as ledger:
+        assert ledger.is_mapped
+        assert ledger.total() == total + 1000000
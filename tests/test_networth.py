@@ -0,0 +1,128 @@
+import random
+import sqlite3
+from array import array
+from datetime import date
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+
+from cluecoins.ledger import Ledger
+from cluecoins.ledger import date_to_day
+from cluecoins.networth import bucket_ends
+from cluecoins.networth import load_net_worth
+from cluecoins.networth import net_worth
+from cluecoins.networth import write_net_worth
+from cluecoins.storage import LocalStorage
+
+
+def test_bucket_ends() -> None:
+    assert bucket_ends(date(2024, 1, 30), date(2024, 3, 10), 'month') == [
+        date(2024, 1, 31),
+        date(2024, 2, 29),
+        date(2024, 3, 10),
+    ]
+    assert bucket_ends(date(2024, 1, 3), date(2024, 1, 15), 'week') == [
+        date(2024, 1, 7),
+        date(2024, 1, 14),
+        date(2024, 1, 15),
+    ]
+    assert len(bucket_ends(date(2024, 1, 1), date(2024, 12, 31), 'day')) == 366
+
+
+async def test_matches_running_sum(bluecoins_db: Path, tmp_path: Path) -> None:
+    result = await load_net_worth(bluecoins_db, 'month')
+
+    conn = sqlite3.connect(bluecoins_db)
+    months = conn.execute('SELECT substr(date, 1, 7), SUM(amount) FROM TRANSACTIONSTABLE GROUP BY 1').fetchall()
+    balances = dict(conn.execute('SELECT accountID, SUM(amount) FROM TRANSACTIONSTABLE GROUP BY 1').fetchall())
+    conn.close()
+
+    assert result.base_currency == 'USD'
+    assert result.points[0].date == date(2020, 11, 30)
+    assert result.points[-1].date == date(2049, 8, 6)
+    running, expected = 0, {}
+    for month, amount in months:
+        running += amount
+        expected[month] = Decimal(running) / 1000000
+    assert {p.date.isoformat()[:7]: p.amount for p in result.points if p.date.isoformat()[:7] in expected} == expected
+    assert result.accounts == {account: Decimal(amount) / 1000000 for account, amount in balances.items()}
+    assert not result.estimated
+
+    output = tmp_path / 'networth.csv'
+    write_net_worth(result, output)
+    lines = output.read_text().splitlines()
+    assert lines[0] == 'date,net_worth_USD'
+    assert len(lines) == len(result.points) + 1
+
+
+async def test_revaluation(bluecoins_db: Path) -> None:
+    conn = sqlite3.connect(bluecoins_db)
+    conn.execute('DELETE FROM TRANSACTIONSTABLE')
+    # NOTE: 100 EUR bought at 0.8 EUR per USD, i.e. 125 USD at the time
+    conn.execute(
+        """INSERT INTO TRANSACTIONSTABLE (amount, conversionRateNew, transactionCurrency, date, transactionTypeID,
+            accountID) VALUES (125000000, 0.8, 'EUR', '2024-01-10 10:00:00', 4, 1)"""
+    )
+    conn.commit()
+    conn.close()
+
+    storage = LocalStorage()
+    async with storage.connect():
+        await storage.create_schema()
+        await storage.add_quote(date(2024, 2, 15), 'USD', 'EUR', Decimal('0.5'))
+        await storage.commit()
+
+    result = await load_net_worth(bluecoins_db, 'month', until=date(2024, 3, 31))
+    assert [(p.date, p.amount) for p in result.points] == [
+        (date(2024, 1, 31), Decimal(125)),
+        (date(2024, 2, 29), Decimal(200)),
+        (date(2024, 3, 31), Decimal(200)),
+    ]
+    assert result.accounts == {1: Decimal(200)}
+    assert result.estimated == {'EUR'}
+
+
+class _Reads(list[int]):
+    """Column counting the rows read from it."""
+
+    reads = 0
+
+    def __getitem__(self, index: Any) -> Any:
+        self.reads += 1
+        return super().__getitem__(index)
+
+
+def test_ten_years_fifty_accounts() -> None:
+    rows = 100_000
+    rng = random.Random(42)
+    first = date_to_day(date(2015, 1, 1))
+    days = _Reads(first + rng.randrange(3653) for _ in range(rows))
+    amounts = array('q', (rng.randrange(-(10**9), 10**9) for _ in range(rows)))
+    natives = _Reads(amounts)
+    currencies = array('h', (rng.randrange(3) for _ in range(rows)))
+    ledger = Ledger(
+        {
+            'id': array('q', range(rows)),
+            'day': days,
+            'amount': amounts,
+            'native': natives,
+            'type': array('b', [3]) * rows,
+            'account': array('i', (rng.randrange(50) for _ in range(rows))),
+            'category': array('i', [0]) * rows,
+            'currency': currencies,
+        },
+        {'account': list(range(50)), 'category': [None], 'currency': ['USD', 'EUR', 'GBP']},
+    )
+    quotes = {
+        'EUR': [(date(2015, 1, 1) + timedelta(days=i), Decimal('0.9')) for i in range(3653)],
+        'GBP': [(date(2015, 1, 1), Decimal('0.8'))],
+    }
+
+    result = net_worth(ledger, 'USD', 'day', quotes)
+
+    assert len(result.points) == 3653
+    assert len(result.accounts) == 50
+    # NOTE: One pass over the rows sorted once, whatever the number of points; timed in benchmarks/bench.py
+    assert natives.reads == rows
+    assert days.reads <= 2 * rows + len(result.points) + 2
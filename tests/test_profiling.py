@@ -0,0 +1,68 @@
+import pstats
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+
+import cluecoins.profiling
+from cluecoins.batch import main
+from cluecoins.profiling import profile
+from cluecoins.ui import CluecoinsApp
+
+
+@pytest.fixture(autouse=True)
+def _disable() -> Generator[None, None, None]:
+    yield
+    cluecoins.profiling.disable()
+
+
+def _work() -> int:
+    return sum(sorted(range(100000), key=lambda x: -x))
+
+
+def test_profile() -> None:
+    with profile('work') as disabled:
+        _work()
+    assert disabled is None
+    assert not cluecoins.profiling.PROFILE_DIR.exists()
+
+    cluecoins.profiling.enable('work')
+    lines: list[str] = []
+    with profile('work', 'test', lines.append) as run:
+        assert profile('work') is not run
+        _work()
+    assert run is not None and run.path is not None
+    assert run.path.name.startswith('work-test-')
+
+    stats = pstats.Stats(str(run.path))
+    assert any(name == '_work' for _, _, name in stats.stats)  # type: ignore[attr-defined]
+    assert any('_work (test_profiling.py' in line for line in lines)
+
+    stacks = run.path.with_suffix('.collapsed').read_text().splitlines()
+    assert any('_work (test_profiling.py:19);<built-in method builtins.sorted>' in line for line in stacks)
+    assert all(int(line.rsplit(' ', 1)[1]) > 0 for line in stacks)
+
+
+def test_batch(bluecoins_db: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    assert main(['--profile', 'stats', str(bluecoins_db)]) == 0
+    (path,) = cluecoins.profiling.PROFILE_DIR.glob('stats-*.pstats')
+    assert path.with_suffix('.collapsed').is_file()
+    assert 'cumulative' in capsys.readouterr().err
+
+
+async def test_screen_mount(bluecoins_db: Path) -> None:
+    cluecoins.profiling.enable('mount', 'reload')
+    async with CluecoinsApp().run_test(size=(120, 40)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+        app.database_connect(bluecoins_db)
+        app.action_transactions()
+        await pilot.pause()
+        await pilot.click('#page-next')
+        await pilot.pause()
+
+    (mount,) = cluecoins.profiling.PROFILE_DIR.glob('mount-TransactionsScreen-*.pstats')
+    names = {name for _, _, name in pstats.Stats(str(mount)).stats}  # type: ignore[attr-defined]
+    assert 'fetch_transactions_page' in names
+    # NOTE: The first page is part of the mount; only the next one is a run of its own
+    assert len(list(cluecoins.profiling.PROFILE_DIR.glob('reload-TransactionsScreen-*.pstats'))) == 1
+    assert any('mount profiled' in str(message) for message in app._log_history)
@@ -5,6 +5,7 @@ from pathlib import Path
 import aiosqlite
 import pytest
 
+from cluecoins.database import browse_db
 from cluecoins.database import connect_local_db
 from cluecoins.database import iter_accounts
 from cluecoins.database import iter_transactions
@@ -25,6 +26,19 @@ def test_connect_local_db_invalid_extension(tmp_path: Path) -> None:
         connect_local_db(str(path))
 
 
+@pytest.mark.parametrize('immutable', [False, True])
+async def test_browse_db(bluecoins_db: Path, immutable: bool) -> None:
+    async with browse_db(bluecoins_db, immutable) as conn:
+        for pragma, expected in (('mmap_size', 268435456), ('temp_store', 2), ('query_only', 1)):
+            async with conn.execute(f'PRAGMA {pragma}') as cur:
+                assert await cur.fetchone() == (expected,)
+        async with conn.execute('SELECT COUNT(*) FROM TRANSACTIONSTABLE') as cur:
+            assert await cur.fetchone() == (2825,)
+        with pytest.raises(aiosqlite.OperationalError):
+            await conn.execute('DELETE FROM TRANSACTIONSTABLE')
+    assert not bluecoins_db.with_name(f'{bluecoins_db.name}-journal').exists()
+
+
 async def test_set_base_currency(bluecoins_conn: aiosqlite.Connection) -> None:
     await set_base_currency(bluecoins_conn, 'EUR')
     row = await (
@@ -0,0 +1,102 @@
+import sqlite3
+from decimal import Decimal
+from pathlib import Path
+
+from cluecoins.header import read_header
+from cluecoins.report import build_report
+from cluecoins.report import load_category_report
+from cluecoins.summary import CategoryMonth
+
+
+def test_build_report() -> None:
+    tree = [
+        (1, 'Fuel', 10, 'Car', 3, 'Expense'),
+        (2, 'Repair', 10, 'Car', 3, 'Expense'),
+        (3, 'Cable', 11, 'Utilities', 3, 'Expense'),
+        (4, 'Salary', 12, 'Employer', 2, 'Income'),
+    ]
+    cells = [
+        CategoryMonth('2024-01', 1, Decimal(0), Decimal(-10)),
+        CategoryMonth('2024-02', 1, Decimal(0), Decimal(-20)),
+        CategoryMonth('2024-02', 2, Decimal(5), Decimal(-100)),
+        CategoryMonth('2024-02', 4, Decimal(1000), Decimal(0)),
+        CategoryMonth('2024-03', 99, Decimal(0), Decimal(-1)),
+    ]
+    report = build_report(tree, cells)
+
+    assert [(depth, node.name) for depth, node in report.walk()] == [
+        (0, 'Expense'),
+        (1, 'Car'),
+        (2, 'Fuel'),
+        (2, 'Repair'),
+        (0, 'Income'),
+        (1, 'Employer'),
+        (2, 'Salary'),
+        (0, '(unknown)'),
+        (1, '(unknown)'),
+        (2, '#99'),
+    ]
+    expense, income, unknown = report.groups
+    assert expense.months == {'2024-01': Decimal(-10), '2024-02': Decimal(-115)}
+    assert expense.children[0].total('2024-02') == Decimal(-115)
+    assert income.total() == Decimal(1000)
+    assert unknown.total() == Decimal(-1)
+    assert report.months == ['2024-01', '2024-02', '2024-03']
+
+
+async def test_load_category_report(bluecoins_db: Path) -> None:
+    report = await load_category_report(bluecoins_db)
+
+    conn = sqlite3.connect(bluecoins_db)
+    expected = dict(
+        conn.execute(
+            """SELECT p.categoryGroupID, SUM(t.amount) FROM TRANSACTIONSTABLE t
+                JOIN CHILDCATEGORYTABLE c ON c.categoryTableID = t.categoryID
+                JOIN PARENTCATEGORYTABLE p ON p.parentCategoryTableID = c.parentCategoryID
+                WHERE t.transactionTypeID IN (3, 4) GROUP BY 1"""
+        ).fetchall()
+    )
+    conn.close()
+    assert {group.id: group.total() * 1000000 for group in report.groups} == expected
+    for _, node in report.walk():
+        if node.children:
+            assert node.total() == sum(child.total() for child in node.children)
+
+    conn = sqlite3.connect(bluecoins_db)
+    conn.execute(
+        'INSERT INTO TRANSACTIONSTABLE (transactionsTableID, itemID, amount, transactionCurrency, conversionRateNew, '
+        "date, transactionTypeID, categoryID, accountID) VALUES (99999, 2, -5000000, 'USD', 1.0, "
+        "'2050-01-02 10:00:00', 3, 6, 1)"
+    )
+    conn.commit()
+    conn.close()
+
+    report = await load_category_report(bluecoins_db)
+    assert report.months[-1] == '2050-01'
+    assert report.groups[1].between('2050-01') == {'2050-01': Decimal(-5)}
+
+
+async def test_load_category_report_wal(bluecoins_db: Path) -> None:
+    conn = sqlite3.connect(bluecoins_db)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.close()
+    report = await load_category_report(bluecoins_db)
+    total = report.groups[1].total()
+    header = read_header(bluecoins_db)
+
+    # NOTE: Same size and, once checkpointed, the same main file header
+    conn = sqlite3.connect(bluecoins_db)
+    conn.execute(
+        """UPDATE TRANSACTIONSTABLE SET amount = amount - 5000000 WHERE transactionsTableID = (
+            SELECT MIN(t.transactionsTableID) FROM TRANSACTIONSTABLE t
+                JOIN CHILDCATEGORYTABLE c ON c.categoryTableID = t.categoryID
+                JOIN PARENTCATEGORYTABLE p ON p.parentCategoryTableID = c.parentCategoryID
+                WHERE t.transactionTypeID IN (3, 4) AND p.categoryGroupID = ?)""",
+        (report.groups[1].id,),
+    )
+    conn.commit()
+    conn.close()
+    assert read_header(bluecoins_db) == header
+
+    report = await load_category_report(bluecoins_db)
+    assert report.groups[1].total() == total - 5
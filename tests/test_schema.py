@@ -0,0 +1,71 @@
+import sqlite3
+from pathlib import Path
+
+import aiosqlite
+import pytest
+
+from cluecoins.schema import REFERENCE_FINGERPRINT
+from cluecoins.schema import REFERENCE_USER_VERSION
+from cluecoins.schema import SchemaMismatchError
+from cluecoins.schema import ensure_schema
+from cluecoins.schema import normalize_sql
+from cluecoins.schema import reference_fingerprint
+from cluecoins.schema import reference_script
+from cluecoins.schema import verify_schema
+
+
+def test_reference_fingerprint() -> None:
+    assert reference_fingerprint() == REFERENCE_FINGERPRINT
+
+
+def test_normalize_sql() -> None:
+    assert normalize_sql('CREATE TABLE T (\n    a INTEGER , \n  b TEXT\n)') == 'CREATE TABLE T(a INTEGER,b TEXT)'
+
+
+async def test_verify_schema_match(bluecoins_db: Path) -> None:
+    conn = sqlite3.connect(bluecoins_db)
+    conn.execute('CREATE INDEX cluecoins_transactions_date ON TRANSACTIONSTABLE(date)')
+    conn.execute('CREATE TABLE CLUE_ACCOUNTSTABLE (accountsTableID INTEGER PRIMARY KEY)')
+    conn.close()
+
+    async with aiosqlite.connect(bluecoins_db) as aconn:
+        assert (await verify_schema(aconn)).is_empty()
+        await ensure_schema(aconn)
+
+
+async def test_verify_schema_reference(tmp_path: Path) -> None:
+    """A file created from the documented schema is supported."""
+    path = tmp_path / 'empty.fydb'
+    conn = sqlite3.connect(path)
+    conn.executescript(reference_script())
+    conn.execute(f'PRAGMA user_version = {REFERENCE_USER_VERSION}')
+    conn.close()
+
+    async with aiosqlite.connect(path) as aconn:
+        await ensure_schema(aconn)
+
+
+async def test_verify_schema_mismatch(bluecoins_db: Path) -> None:
+    conn = sqlite3.connect(bluecoins_db)
+    conn.executescript(
+        """
+        PRAGMA user_version = 43;
+        ALTER TABLE ACCOUNTSTABLE ADD COLUMN accountColor TEXT;
+        DROP INDEX transactionsTable2;
+        DROP TABLE SMSSTABLE;
+        CREATE TABLE NEWTABLE (id INTEGER PRIMARY KEY);
+        """
+    )
+    conn.close()
+
+    async with aiosqlite.connect(bluecoins_db) as aconn:
+        diff = await verify_schema(aconn)
+        with pytest.raises(SchemaMismatchError, match=r'unexpected column `ACCOUNTSTABLE\.accountColor`'):
+            await ensure_schema(aconn)
+
+    assert diff.user_version == (43, 42)
+    assert diff.missing_tables == ['SMSSTABLE']
+    assert diff.extra_tables == ['NEWTABLE']
+    assert diff.extra_columns == {'ACCOUNTSTABLE': ['accountColor']}
+    assert diff.missing_indexes == ['transactionsTable2']
+    assert not diff.changed_columns
@@ -0,0 +1,49 @@
+import sqlite3
+from pathlib import Path
+
+import aiosqlite
+
+from cluecoins.database import count_transactions
+from cluecoins.database import fetch_transactions_page
+from cluecoins.filters import TransactionFilter
+from cluecoins.search import TransactionSearchIndex
+from cluecoins.search import build_match_query
+from cluecoins.storage import LocalStorage
+
+
+async def _refresh(index: TransactionSearchIndex, db: Path, fingerprint: str | None) -> int:
+    async with aiosqlite.connect(db) as conn:
+        return await index.refresh(conn, str(db), fingerprint)
+
+
+def test_build_match_query() -> None:
+    assert build_match_query('  coffee  sh"op ') == '"coffee"* "sh""op"*'
+    assert build_match_query('   ') == ''
+
+
+async def test_search_and_incremental_refresh(local_storage: LocalStorage, bluecoins_db: Path) -> None:
+    index = TransactionSearchIndex(local_storage)
+    await index.create_schema()
+    source = str(bluecoins_db)
+
+    total = await _refresh(index, bluecoins_db, 'v1')
+    assert total > 0
+    assert await _refresh(index, bluecoins_db, 'v1') == 0
+
+    coffee = await index.search(source, 'coff')
+    assert coffee
+    async with aiosqlite.connect(bluecoins_db) as conn:
+        filter_ = TransactionFilter(ids=coffee)
+        _, rows = await fetch_transactions_page(conn, limit=len(coffee) + 1, filter_=filter_)
+        assert len(rows) == len(coffee) == await count_transactions(conn, filter_)
+        assert all(row[-1] == 'Coffee Shop' for row in rows)
+
+    conn_ = sqlite3.connect(bluecoins_db)
+    conn_.execute("UPDATE TRANSACTIONSTABLE SET notes = 'zanzibar trip' WHERE transactionsTableID = ?", (coffee[0],))
+    conn_.execute('DELETE FROM TRANSACTIONSTABLE WHERE transactionsTableID = ?', (coffee[1],))
+    conn_.commit()
+    conn_.close()
+
+    assert await _refresh(index, bluecoins_db, 'v2') == 2
+    assert await index.search(source, 'zanzib') == [coffee[0]]
+    assert coffee[1] not in await index.search(source, 'coffee')
@@ -0,0 +1,80 @@
+import sqlite3
+from decimal import Decimal
+from pathlib import Path
+
+import aiosqlite
+
+from cluecoins.storage import LocalStorage
+from cluecoins.summary import SummaryCache
+
+
+def _balances(path: Path) -> dict[int, Decimal]:
+    conn = sqlite3.connect(path)
+    rows = conn.execute('SELECT accountID, SUM(amount) FROM TRANSACTIONSTABLE GROUP BY accountID').fetchall()
+    conn.close()
+    return {id_: Decimal(amount) / 1000000 for id_, amount in rows}
+
+
+async def test_refresh(local_storage: LocalStorage, bluecoins_db: Path) -> None:
+    summary = SummaryCache(local_storage)
+    await summary.create_schema()
+
+    async with aiosqlite.connect(bluecoins_db) as conn:
+        assert await summary.refresh(conn, 'db', 'a') == 'full'
+        assert await summary.refresh(conn, 'db', 'a') == 'fresh'
+
+    balances = await summary.account_balances('db')
+    assert {b.account_id: b.amount for b in balances} == _balances(bluecoins_db)
+    assert sum(b.transactions for b in balances) == 2825
+
+    (usd,) = await summary.currency_totals('db')
+    assert usd.currency == 'USD'
+    assert usd.amount == usd.base_amount
+
+    months = await summary.category_months('db')
+    assert months[0].month >= months[-1].month
+    assert sum(m.expense for m in months) < 0 < sum(m.income for m in months)
+
+
+async def test_refresh_incremental(local_storage: LocalStorage, bluecoins_db: Path) -> None:
+    summary = SummaryCache(local_storage)
+    await summary.create_schema()
+    async with aiosqlite.connect(bluecoins_db) as conn:
+        await summary.refresh(conn, 'db', 'a')
+
+        await conn.execute(
+            'INSERT INTO TRANSACTIONSTABLE (transactionsTableID, itemID, amount, transactionCurrency, conversionRateNew, '
+            "date, transactionTypeID, categoryID, accountID) VALUES (99999, 2, -5000000, 'USD', 1.0, "
+            "'2030-01-02 10:00:00', 3, 1, 1)"
+        )
+        await conn.commit()
+        assert await summary.refresh(conn, 'db', 'b') == 'incremental'
+        assert {b.account_id: b.amount for b in await summary.account_balances('db')} == _balances(bluecoins_db)
+        months = {(m.month, m.category_id): m for m in await summary.category_months('db')}
+        assert months['2030-01', 1].expense == Decimal(-5)
+
+        await conn.execute('UPDATE TRANSACTIONSTABLE SET amount = amount + 1 WHERE transactionsTableID = 2')
+        await conn.commit()
+        assert await summary.refresh(conn, 'db', 'c') == 'full'
+        assert {b.account_id: b.amount for b in await summary.account_balances('db')} == _balances(bluecoins_db)
+
+
+async def test_refresh_edits(local_storage: LocalStorage, bluecoins_db: Path) -> None:
+    """Edits of summarized rows force a full recompute, even when they keep the column sums."""
+    summary = SummaryCache(local_storage)
+    await summary.create_schema()
+    async with aiosqlite.connect(bluecoins_db) as conn:
+        await summary.refresh(conn, 'db', 'a')
+
+        await conn.execute("UPDATE TRANSACTIONSTABLE SET transactionCurrency = 'EUR' WHERE transactionsTableID = 2")
+        await conn.commit()
+        assert await summary.refresh(conn, 'db', 'b') == 'full'
+        assert [t.currency for t in await summary.currency_totals('db')] == ['EUR', 'USD']
+
+        await conn.execute(
+            'UPDATE TRANSACTIONSTABLE SET accountID = CASE transactionsTableID WHEN 2 THEN 2 ELSE 1 END '
+            'WHERE transactionsTableID IN (2, 3)'
+        )
+        await conn.commit()
+        assert await summary.refresh(conn, 'db', 'c') == 'full'
+        assert {b.account_id: b.amount for b in await summary.account_balances('db')} == _balances(bluecoins_db)
@@ -0,0 +1,73 @@
+import hashlib
+import sqlite3
+from datetime import date
+from pathlib import Path
+
+import aiosqlite
+
+from cluecoins.schema import verify_schema
+from cluecoins.synthetic import SyntheticConfig
+from cluecoins.synthetic import generate_database
+
+
+def _dump(path: Path) -> str:
+    conn = sqlite3.connect(path)
+    digest = hashlib.sha256('\n'.join(conn.iterdump()).encode()).hexdigest()
+    conn.close()
+    return digest
+
+
+async def test_generate_database(tmp_path: Path) -> None:
+    path = tmp_path / 'synthetic.fydb'
+    config = SyntheticConfig(transactions=20000, accounts=8, items=100, categories=12, base_currency='EUR', seed=1)
+    assert generate_database(path, config) == 20000
+
+    async with aiosqlite.connect(path) as aconn:
+        assert (await verify_schema(aconn)).is_empty()
+
+    conn = sqlite3.connect(path)
+    count, first, last = conn.execute('SELECT COUNT(*), MIN(date), MAX(date) FROM TRANSACTIONSTABLE').fetchone()
+    assert count == 20000
+    assert first.startswith('2015-01-01')
+    assert '2024-10-01' < last < '2025-01-01'
+    assert conn.execute('SELECT MAX(transactionsTableID) FROM TRANSACTIONSTABLE').fetchone() == (20000,)
+    assert conn.execute('SELECT defaultSettings FROM SETTINGSTABLE WHERE settingsTableID = 1').fetchone() == ('EUR',)
+
+    types = dict(conn.execute('SELECT transactionTypeID, COUNT(*) FROM TRANSACTIONSTABLE GROUP BY 1').fetchall())
+    assert types[2] == 8
+    assert types[3] > types[4] > 0
+    assert types[5] > 0
+    # NOTE: Both sides of a transfer have the same amount in the base currency
+    assert conn.execute('SELECT SUM(amount) FROM TRANSACTIONSTABLE WHERE transactionTypeID = 5').fetchone() == (0,)
+    assert conn.execute(
+        """SELECT COUNT(*) FROM TRANSACTIONSTABLE t JOIN TRANSACTIONSTABLE p ON p.transactionsTableID = t.uidPairID
+            WHERE t.transactionTypeID = 5 AND p.uidPairID = t.transactionsTableID"""
+    ).fetchone() == (types[5],)
+
+    # NOTE: Transactions are in the currency of their account
+    assert conn.execute(
+        """SELECT COUNT(*) FROM TRANSACTIONSTABLE t JOIN ACCOUNTSTABLE a ON a.accountsTableID = t.accountID
+            WHERE t.transactionCurrency != a.accountCurrency"""
+    ).fetchone() == (0,)
+    currencies = conn.execute('SELECT COUNT(DISTINCT transactionCurrency) FROM TRANSACTIONSTABLE').fetchone()[0]
+    assert currencies > 1
+    assert conn.execute(
+        "SELECT COUNT(*) FROM TRANSACTIONSTABLE WHERE transactionCurrency = 'EUR' AND conversionRateNew != 1"
+    ).fetchone() == (0,)
+
+    labeled = conn.execute('SELECT COUNT(DISTINCT transactionIDLabels) FROM LABELSTABLE').fetchone()[0]
+    assert 0.2 * count < labeled < 0.4 * count
+    assert conn.execute(
+        'SELECT COUNT(*) FROM TRANSACTIONSTABLE WHERE categoryID NOT IN (SELECT categoryTableID FROM CHILDCATEGORYTABLE)'
+    ).fetchone() == (0,)
+    conn.close()
+
+
+def test_generate_database_is_reproducible(tmp_path: Path) -> None:
+    config = SyntheticConfig(transactions=3000, start=date(2020, 1, 1))
+    generate_database(tmp_path / 'a.fydb', config)
+    generate_database(tmp_path / 'b.fydb', config)
+    generate_database(tmp_path / 'c.fydb', SyntheticConfig(transactions=3000, start=date(2020, 1, 1), seed=2))
+
+    assert _dump(tmp_path / 'a.fydb') == _dump(tmp_path / 'b.fydb')
+    assert _dump(tmp_path / 'a.fydb') != _dump(tmp_path / 'c.fydb')
@@ -0,0 +1,56 @@
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+
+import cluecoins.tracing
+from cluecoins.database import connect_db
+from cluecoins.database import count_transactions
+from cluecoins.database import fetch_transactions_page
+from cluecoins.database import iter_transactions
+from cluecoins.tracing import Tracer
+from cluecoins.tracing import normalize
+
+
+@pytest.fixture
+def tracer() -> Generator[Tracer, None, None]:
+    yield cluecoins.tracing.enable(slow_ms=0)
+    cluecoins.tracing.disable()
+
+
+def test_normalize() -> None:
+    assert normalize("SELECT *\n  FROM t1 WHERE a = 'x''y' AND b IN (1, 2.5, ?)  LIMIT 10") == (
+        'SELECT * FROM t1 WHERE a = ? AND b IN (?, ...) LIMIT ?'
+    )
+
+
+async def test_stats(bluecoins_db: Path, tracer: Tracer) -> None:
+    cluecoins.tracing.set_scope('TransactionsScreen')
+    async with connect_db(bluecoins_db, read_only=True) as conn:
+        total = await count_transactions(conn)
+        for offset in (0, 1000, 2000):
+            await fetch_transactions_page(conn, offset, 1000, 'notes', True)
+        cluecoins.tracing.set_scope(None)
+        rows = [row async for row in iter_transactions(conn)]
+
+    stats = tracer.stats()
+    page = next(s for s in stats if s.scope == 'TransactionsScreen' and 'LIMIT' in s.statement)
+    assert page.calls == 3
+    assert page.rows == total
+    assert page.max_ms <= page.total_ms
+    assert page.full_scan
+
+    (scan,) = (s for s in stats if s.scope is None)
+    assert scan.calls == 1
+    assert scan.rows == len(rows)
+
+    log = cluecoins.tracing.SLOW_QUERY_LOG.read_text()
+    assert page.statement in log
+    assert 'SCAN' in log
+
+
+async def test_disabled(bluecoins_db: Path) -> None:
+    async with connect_db(bluecoins_db) as conn:
+        await count_transactions(conn)
+    assert cluecoins.tracing.get_tracer() is None
+    assert not cluecoins.tracing.SLOW_QUERY_LOG.exists()
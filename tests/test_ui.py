@@ -1,13 +1,28 @@
+import sqlite3
 from pathlib import Path
 
+from textual.widgets import Input
+from textual.widgets import Select
+from textual.widgets import Sparkline
 from zandev_textual_widgets.menu import MenuHeader
 from zandev_textual_widgets.menu import MenuItem
 
+import cluecoins.tracing
+from cluecoins.backup import list_snapshots
+from cluecoins.backup import source_name
+from cluecoins.ui import BackupsScreen
+from cluecoins.ui import CategoryReportScreen
+from cluecoins.ui import CleanupScreen
 from cluecoins.ui import CluecoinsApp
 from cluecoins.ui import CluecoinsMenuScreen
+from cluecoins.ui import DuplicateItemsScreen
 from cluecoins.ui import MainScreen
+from cluecoins.ui import NetWorthScreen
+from cluecoins.ui import PerformanceIndexesScreen
+from cluecoins.ui import QueryStatsScreen
 from cluecoins.ui import StatisticsScreen
 from cluecoins.ui import TableRowsScreen
+from cluecoins.ui import TransactionsScreen
 
 
 async def test_menu_opens_and_action_fires() -> None:
@@ -76,6 +91,19 @@ async def test_statistics_screen_with_db(fydb_with_tables: Path) -> None:
         assert app.screen._data.row_count > 0  # type: ignore[attr-defined]
 
 
+async def test_db_fingerprint_wal(fydb_with_tables: Path) -> None:
+    """No fingerprint for WAL-mode files; commits don't change their header."""
+    async with CluecoinsApp().run_test(size=(120, 40)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+
+        app.database_connect(fydb_with_tables)
+        assert app.db_fingerprint() is not None
+        conn = sqlite3.connect(fydb_with_tables)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.close()
+        assert app.db_fingerprint() is None
+
+
 async def test_statistics_back_button() -> None:
     """Back button in StatisticsScreen returns to MainScreen."""
     async with CluecoinsApp().run_test(size=(120, 40)) as pilot:
@@ -253,3 +281,328 @@ async def test_busy_clears_restores_to_db_state(fydb_file: Path) -> None:
         await pilot.pause()
         # Not DB-required → enabled
         assert not app.screen.query_one('#cached_quotes_menu_item', MenuItem).disabled
+
+
+async def test_status_bar_shows_header(bluecoins_db: Path) -> None:
+    """Connecting to a database shows the SQLite header summary in the status bar."""
+    async with CluecoinsApp().run_test(size=(120, 40)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+        app.database_connect(bluecoins_db)
+        await pilot.pause()
+
+        assert app._db_header is not None
+        assert f'{app._db_header.page_count}x{app._db_header.page_size} B' in app._status_text
+        assert any('user version' in str(m) for m in app._log_history)
+
+
+async def test_transactions_search(bluecoins_db: Path) -> None:
+    """Submitting the search box narrows the Transactions screen to matching rows."""
+    async with CluecoinsApp().run_test(size=(120, 40)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+        app.database_connect(bluecoins_db)
+        app.action_transactions()
+        await pilot.pause()
+
+        screen = app.screen
+        assert isinstance(screen, TransactionsScreen)
+        total = screen._total_rows
+
+        await pilot.click('#transactions-search')
+        await pilot.press(*'coffee', 'enter')
+        await pilot.pause()
+        assert 0 < screen._total_rows < total
+        assert screen._data.row_count == screen._total_rows
+
+        screen.query_one('#transactions-search', Input).value = ''
+        await pilot.press('enter')
+        await pilot.pause()
+        assert screen._total_rows == total
+
+
+async def test_transactions_search_wal(bluecoins_db: Path) -> None:
+    """Edits to a WAL-mode database reach the search index."""
+    conn = sqlite3.connect(bluecoins_db)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.close()
+    async with CluecoinsApp().run_test(size=(120, 40)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+        app.database_connect(bluecoins_db)
+        app.action_transactions()
+        await pilot.pause()
+
+        screen = app.screen
+        assert isinstance(screen, TransactionsScreen)
+        search = screen.query_one('#transactions-search', Input)
+        search.value = 'coffee'
+        await pilot.click('#transactions-search')
+        await pilot.press('enter')
+        await pilot.pause()
+        assert screen._total_rows > 0
+
+        conn = sqlite3.connect(bluecoins_db)
+        conn.execute(
+            "UPDATE TRANSACTIONSTABLE SET notes = 'zanzibar' WHERE transactionsTableID = (SELECT MIN(transactionsTableID) FROM TRANSACTIONSTABLE)"
+        )
+        conn.commit()
+        conn.close()
+
+        search.value = 'zanzibar'
+        await pilot.press('enter')
+        await pilot.pause()
+        assert screen._total_rows == 1
+
+
+async def test_transactions_filter_and_paging(bluecoins_db: Path) -> None:
+    """The filter bar narrows the table; next/prev pages use keyset cursors."""
+    async with CluecoinsApp().run_test(size=(120, 40)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+        app.database_connect(bluecoins_db)
+        app.action_transactions()
+        await pilot.pause()
+
+        screen = app.screen
+        assert isinstance(screen, TransactionsScreen)
+        first_page = [screen._data.get_row_at(i)[0] for i in range(3)]
+        await screen.on_next_pressed(None)  # type: ignore[arg-type]
+        assert 1 in screen._cursors
+        await screen.on_prev_pressed(None)  # type: ignore[arg-type]
+        assert [screen._data.get_row_at(i)[0] for i in range(3)] == first_page
+
+        await pilot.click('#transactions-filter')
+        await pilot.press(*'account:1 from:2021-01-01 to:2021-01-31', 'enter')
+        await pilot.pause()
+        assert 0 < screen._total_rows < 1000
+        assert all(screen._data.get_row_at(i)[1].startswith('2021-01') for i in range(screen._data.row_count))
+        assert any('query plan' in str(m) for m in app._log_history)
+
+
+async def test_transactions_back(bluecoins_db: Path) -> None:
+    """Back returns from the transactions screen to the main one."""
+    async with CluecoinsApp().run_test(size=(120, 40)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+        app.database_connect(bluecoins_db)
+        app.action_transactions()
+        await pilot.pause()
+        assert isinstance(app.screen, TransactionsScreen)
+
+        await pilot.click('#paged-back')
+        await pilot.pause()
+        assert isinstance(app.screen, MainScreen)
+
+
+async def test_performance_indexes_screen(bluecoins_db: Path) -> None:
+    """Creating indexes switches the app to a working copy and logs timings."""
+    async with CluecoinsApp().run_test(size=(120, 40)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+        app.database_connect(bluecoins_db)
+        app.action_performance_indexes()
+        await pilot.pause()
+
+        screen = app.screen
+        assert isinstance(screen, PerformanceIndexesScreen)
+        assert screen._data.row_count > 0
+
+        await pilot.click('#indexes-create')
+        await pilot.pause()
+        assert app._db_path is not None
+        assert app._db_path != bluecoins_db
+        assert any(' ms -> ' in str(m) for m in app._log_history)
+        assert screen._data.row_count == 0
+
+
+async def test_duplicate_items_screen(bluecoins_db: Path) -> None:
+    conn = sqlite3.connect(bluecoins_db)
+    conn.execute("INSERT INTO ITEMTABLE (itemName, itemAutoFillVisibility) VALUES ('visa ', 0)")
+    conn.commit()
+    conn.close()
+
+    async with CluecoinsApp().run_test(size=(120, 40)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+        app.database_connect(bluecoins_db)
+        app.switch_screen(DuplicateItemsScreen())
+        await pilot.pause()
+
+        screen = app.screen
+        assert isinstance(screen, DuplicateItemsScreen)
+        assert screen._data.row_count == 1
+
+        await pilot.click('#duplicates-merge')
+        await pilot.pause()
+        assert any('merged 1 items' in str(m) for m in app._log_history)
+        assert screen._data.row_count == 0
+
+
+async def test_cleanup_screen(bluecoins_db: Path) -> None:
+    async with CluecoinsApp().run_test(size=(120, 40)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+        app.database_connect(bluecoins_db)
+        app.action_cleanup()
+        await pilot.pause()
+
+        screen = app.screen
+        assert isinstance(screen, CleanupScreen)
+        assert screen._rules.get_cell('empty_transactions', 'candidates') == 7
+
+        await pilot.click('#cleanup-delete')
+        await pilot.pause()
+        assert any('empty_transactions 7' in str(m) for m in app._log_history)
+        assert screen._rules.get_cell('empty_transactions', 'candidates') == 0
+        assert [s.reason for s in list_snapshots(source_name(bluecoins_db))] == ['cleanup']
+
+
+async def test_backups_screen(bluecoins_db: Path) -> None:
+    async with CluecoinsApp().run_test(size=(120, 40)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+        app.database_connect(bluecoins_db)
+        app.action_backups()
+        await pilot.pause()
+
+        screen = app.screen
+        assert isinstance(screen, BackupsScreen)
+        assert screen._data.row_count == 0
+
+        await pilot.click('#backups-create')
+        await pilot.pause()
+        assert screen._data.row_count == 1
+
+        conn = sqlite3.connect(bluecoins_db)
+        conn.execute('DELETE FROM TRANSACTIONSTABLE')
+        conn.commit()
+        conn.close()
+
+        await pilot.click('#backups-restore')
+        await pilot.pause()
+        assert any('restored' in str(m) for m in app._log_history)
+        assert screen._data.row_count == 2
+
+    conn = sqlite3.connect(bluecoins_db)
+    assert conn.execute('SELECT COUNT(*) FROM TRANSACTIONSTABLE').fetchone()[0] == 2825
+    conn.close()
+
+
+async def test_net_worth_screen(bluecoins_db: Path) -> None:
+    async with CluecoinsApp().run_test(size=(120, 60)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+        app.database_connect(bluecoins_db)
+        app.action_net_worth()
+        await pilot.pause()
+
+        screen = app.screen
+        assert isinstance(screen, NetWorthScreen)
+        assert screen._data.row_count == 346
+        assert list(screen.query_one('#networth-chart', Sparkline).data or ())[-1] == 204872
+
+        screen.query_one('#networth-bucket', Select).value = 'year'
+        await pilot.pause()
+        assert screen._data.row_count == 30
+
+        await pilot.click('#networth-export')
+        await pilot.pause()
+        assert bluecoins_db.with_name('bluecoins.networth.csv').read_text().count('\n') == 31
+
+
+async def test_category_report_screen(bluecoins_db: Path) -> None:
+    async with CluecoinsApp().run_test(size=(120, 60)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+        app.database_connect(bluecoins_db)
+        app.action_categories()
+        await pilot.pause()
+
+        screen = app.screen
+        assert isinstance(screen, CategoryReportScreen)
+        income, expense = screen._tree.root.children
+        assert str(income.label) == 'Income  279,419.00'
+        assert str(expense.children[0].label) == 'Car  -17,521.00'
+
+        screen.query_one('#categories-range', Select).value = '2021'
+        await pilot.pause()
+        income, expense = screen._tree.root.children
+        assert str(income.label) != 'Income  279,419.00'
+
+        screen._tree.move_cursor(screen._tree.root.children[1].children[0])
+        await pilot.pause()
+        assert 0 < screen._months.row_count <= 12
+
+
+async def test_statistics_screen_summary(bluecoins_db: Path) -> None:
+    async with CluecoinsApp().run_test(size=(120, 40)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+        app.database_connect(bluecoins_db)
+        app.action_statistics()
+        await pilot.pause()
+
+        screen = app.screen
+        assert isinstance(screen, StatisticsScreen)
+        assert screen._balances.row_count > 0
+        assert screen._currencies.row_count == 1
+        assert screen._months.row_count > 0
+        assert any('summary of' in str(m) for m in app._log_history)
+
+
+async def test_device_pull_and_push(bluecoins_db: Path, tmp_path: Path, monkeypatch) -> None:
+    from cluecoins.adb import DEVICE_DB_PATH
+    from cluecoins.adb import Device
+    from tests.fakeadb import FakeDevice
+
+    fake = FakeDevice(tmp_path / 'device', bluecoins_db)
+    monkeypatch.setattr('cluecoins.adb.connect', lambda: Device(fake))
+
+    async with CluecoinsApp().run_test(size=(120, 40)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+        file_header = next(h for h in app.screen.query(MenuHeader) if h.menu_id == 'file_menu')
+        await pilot.mouse_down(file_header)
+        await pilot.pause()
+        assert isinstance(app.screen, CluecoinsMenuScreen)
+        assert app.screen.query_one('#push_device_menu_item', MenuItem).disabled
+
+        await app.action_open_device()
+        await pilot.pause()
+        assert app._db_path is not None
+        assert app._sync is not None
+        assert not app.screen.query_one('#push_device_menu_item', MenuItem).disabled
+
+        await app.action_push_device()
+        assert any('nothing pushed' in str(m) for m in app._log_history)
+
+        conn = sqlite3.connect(app._db_path)
+        conn.execute(
+            'DELETE FROM TRANSACTIONSTABLE WHERE transactionsTableID = (SELECT MIN(transactionsTableID) FROM TRANSACTIONSTABLE)'
+        )
+        conn.commit()
+        conn.close()
+
+        await app.action_push_device()
+        assert any('pushed' in str(m) and 'nothing' not in str(m) for m in app._log_history)
+
+    conn = sqlite3.connect(fake.local(DEVICE_DB_PATH))
+    assert conn.execute('SELECT COUNT(*) FROM TRANSACTIONSTABLE').fetchone()[0] == 2824
+    conn.close()
+
+
+async def test_query_stats_screen(bluecoins_db: Path) -> None:
+    async with CluecoinsApp().run_test(size=(120, 60)) as pilot:
+        app: CluecoinsApp = pilot.app  # type: ignore[assignment]
+        app.action_query_stats()
+        await pilot.pause()
+        assert isinstance(app.screen, QueryStatsScreen)
+        assert app.screen._data.row_count == 0
+
+        cluecoins.tracing.enable()
+        try:
+            app.database_connect(bluecoins_db)
+            app.action_transactions()
+            await pilot.pause()
+            app.action_query_stats()
+            await pilot.pause()
+
+            screen = app.screen
+            assert isinstance(screen, QueryStatsScreen)
+            assert screen._data.row_count > 0
+            assert {s.scope for s in screen._stats} == {'TransactionsScreen'}
+            assert any(s.plan for s in screen._stats)
+
+            await pilot.click('#query-stats-reset')
+            await pilot.pause()
+            assert screen._data.row_count == 0
+        finally:
+            cluecoins.tracing.disable()